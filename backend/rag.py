@@ -24,6 +24,7 @@ warnings.filterwarnings("ignore")
 
 from model.scripts.inference import ModelInference
 from dataset.scripts.data import DataCollector
+from dataset.scripts.http_client import get_http_client
 from backend.utils import *
 
 # ------------------------------------
@@ -216,7 +217,9 @@ class RAG:
         self.tools = []
 
         self.GEO_API_KEY = os.getenv("GEO_API_KEY")
-        self.base_url = "https://api.opencagedata.com/geocode/v1/json"
+        # overridable to run against dataset/scripts/replay_server.py
+        self.base_url = os.getenv("GEO_API_BASE_URL", "https://api.opencagedata.com").rstrip("/") + "/geocode/v1/json"
+        self.http_client = get_http_client()
 
         # data - for weather data
         self.data_obj = DataCollector()
@@ -285,7 +288,7 @@ class RAG:
 
         try:
             # API request
-            response = requests.get(self.base_url, params=params)
+            response = self.http_client.get(self.base_url, params=params)
             response.raise_for_status()  # Raise HTTPError for bad responses
             data = response.json()
 
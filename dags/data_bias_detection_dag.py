@@ -7,6 +7,8 @@ import pickle
 # Import necessary functions or define them here if not imported
 # from my_bias_module import detect_bias, conditional_mitigation
 from src.data_download import *
+from dataset.scripts.data_store import read_dataset
+from dataset.scripts.dtype_plan import apply_dtype_plan
 from src.data_bias_detection_and_mitigation import detect_bias
 from src.data_bias_detection_and_mitigation import conditional_mitigation_with_resampling
 
@@ -27,16 +29,16 @@ data_bias_detection_and_mitigation = DAG(
 )
 
 # File paths for data
-data_path = '/opt/airflow/dataset/data/data_preprocess.csv'
+data_path = '/opt/airflow/dataset/data/data_preprocess'
 bias_results_path = '/opt/airflow/model/pickle/bias_detection_results.pkl'  # For storing intermediate results
 mitigated_data_path = '/opt/airflow/dataset/data/bias_mitigated_data.csv'
 
-filename_preprocessed = "data_preprocess.csv"
+filename_preprocessed = "data_preprocess"
 
 
 def identify_bias(data_path):
     # Load the new data
-    data = pd.read_csv(data_path)
+    data = apply_dtype_plan(read_dataset(data_path))
     target_col = 'value'
     sensitive_col = 'subba-name'
 
@@ -49,7 +51,7 @@ def identify_bias(data_path):
 
 def mitigate_bias():
     # Load the new data and bias results
-    data = pd.read_csv(data_path)
+    data = apply_dtype_plan(read_dataset(data_path))
 
     with open(bias_results_path, 'rb') as f:
         bias_output = pickle.load(f)
@@ -5,6 +5,7 @@ from airflow.utils.trigger_rule import TriggerRule
 from datetime import datetime, timedelta
 import pandas as pd
 from src.data_drift import *
+from src.artifact_store import cleanup_artifacts
 
 # ------------------------------------------------------------------------------------------------
 # default args
@@ -26,7 +27,7 @@ data_drift_detection_dag = DAG(
     tags=['data_drift_detection_dag']
 )
 
-filename = "data_preprocess.csv"
+filename = "data_preprocess"
 drift_report = "data_drift.html"
 
 # ------------------------------------------------------------------------------------------------
@@ -93,6 +94,16 @@ psi_task = PythonOperator(
     dag=data_drift_detection_dag
 )
 
+# removes the baseline and new data artifacts of the run, whatever the drift tasks returned
+cleanup_artifacts_task = PythonOperator(
+    task_id='cleanup_artifacts',
+    python_callable=cleanup_artifacts,
+    provide_context=True,
+    dag=data_drift_detection_dag,
+    trigger_rule=TriggerRule.ALL_DONE
+)
+
 # ------------------------------------------------------------------------------------------------
 # Task dependencies
-load_data_task >> [evidently_task, ks_test_task, psi_task] >> send_email
\ No newline at end of file
+load_data_task >> [evidently_task, ks_test_task, psi_task] >> send_email
+[evidently_task, ks_test_task, psi_task] >> cleanup_artifacts_task
\ No newline at end of file
@@ -1,5 +1,5 @@
 from airflow import DAG
-from airflow.operators.python_operator import PythonOperator, BranchPythonOperator
+from airflow.operators.python_operator import PythonOperator, BranchPythonOperator, ShortCircuitOperator
 from airflow.operators.email_operator import EmailOperator
 from airflow.utils.trigger_rule import TriggerRule
 from airflow.operators.trigger_dagrun import TriggerDagRunOperator
@@ -7,20 +7,23 @@ from datetime import datetime, timedelta
 from src.data_download import *
 from src.data_preprocess import *
 from src.data_schema_validation import *
+from src.artifact_store import cleanup_artifacts
 
 
 # ------------------------------------------------------------------------------------------------
 # variables
 delta_days = 7
-filename_preprocessed = "data_preprocess.csv"
-filename_raw = "data_raw.csv"
+max_lookback_days = 30
+# Parquet datasets in dataset/data, converted from the csv files of the same name on first use
+filename_preprocessed = "data_preprocess"
+filename_raw = "data_raw"
 
 # local functions
 # Function to determine whether to proceed based on validation result
 def check_validation_result(**kwargs):
     validation_result = kwargs['ti'].xcom_pull(task_ids='validate_data_with_schema_task')
     if validation_result == 1:
-        return 'merge_data_task'  # Task to continue if validation is successful
+        return 'update_statistics_task'  # Task to continue if validation is successful
     else:
         return 'send_failure_email'  # Task to send failure email and stop flow
 
@@ -98,12 +101,12 @@ branch_task = BranchPythonOperator(
 
 # --------------------------
 # Data API Operators
-# function returns start and end date for last "number of days"
-last_k_start_end_date_task = PythonOperator(
-    task_id = 'last_k_start_end_date_task',
-    python_callable=get_last_k_start_end_dates,
+# function returns start date (day of the oldest zone watermark) and end date (today)
+watermark_start_end_date_task = PythonOperator(
+    task_id = 'watermark_start_end_date_task',
+    python_callable=get_watermark_start_end_dates,
     provide_context=True,
-    op_args=[delta_days],
+    op_args=[delta_days, max_lookback_days],
     dag = data_new_preprocess_dag
 )
 
@@ -115,29 +118,58 @@ last_k_start_end_date_task = PythonOperator(
 #     dag = data_new_preprocess_dag
 # )
 
-# function to get new data, returns data json
+# function to get new data, returns the reference of its artifact
+# (frames are passed between tasks as artifact references, see src/artifact_store.py)
 updated_data_from_api_task = PythonOperator(
     task_id = 'updated_data_from_api_task',
     python_callable=get_updated_data_from_api,
     provide_context=True,
-    op_args=[last_k_start_end_date_task.output],
+    op_args=[watermark_start_end_date_task.output],
     dag = data_new_preprocess_dag
 )
 
-# Define the clean data task, depends on 'updated_data_from_api_task'
+# function to pull raw data from dvc, returns file path
+raw_data_from_dvc_task = PythonOperator(
+    task_id = 'raw_data_from_dvc_task',
+    python_callable=get_data_from_dvc,
+    provide_context=True,
+    op_args=[filename_raw],
+    dag = data_new_preprocess_dag
+)
+
+# function to keep the rows newer than the zone watermarks and the revised older ones, returns the reference of its artifact
+new_data_filter_task = PythonOperator(
+    task_id = 'new_data_filter_task',
+    python_callable=filter_new_data,
+    provide_context=True,
+    op_args=[updated_data_from_api_task.output, raw_data_from_dvc_task.output],
+    dag = data_new_preprocess_dag
+)
+
+# skips the rest of the run when nothing new was published since the last run
+check_new_data_task = ShortCircuitOperator(
+    task_id = 'check_new_data_task',
+    python_callable=has_new_data,
+    op_args=[new_data_filter_task.output],
+    ignore_downstream_trigger_rules=False,  # delete_local_task (ALL_DONE) still cleans up
+    dag = data_new_preprocess_dag
+)
+
+# Define the clean data task, depends on 'new_data_filter_task'
 clean_data_task = PythonOperator(
     task_id='clean_data_task',
     python_callable=clean_data,
-    op_args=[updated_data_from_api_task.output],
+    op_args=[new_data_filter_task.output],
     provide_context=True,
     dag=data_new_preprocess_dag,
 )
 
 # Define the engineer features task, depends on 'clean_data_task'
+# (the windows of the first rows of each series are filled from the raw history, so no delta row is dropped)
 engineer_features_task = PythonOperator(
     task_id='engineer_features_task',
     python_callable=engineer_features,
-    op_args=[clean_data_task.output],
+    op_args=[clean_data_task.output, raw_data_from_dvc_task.output],
     provide_context=True,
     dag=data_new_preprocess_dag,
 )
@@ -151,11 +183,21 @@ add_cyclic_features_task = PythonOperator(
     dag=data_new_preprocess_dag,
 )
 
+# function to pull preprocessed data from dvc, returns dataset path
+# (pulled before normalization, its statistics give the bounds the new rows are scaled with)
+processed_data_from_dvc_task = PythonOperator(
+    task_id = 'processed_data_from_dvc_task',
+    python_callable=get_data_from_dvc,
+    provide_context=True,
+    op_args=[filename_preprocessed],
+    dag = data_new_preprocess_dag
+)
+
 # Define the normalization and encoding task, depends on 'add_cyclic_features_task'
 normalize_and_encode_task = PythonOperator(
     task_id='normalize_and_encode_task',
-    python_callable=normalize_and_encode,
-    op_args=[add_cyclic_features_task.output],
+    python_callable=normalize_new_data,
+    op_args=[add_cyclic_features_task.output, processed_data_from_dvc_task.output],
     provide_context=True,
     dag=data_new_preprocess_dag,
 )
@@ -170,15 +212,6 @@ select_final_features_task = PythonOperator(
 )
 
 
-# function to pull preprocessed data from dvc, returns json
-processed_data_from_dvc_task = PythonOperator(
-    task_id = 'processed_data_from_dvc_task',
-    python_callable=get_data_from_dvc,
-    provide_context=True,
-    op_args=[filename_preprocessed],
-    dag = data_new_preprocess_dag
-)
-
 # function to validate data with schema
 validate_data_with_schema_task =  PythonOperator(
     task_id = 'validate_data_with_schema_task',
@@ -188,39 +221,32 @@ validate_data_with_schema_task =  PythonOperator(
     dag = data_new_preprocess_dag
 )
 
-# function to pull preprocessed data from dvc, returns json
-raw_data_from_dvc_task = PythonOperator(
-    task_id = 'raw_data_from_dvc_task',
-    python_callable=get_data_from_dvc,
-    provide_context=True,
-    op_args=[filename_raw],
-    dag = data_new_preprocess_dag
-)
-
-# function to merge the new data to raw data csv directly
+# function to upsert the new and revised rows into the raw dataset, returns dataset path
 merge_raw_data_task = PythonOperator(
     task_id = 'merge_raw_data_task',
     python_callable=merge_data,
     provide_context=True,
-    op_args=[updated_data_from_api_task.output, raw_data_from_dvc_task.output],
+    op_args=[new_data_filter_task.output, raw_data_from_dvc_task.output],
     dag = data_new_preprocess_dag
 )
 
-# function to merge dvc data with newly pulled data from api, returns data json
-merge_data_task = PythonOperator(
-    task_id = 'merge_data_task',
-    python_callable=merge_data,
+# function to fold the new rows into the dataset statistics and renormalize the partitions
+# normalized with older bounds, before the new rows (scaled with the new bounds) are appended
+update_statistics_task = PythonOperator(
+    task_id = 'update_statistics_task',
+    python_callable=update_statistics,
     provide_context=True,
-    op_args=[select_final_features_task.output, processed_data_from_dvc_task.output],
+    op_args=[add_cyclic_features_task.output, processed_data_from_dvc_task.output],
     dag = data_new_preprocess_dag
 )
 
-# function to remove redundant rows, returns data json
-redundant_removal_task = PythonOperator(
-    task_id = 'redundant_removal_task',
-    python_callable=redundant_removal,
+# function to upsert the newly preprocessed rows into the dvc dataset, returns dataset path
+# (keys hold label codes, so only the rows encoded with the stored vocabulary are upserted, the rest appended)
+merge_data_task = PythonOperator(
+    task_id = 'merge_data_task',
+    python_callable=merge_preprocessed_data,
     provide_context=True,
-    op_args=[merge_data_task.output],
+    op_args=[select_final_features_task.output, processed_data_from_dvc_task.output],
     dag = data_new_preprocess_dag
 )
 
@@ -229,7 +255,7 @@ update_data_to_dvc_task = PythonOperator(
     task_id = 'update_data_to_dvc_task',
     python_callable=update_data_to_dvc,
     provide_context=True,
-    op_args=[redundant_removal_task.output],
+    op_args=[merge_data_task.output],
     dag = data_new_preprocess_dag
 )
 
@@ -241,6 +267,33 @@ update_raw_data_to_dvc_task = PythonOperator(
     dag = data_new_preprocess_dag
 )
 
+# function to move the zone watermarks past the ingested rows, only once both datasets are pushed
+update_watermarks_task = PythonOperator(
+    task_id = 'update_watermarks_task',
+    python_callable=update_watermarks,
+    provide_context=True,
+    op_args=[new_data_filter_task.output],
+    dag = data_new_preprocess_dag
+)
+
+# function to compute the features of the new raw rows into the feature store, once they are merged
+refresh_feature_store_task = PythonOperator(
+    task_id = 'refresh_feature_store_task',
+    python_callable=refresh_feature_store,
+    provide_context=True,
+    op_args=[new_data_filter_task.output],
+    dag = data_new_preprocess_dag
+)
+
+# removes the frames passed between the tasks of the run
+cleanup_artifacts_task = PythonOperator(
+    task_id = 'cleanup_artifacts_task',
+    python_callable=cleanup_artifacts,
+    provide_context=True,
+    dag = data_new_preprocess_dag,
+    trigger_rule=TriggerRule.ALL_DONE
+)
+
 delete_local_task = PythonOperator(
     task_id = 'delete_local_task',
     python_callable=delete_local_dvc_data,
@@ -258,13 +311,18 @@ trigger_bias_detection_dag = TriggerDagRunOperator(
 
 # --------------------------
 
-# get data from api (new data) -> get data from dvc -> merge new data with dvc -> push back to dvc
-last_k_start_end_date_task >> updated_data_from_api_task >> clean_data_task >> engineer_features_task >> add_cyclic_features_task >> normalize_and_encode_task >> select_final_features_task >> processed_data_from_dvc_task >> validate_data_with_schema_task >> branch_task
-branch_task >> merge_data_task >> redundant_removal_task >> update_data_to_dvc_task
+# get data newer than the watermarks (and revisions) from api -> preprocess -> upsert delta into dvc files -> push back to dvc -> advance watermarks
+watermark_start_end_date_task >> updated_data_from_api_task >> raw_data_from_dvc_task >> new_data_filter_task >> check_new_data_task
+check_new_data_task >> clean_data_task >> engineer_features_task >> add_cyclic_features_task >> processed_data_from_dvc_task >> normalize_and_encode_task >> select_final_features_task >> validate_data_with_schema_task >> branch_task
+branch_task >> update_statistics_task >> merge_data_task >> update_data_to_dvc_task
 branch_task >> send_data_validation_failure_email
-raw_data_from_dvc_task >> merge_raw_data_task >> update_raw_data_to_dvc_task
+# the raw delta is only merged once the preprocessed delta passed validation, so the two datasets stay in step
+merge_data_task >> merge_raw_data_task >> update_raw_data_to_dvc_task
+merge_raw_data_task >> refresh_feature_store_task
+[update_data_to_dvc_task , update_raw_data_to_dvc_task] >> update_watermarks_task
 [update_data_to_dvc_task , update_raw_data_to_dvc_task] >> delete_local_task #>> trigger_bias_detection_dag
 update_raw_data_to_dvc_task >> send_email 
+[update_watermarks_task, refresh_feature_store_task, send_data_validation_failure_email] >> cleanup_artifacts_task
 
 
 
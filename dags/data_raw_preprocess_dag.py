@@ -27,7 +27,7 @@ data_raw_preprocess_dag = DAG(
 
 # ------------------------------------------------------------------------------------------------
 # variables
-filename_raw = "data_raw.csv"
+filename_raw = "data_raw"
 
 # ------------------------------------------------------------------------------------------------
 # Email operators
@@ -32,7 +32,7 @@ from src.model_pipeline import *
 ####
 
 # variables 
-filename = "data_preprocess.csv"
+filename = "data_preprocess"
 model_name = "lr"
 thresholds = (1000, 1000, 0.7)
 
@@ -0,0 +1,31 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from dataset.scripts.artifact_store import *
+
+
+# ----------------------------------------------------------
+def run_keys(context) -> tuple:
+    """(dag_id, run_id) of the task instance in an Airflow context, (None, None) outside of a DAG run."""
+    ti = context.get("ti")
+    if ti is None:
+        return None, None
+    return ti.dag_id, ti.run_id
+
+
+def save_task_frame(df, name, **context):
+    """The payload a task returns for df: an artifact reference in a DAG run, JSON records otherwise."""
+    dag_id, run_id = run_keys(context)
+    return save_frame(df, name, dag_id, run_id)
+
+
+def cleanup_artifacts(**context):
+    """Removes the artifacts of this DAG run, and of older runs that never got to clean up."""
+    store = ArtifactStore()
+    dag_id, run_id = run_keys(context)
+    removed = store.cleanup(dag_id, run_id) if run_id is not None else 0
+    store.prune()
+    return removed
@@ -6,6 +6,9 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../.
 
 from dataset.scripts.dvc_manager import *
 from dataset.scripts.data import *
+from dataset.scripts.watermark_store import WatermarkStore
+from dataset.scripts.data_store import read_dataset, write_dataset, upsert_dataset, deduplicate_dataset, changed_rows
+from dags.src.artifact_store import load_frame, payload_rows, save_task_frame
 
 
 # ----------------------------------------------------------
@@ -25,39 +28,94 @@ def get_last_k_start_end_dates(days: int) -> tuple[str, str]:
     return start_date, today
 
 
-def get_updated_data_from_api(dates: tuple[str, str]) -> pd.DataFrame:
+def get_watermark_start_end_dates(days: int, max_lookback_days: int = 30) -> tuple[str, str]:
+    """
+    Returns the start and end date of the incremental window: from the day of the oldest zone
+    watermark to today, reaching back at most max_lookback_days. Falls back to the last `days`
+    days when no zone has been ingested yet.
+    """
+    data_obj = DataCollector()
+    data_regions = DataRegions()
+    _, today = data_obj.get_yesterday_dates()
+
+    zones = [zone for region in data_regions.regions.values() for zone in region]
+    default_start = pd.Timestamp(datetime.now() - timedelta(days=days - 1)).normalize()
+    earliest = pd.Timestamp(datetime.now() - timedelta(days=max_lookback_days - 1)).normalize()
+    start = WatermarkStore().start_date(zones, default_start, earliest=earliest)
+    return start.strftime("%d-%m-%Y"), today
+
+
+def get_updated_data_from_api(dates: tuple[str, str], **kwargs):
     data_obj = DataCollector()
     data_regions = DataRegions()
 
     start_date, end_date = dates
     updated_data = data_obj.get_data_from_api(
-        data_regions.regions, start_date, end_date, today_flag=0
+        data_regions.regions, start_date, end_date, today_flag=0, concurrent=True
     )
 
-    json_data = updated_data.to_json(orient="records", lines=False)
-    return json_data
+    # In a DAG run the rows go to the artifact store and only their reference to XCom
+    return save_task_frame(updated_data, "api_data", **kwargs)
 
 
 def merge_data(api_json, dvc_file_path):
-    api_df = pd.read_json(api_json)
-    dvc_df = pd.read_csv(dvc_file_path)
+    """
+    Upserts the api rows into the DVC data by (zone, subba-name, datetime): new keys are appended and
+    changed rows replace the stored ones. Datasets keep a key index, so the history is not reread.
+    """
+    api_df = load_frame(api_json)
+    upsert_dataset(dvc_file_path, api_df)
+    return dvc_file_path
 
-    if dvc_df is not None:
-        updated_data_df = pd.concat([dvc_df, api_df], ignore_index=True)
-    else:
-        updated_data_df = api_df
 
-    save_df_to_csv(updated_data_df, dvc_file_path)
+def filter_new_data(api_json, dvc_file_path=None, **kwargs):
+    """
+    Keeps the api rows newer than their zone's watermark, and the older rows that the DVC data does
+    not hold as they are (revised by the api or published late), so merge_data can upsert them.
+    Returns their artifact reference (data json outside of a DAG run).
+    Zones without a watermark are bootstrapped from the 'zone' and 'datetime' columns of the DVC data.
+    """
+    api_df = load_frame(api_json)
+    watermark_store = WatermarkStore()
+
+    if dvc_file_path is not None and not api_df.empty:
+        missing = set(api_df["zone"].astype(str)) - set(watermark_store.get_all())
+        if missing:
+            history_df = read_dataset(dvc_file_path, columns=["zone", "datetime"])
+            watermark_store.bootstrap(history_df[history_df["zone"].astype(str).isin(missing)])
+
+    new = api_df.index.isin(watermark_store.filter_new(api_df).index)
+    if dvc_file_path is not None and not new.all():
+        # Only the rows at or before the watermarks are looked up in the key index of the DVC data
+        new[~new] = changed_rows(dvc_file_path, api_df[~new])
+    return save_task_frame(api_df[new], "new_data", **kwargs)
+
+
+def has_new_data(api_json) -> bool:
+    return payload_rows(api_json) > 0
+
+
+def append_data(api_json, dvc_file_path):
+    """
+    Appends the new rows to the DVC data without reading or rewriting the existing rows.
+    Datasets get new files in the touched partitions, csv rows are aligned to the existing header.
+    """
+    api_df = load_frame(api_json)
+    write_dataset(dvc_file_path, api_df, mode="append")
     return dvc_file_path
 
 
-def redundant_removal(data_path):
-    data_df = pd.read_csv(data_path)
+def update_watermarks(api_json):
+    """Advances the zone watermarks past the rows that were ingested."""
+    return WatermarkStore().advance(load_frame(api_json))
 
-    # Remove duplicate rows based on the 'datetime' column
-    data_df = data_df.drop_duplicates(subset="datetime")
 
-    save_df_to_csv(data_df, data_path)
+def redundant_removal(data_path):
+    """
+    Removes duplicate rows by (zone, subba-name, datetime), keeping the last one, so zones that share
+    a timestamp are kept. Datasets only read the partitions changed since their key index was saved.
+    """
+    deduplicate_dataset(data_path)
     return data_path
 
 
@@ -65,7 +123,8 @@ def redundant_removal(data_path):
 # DVC Manager
 def get_data_from_dvc(filename):
     dvc_manager_obj = DVCManager()
-    df, file_path = dvc_manager_obj.download_data_from_dvc(filename, save_local=1)
+    # only the local path is passed on, the tasks read the columns they need from it
+    df, file_path = dvc_manager_obj.download_data_from_dvc(filename, save_local=1, load=False)
 
     # json_data = df.to_json(orient='records', lines=False)
     return file_path
@@ -73,8 +132,7 @@ def get_data_from_dvc(filename):
 
 def update_data_to_dvc(filename):
     dvc_manager_obj = DVCManager()
-    df = pd.read_csv(filename)
-    dvc_manager_obj.upload_data_to_dvc(df, filename)
+    dvc_manager_obj.push_file_to_dvc(os.path.join(dvc_manager_obj.data_dir, filename))
 
 
 def delete_local_dvc_data():
@@ -7,11 +7,14 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../.
 from dataset.scripts.data_drift_detection import *
 from dataset.scripts.dvc_manager import *
 from dags.src.data_download import get_data_from_dvc
+from dataset.scripts.data_store import read_dataset
+from dataset.scripts.dtype_plan import apply_dtype_plan
+from dags.src.artifact_store import load_frame, save_task_frame
 
 # Task to load data
 def load_data(filename, **kwargs):
     file_path = get_data_from_dvc(filename)
-    df = pd.read_csv(file_path)
+    df = apply_dtype_plan(read_dataset(file_path))
 
     df['datetime'] = pd.to_datetime(df['datetime'], errors='coerce')
 
@@ -25,17 +28,20 @@ def load_data(filename, **kwargs):
     baseline_df = df[df['datetime'] < last_available_date]  # All data except the last available date
     new_data_df = df[df['datetime'] == last_available_date]
 
-    kwargs['ti'].xcom_push(key='baseline_df', value=baseline_df.to_dict())
-    kwargs['ti'].xcom_push(key='new_data_df', value=new_data_df.to_dict())
+    # Only references to the stored frames go to XCom, see artifact_store.py
+    kwargs['ti'].xcom_push(key='baseline_df', value=save_task_frame(baseline_df, 'baseline_df', **kwargs))
+    kwargs['ti'].xcom_push(key='new_data_df', value=save_task_frame(new_data_df, 'new_data_df', **kwargs))
+
+# Frames pushed by load_data
+def pull_frames(ti):
+    baseline_df = load_frame(ti.xcom_pull(key='baseline_df', task_ids='load_data'))
+    new_data_df = load_frame(ti.xcom_pull(key='new_data_df', task_ids='load_data'))
+    return baseline_df, new_data_df
 
 # Initialize DataDriftDetector and call Evidently drift detection
 def detect_drift_evidently(drift_report_filename, **kwargs):
-    baseline_dict = kwargs['ti'].xcom_pull(key='baseline_df', task_ids='load_data')
-    new_data_dict = kwargs['ti'].xcom_pull(key='new_data_df', task_ids='load_data')
-    baseline_df = pd.DataFrame.from_dict(baseline_dict)
+    baseline_df, new_data_df = pull_frames(kwargs['ti'])
     baseline_df['datetime'] = pd.to_datetime(baseline_df['datetime'], errors='coerce')
-    
-    new_data_df = pd.DataFrame.from_dict(new_data_dict)
     new_data_df['datetime'] = pd.to_datetime(new_data_df['datetime'], errors='coerce')
 
     detector = DataDriftDetector(baseline_df, new_data_df)
@@ -50,10 +56,7 @@ def detect_drift_evidently(drift_report_filename, **kwargs):
 
 # Kolmogorov-Smirnov Test for drift detection
 def detect_drift_ks_test(**kwargs):
-    baseline_dict = kwargs['ti'].xcom_pull(key='baseline_df', task_ids='load_data')
-    new_data_dict = kwargs['ti'].xcom_pull(key='new_data_df', task_ids='load_data')
-    baseline_df = pd.DataFrame.from_dict(baseline_dict)
-    new_data_df = pd.DataFrame.from_dict(new_data_dict)
+    baseline_df, new_data_df = pull_frames(kwargs['ti'])
 
     detector = DataDriftDetector(baseline_df, new_data_df)
     ks_test_results = detector.detect_drift_ks_test()
@@ -62,10 +65,7 @@ def detect_drift_ks_test(**kwargs):
 
 # Population Stability Index Test for drift detection
 def detect_drift_psi(**kwargs):
-    baseline_dict = kwargs['ti'].xcom_pull(key='baseline_df', task_ids='load_data')
-    new_data_dict = kwargs['ti'].xcom_pull(key='new_data_df', task_ids='load_data')
-    baseline_df = pd.DataFrame.from_dict(baseline_dict)
-    new_data_df = pd.DataFrame.from_dict(new_data_dict)
+    baseline_df, new_data_df = pull_frames(kwargs['ti'])
 
     detector = DataDriftDetector(baseline_df, new_data_df)
     psi_results = detector.detect_drift_psi()
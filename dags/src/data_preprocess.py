@@ -11,6 +11,11 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../'
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 
 from dataset.scripts.data_preprocess import *
+from dataset.scripts.statistics_store import StatisticsStore
+from dataset.scripts.data_store import write_dataset, upsert_dataset
+from dataset.scripts.key_index import KEY_COLUMNS
+from dataset.scripts.feature_store import FeatureStore
+from dags.src.artifact_store import load_frame, save_task_frame
 
 # Function to Save Data to CSV and Track with DVC, Including Date in Filename
 def save_data(df, step_name="processed_data"):
@@ -34,35 +39,110 @@ def save_data(df, step_name="processed_data"):
         print(f"An error occurred: {e}")
     return filename
 
+# Steps on task payloads: artifact references in a DAG run, data json otherwise (see artifact_store.py)
 # Step 1: Data Cleaning
-def clean_data(df_json):
+def clean_data(df_json, **kwargs):
     preprocess_obj = DataPreprocessor()
-    json_data_cleaned = preprocess_obj.clean_data(df_json)
-    return json_data_cleaned
+    df = preprocess_obj.clean_data_df(load_frame(df_json))
+    return save_task_frame(df, "clean_data", **kwargs)
 
 # Step 2: Feature Engineering
-def engineer_features(df_json):
+def engineer_features(df_json, dataset_path=None, **kwargs):
+    """
+    Adds the rolling and lag features. With dataset_path (the raw data the rows are merged into),
+    the windows of the first rows of each series are filled from the stored rows before them, so a
+    delta keeps all of its rows.
+    """
     preprocess_obj = DataPreprocessor()
-    json_data = preprocess_obj.engineer_features(df_json)
-    return json_data
+    df = load_frame(df_json)
+    context = preprocess_obj.history_context_df(df, dataset_path) if dataset_path is not None and not df.empty else None
+    df = preprocess_obj.engineer_features_df(df, context=context)
+    return save_task_frame(df, "engineer_features", **kwargs)
 
 # Step 3: Add Cyclic Features
-def add_cyclic_features(df_json):
+def add_cyclic_features(df_json, **kwargs):
     preprocess_obj = DataPreprocessor()
-    json_data = preprocess_obj.add_cyclic_features(df_json)
-    return json_data
+    df = preprocess_obj.add_cyclic_features_df(load_frame(df_json))
+    return save_task_frame(df, "add_cyclic_features", **kwargs)
 
 # Step 4: Normalize and Encode Data
-def normalize_and_encode(df_json):
+def normalize_and_encode(df_json, **kwargs):
     preprocess_obj = DataPreprocessor()
-    json_data = preprocess_obj.normalize_and_encode(df_json)
-    return json_data
+    df = preprocess_obj.normalize_and_encode_df(load_frame(df_json))
+    return save_task_frame(df, "normalize_and_encode", **kwargs)
+
+# Step 4 for new data: Normalize with the statistics of the preprocessed dataset
+def normalize_new_data(df_json, dataset_path, **kwargs):
+    """
+    Normalizes and encodes new rows with the bounds of the preprocessed dataset, widened by the new
+    rows, so they are scaled like the history. Falls back to their own min/max when the dataset has
+    no statistics yet (not preprocessed by preprocess_pipeline since statistics were introduced).
+    """
+    store = StatisticsStore(dataset_path)
+    if not store.exists():
+        print(f"No statistics in {dataset_path}, normalizing the new rows on their own.")
+        return normalize_and_encode(df_json, **kwargs)
+
+    preprocess_obj = DataPreprocessor()
+    df = load_frame(df_json)
+    df = preprocess_obj.normalize_and_encode_df(df, transformer=store.preview(df).transformer())
+    return save_task_frame(df, "normalize_and_encode", **kwargs)
+
+# Fold the new rows into the statistics and renormalize the partitions whose bounds moved
+def update_statistics(df_json, dataset_path, transformer_path=None):
+    """
+    Folds the new rows into the dataset statistics, renormalizes the stale partitions and saves the
+    transformer of the current bounds inside the dataset (pushed to DVC with it), where inference
+    loads it from (see current_transformer_path).
+    """
+    store = StatisticsStore(dataset_path)
+    if not store.exists():
+        print(f"No statistics in {dataset_path}, nothing to update.")
+        return dataset_path
+
+    version = store.fold(load_frame(df_json))
+    store.renormalize()
+    # Inference scales its input with the current bounds
+    store.transformer(version).save(transformer_path or store.transformer_path)
+    return dataset_path
+
+# Upsert the newly preprocessed rows, whose series labels are label codes
+def merge_preprocessed_data(df_json, dataset_path):
+    """
+    Upserts the preprocessed rows into the dataset by (zone, subba-name, datetime). The labels in the
+    key are codes, which only identify a series under the fixed vocabulary of the dataset statistics:
+    without statistics (codes fitted per batch) all rows are appended, and rows with labels outside
+    the vocabulary (-1) are appended too, since their series cannot be told apart.
+    """
+    df = load_frame(df_json)
+    store = StatisticsStore(dataset_path)
+    if not store.exists():
+        print(f"No statistics in {dataset_path}, appending the new rows without upserting them.")
+        write_dataset(dataset_path, df, mode="append")
+        return dataset_path
+
+    classes = store.statistics().classes
+    label_columns = [col for col in KEY_COLUMNS if col in classes and col in df.columns]
+    unseen = (df[label_columns] == -1).any(axis=1) if label_columns else pd.Series(False, index=df.index)
+    if not unseen.all():
+        upsert_dataset(dataset_path, df[~unseen])
+    if unseen.any():
+        print(f"Appending {int(unseen.sum())} rows with labels outside the vocabulary.")
+        write_dataset(dataset_path, df[unseen], mode="append")
+    return dataset_path
+
+# Compute the features of the new raw rows into the feature store, on top of the stored history
+def refresh_feature_store(df_json, store_path=None):
+    store = FeatureStore(store_path)
+    rows = store.refresh(load_frame(df_json))
+    print(f"{rows} rows written to the feature store {store.db_path}.")
+    return store.db_path
 
 # Step 5: Feature Selection
-def select_final_features(df_json):
+def select_final_features(df_json, **kwargs):
     preprocess_obj = DataPreprocessor()
-    json_data_selected = preprocess_obj.select_final_features(df_json)
-    return json_data_selected
+    df = preprocess_obj.select_final_features_df(load_frame(df_json))
+    return save_task_frame(df, "select_final_features", **kwargs)
 
 
 def preprocess_pipeline(file_path):
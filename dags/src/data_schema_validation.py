@@ -5,22 +5,24 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../"
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
 
 from dataset.scripts.data_schema import *
+from dataset.scripts.data_store import read_dataset
+from dataset.scripts.schema_cache import SchemaCache
+from dags.src.artifact_store import load_frame, save_task_frame
 
 
 # ----------------------------------------------------------
 def save_schema(dvc_file_name):
-    df = pd.read_csv(dvc_file_name)
-    data_schema_obj = DataSchemaAndStatistics(df)
-    schema = data_schema_obj.infer_schema()
+    data_schema_obj = DataSchemaAndStatistics(None)
+    data_schema_obj.schema = SchemaCache().schema(dvc_file_name)
     data_schema_obj.save_schema(dvc_file_name.split(".")[0] + ".json")
 
 
 def validate_data(dvc_file_name, api_json):
-    df = pd.read_csv(dvc_file_name)
-    api_df = pd.read_json(api_json)
+    api_df = load_frame(api_json)
 
-    data_schema_obj = DataSchemaAndStatistics(df)
-    schema = data_schema_obj.infer_schema()
+    # The schema of the DVC data is only inferred again when its version changed, see schema_cache.py
+    data_schema_obj = DataSchemaAndStatistics(api_df)
+    data_schema_obj.schema = SchemaCache().schema(dvc_file_name)
 
     valid = data_schema_obj.validate_data(api_df)
 
@@ -29,14 +31,22 @@ def validate_data(dvc_file_name, api_json):
     else:
         return 1
 
-def fix_anomalies(api_json):
-    api_df = pd.read_json(api_json)
+def revalidate_data(dvc_file_name, chunk_rows=DEFAULT_VALIDATION_CHUNK_ROWS, sample_fraction=None):
+    """
+    Validates the whole DVC data against its cached schema in batches of chunk_rows rows (only a
+    sample_fraction share of each with a sample), returns the compact failure summary.
+    """
+    data_schema_obj = DataSchemaAndStatistics(None)
+    data_schema_obj.schema = SchemaCache().schema(dvc_file_name)
+    return data_schema_obj.validate_dataset(dvc_file_name, chunk_rows, sample_fraction=sample_fraction)
+
+def fix_anomalies(api_json, **kwargs):
+    api_df = load_frame(api_json)
 
     data_schema_obj = DataSchemaAndStatistics(api_df)
     api_df = data_schema_obj.fix_anomalies(api_df)
 
-    json_data_cleaned = api_df.to_json(orient='records', lines=False)
-    return json_data_cleaned
+    return save_task_frame(api_df, "fix_anomalies", **kwargs)
 
 
 
@@ -75,6 +75,396 @@ def test_get_updated_data_from_api():
     
     assert any(func_yesterday_formatted in str(dt) for dt in api_df['datetime'].values), f"Expected yesterday's date ({func_yesterday_formatted}) in API data but it was not found."
 
+# Fake EIA / WorldWeatherOnline responses, keyed on the request url
+def fake_api_get(url, *args, **kwargs):
+    query = dict(part.split("=", 1) for part in url.split("?", 1)[1].split("&"))
+    response = MagicMock()
+    response.status_code = 200
+
+    if "eia.gov" in url:
+        subba = query["facets[subba][]"]
+        days = pd.date_range(query["start"], query["end"], freq="D")
+        rows = [
+            {"period": f"{day:%Y-%m-%d}T{hour:02d}", "subba": subba, "subba-name": f"Zone {subba}",
+             "parent": "NYIS", "parent-name": "NYISO", "value": day.day * 10 + hour, "value-units": "MWh"}
+            for day in days for hour in range(2)
+        ]
+        response.json.return_value = {"response": {"total": str(len(rows)), "data": rows}}
+    else:
+        days = pd.date_range(query["date"], query["enddate"], freq="D")
+        weather = [
+            {"date": f"{day:%Y-%m-%d}", "hourly": [
+                {"time": str(hour * 100), "tempC": "1", "tempF": str(30 + day.day + hour), "windspeedKmph": "5",
+                 "windspeedMiles": "3", "weatherIconUrl": [{"value": ""}], "weatherDesc": [{"value": "Clear"}],
+                 "winddirDegree": "10", "winddir16Point": "N", "humidity": "50"}
+                for hour in range(2)
+            ]}
+            for day in days
+        ]
+        response.json.return_value = {"data": {"weather": weather}}
+    return response
+
+@pytest.fixture
+def api_env(monkeypatch, tmp_path):
+    """Dummy API keys, with the response cache, quota state and watermarks kept in a temp dir."""
+    monkeypatch.setenv("DEMAND_API_KEY", "test")
+    monkeypatch.setenv("WEATHER_API_KEY", "test")
+    monkeypatch.setenv("DATA_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("QUOTA_STATE_PATH", str(tmp_path / "quota_state.json"))
+    monkeypatch.setenv("WATERMARK_STATE_PATH", str(tmp_path / "watermarks.json"))
+    return tmp_path
+
+def test_generate_dataset_concurrent_matches_serial(api_env):
+    zones = {"ZONA": [42.8864, -78.8784], "ZONB": [43.1566, -77.6088]}
+
+    with patch("dataset.scripts.http_client.requests.Session.get", side_effect=fake_api_get):
+        data_obj = DataCollector()
+        serial_map = data_obj.generate_dataset(zones, "28-12-2019", "03-01-2020")
+        concurrent_map = data_obj.generate_dataset(zones, "28-12-2019", "03-01-2020", concurrent=True,
+                                                   max_workers={"demand": 2, "weather": 3})
+
+    assert list(concurrent_map.keys()) == list(serial_map.keys())
+    for zone in zones:
+        pd.testing.assert_frame_equal(concurrent_map[zone], serial_map[zone])
+    assert len(serial_map["ZONA"]) == 14, f"Expected 14 merged rows but got {len(serial_map['ZONA'])}"
+
+def test_get_data_from_api_collects_regions_in_parallel(api_env):
+    regions = {
+        "new_york": {"ZONA": [42.8864, -78.8784], "ZONB": [43.1566, -77.6088]},
+        "new_england": {"4001": [43.661471, -70.255326]},
+    }
+
+    with patch("dataset.scripts.http_client.requests.Session.get", side_effect=fake_api_get):
+        data_obj = DataCollector()
+        combined_df = data_obj.get_data_from_api(regions, "01-01-2020", "03-01-2020", today_flag=0, max_region_workers=2)
+        expected = [
+            pd.concat(data_obj.generate_dataset(zones, "01-01-2020", "03-01-2020").values(), ignore_index=True).sort_values(by="datetime")
+            for zones in regions.values()
+        ]
+
+    pd.testing.assert_frame_equal(combined_df, pd.concat(expected, ignore_index=True))
+    assert combined_df["zone"].drop_duplicates().tolist()[-1] == "4001", "Regions should be combined in region order"
+
+def test_generate_dataset_streams_partitions(api_env):
+    zones = {"ZONA": [42.8864, -78.8784], "ZONB": [43.1566, -77.6088]}
+    output_dir = str(api_env / "lake")
+
+    with patch("dataset.scripts.http_client.requests.Session.get", side_effect=fake_api_get):
+        data_obj = DataCollector()
+        df_map = data_obj.generate_dataset(zones, "28-12-2019", "03-01-2020")
+        path_map = data_obj.generate_dataset(zones, "28-12-2019", "03-01-2020", concurrent=True, output_dir=output_dir)
+
+    from dataset.scripts.data_store import read_dataset
+
+    assert sorted(d for d in os.listdir(output_dir) if d.startswith("zone=")) == ["zone=ZONA", "zone=ZONB"]
+    assert all(os.path.exists(path) for paths in path_map.values() for path in paths)
+
+    expected = pd.concat(df_map.values(), ignore_index=True)
+    expected["datetime"] = pd.to_datetime(expected["datetime"])
+    expected = expected.sort_values(["zone", "datetime"], ignore_index=True)
+    df = read_dataset(output_dir)
+    pd.testing.assert_frame_equal(df.sort_values(["zone", "datetime"], ignore_index=True), expected, check_dtype=False)
+
+    # A rerun of the range upserts into the same dataset instead of duplicating it
+    with patch("dataset.scripts.http_client.requests.Session.get", side_effect=fake_api_get):
+        rerun = DataCollector().generate_dataset(zones, "28-12-2019", "03-01-2020", output_dir=output_dir)
+    assert all(paths == [] for paths in rerun.values()), "Unchanged slices should not be written again"
+    assert len(read_dataset(output_dir)) == len(expected)
+
+def test_http_client_retries_transient_errors():
+    from dataset.scripts.http_client import HTTPClient
+
+    failed, ok = MagicMock(status_code=503, headers={}), MagicMock(status_code=200, headers={})
+    client = HTTPClient(max_retries=3, backoff_factor=0)
+
+    with patch.object(client.session, "get", side_effect=[failed, failed, ok]) as mock_get:
+        response = client.get("https://api.eia.gov/v2/data/?api_key=secret")
+
+    assert response.status_code == 200, "Expected the request to succeed after retrying"
+    assert mock_get.call_count == 3, f"Expected 3 attempts but got {mock_get.call_count}"
+    stats = client.get_stats()["api.eia.gov/v2/data/"]
+    assert stats["calls"] == 3 and stats["retries"] == 2 and stats["status"]["503"] == 2
+
+def test_response_cache_serves_closed_periods(api_env):
+
+    with patch("dataset.scripts.http_client.requests.Session.get", side_effect=fake_api_get) as mock_get:
+        data_obj = DataCollector()
+        first = data_obj.get_demand_data("ZONA", "01-01-2020", "31-01-2020")
+        second = data_obj.get_demand_data("ZONA", "01-01-2020", "31-01-2020")
+
+    assert mock_get.call_count == 1, "Expected the closed period to be served from the cache"
+    pd.testing.assert_frame_equal(first, second)
+
+def test_response_cache_ttl_and_eviction(tmp_path):
+    from dataset.scripts.response_cache import ResponseCache
+
+    cache = ResponseCache(cache_dir=str(tmp_path), max_bytes=1000)
+    today = datetime.datetime.now().strftime("%Y-%m-%d")
+    assert cache.ttl_for("2020-01-01", "2020-01-31") is None, "Closed periods should never expire"
+    assert cache.ttl_for(today, today) == cache.open_ttl, "The current day should use the short TTL"
+    settling = (datetime.datetime.now() - datetime.timedelta(days=cache.settle_days)).strftime("%Y-%m-%d")
+    assert cache.ttl_for(settling, settling) == cache.recent_ttl, "Ranges still settling should expire"
+
+    cache.put("eia_demand", "ZONA", "2020-01-01", "2020-01-31", {"response": {"total": "0", "data": []}})
+    assert cache.get("eia_demand", "ZONA", "2020-01-01", "2020-01-31") is None, "Empty results should not be cached"
+
+    for i in range(10):
+        cache.put("eia_demand", f"ZON{i}", "2020-01-01", "2020-01-31", {"rows": "x" * 200})
+    assert cache.get_stats()["bytes"] <= 1000, "Cache should be evicted down to its size budget"
+    assert cache.get("eia_demand", "ZON9", "2020-01-01", "2020-01-31") is not None, "Newest entry should survive eviction"
+
+    # An entry evicted by another process between the read and the touch is still a hit
+    with patch("dataset.scripts.response_cache.os.utime", side_effect=FileNotFoundError):
+        assert cache.get("eia_demand", "ZON9", "2020-01-01", "2020-01-31") is not None
+
+def test_forecasts_use_their_own_quota(api_env):
+    from dataset.scripts.quota_scheduler import QuotaScheduler
+    response = MagicMock(status_code=200)
+    response.json.return_value = {"data": {"weather": [{"date": "2020-01-01", "hourly": []}]}}
+
+    with patch("dataset.scripts.http_client.requests.Session.get", return_value=response) as mock_get:
+        data_obj = DataCollector(use_cache=False)
+        data_obj.get_weather_data("42.8864,-78.8784", "01-01-2020", "01-01-2020", current=1)
+
+    assert "weather.ashx" in mock_get.call_args[0][0]
+    quota = QuotaScheduler()
+    assert quota.remaining("wwo_forecast") == quota.quotas["wwo_forecast"]["daily_budget"] - 1
+    assert quota.remaining("wwo_past_weather") == quota.quotas["wwo_past_weather"]["daily_budget"], "Forecasts should not use the backfill budget"
+
+def test_generate_dataset_defers_slices_over_budget(api_env):
+    from dataset.scripts.quota_scheduler import QuotaScheduler
+    zones = {"ZONA": [42.8864, -78.8784], "ZONB": [43.1566, -77.6088]}
+
+    with patch("dataset.scripts.http_client.requests.Session.get", side_effect=fake_api_get):
+        data_obj = DataCollector(use_cache=False)
+        data_obj._quota.quotas["eia_demand"] = {"rate": 100.0, "capacity": 10, "daily_budget": 1}
+        df_map = data_obj.generate_dataset(zones, "01-01-2020", "03-01-2020")
+
+    assert not df_map["ZONA"].empty, "First zone should be fetched within the budget"
+    assert df_map["ZONB"].empty, "Second zone should not be fetched once the budget is spent"
+    deferred = QuotaScheduler().pop_deferred()
+    assert deferred == [{"zone": "ZONB", "start": "01-01-2020", "end": "03-01-2020"}], f"Unexpected deferred work: {deferred}"
+
+
+def test_process_weather_data_builds_hourly_datetimes():
+    hour = lambda t, extra: {"time": t, "tempC": "1", "windspeedKmph": "2", "weatherIconUrl": [], "weatherDesc": [],
+                             "winddirDegree": "3", "winddir16Point": "N", "precipMM": "0.1", **extra}
+    df_weather = pd.DataFrame([
+        {"date": "2020-01-01", "hourly": [hour("0", {}), hour("100", {})]},
+        {"date": "2020-01-02", "hourly": [hour("1300", {})]},
+    ])
+    df_mixed = pd.DataFrame([
+        {"date": "2020-01-01", "hourly": [hour("0", {}), hour("900", {"uvIndex": "4"})]},
+    ])
+
+    df = DataCollector(use_cache=False).process_weather_data(df_weather)
+    assert df["datetime"].tolist() == ["2020-01-01T00", "2020-01-01T01", "2020-01-02T13"], f"Unexpected datetimes: {df['datetime'].tolist()}"
+    assert df.columns.tolist() == ["datetime", "precipMM"], f"Unused weather fields should be dropped, got {df.columns.tolist()}"
+
+    df = DataCollector(use_cache=False).process_weather_data(df_mixed)
+    assert df.columns.tolist() == ["datetime", "precipMM", "uvIndex"], "Fields missing from some hours should still become columns"
+    assert df["datetime"].tolist() == ["2020-01-01T00", "2020-01-01T09"]
+
+def test_watermark_filter_only_passes_new_rows(api_env):
+    history_path = str(api_env / "data_raw.csv")
+    pd.DataFrame({
+        "datetime": ["2020-01-01 00:00:00", "2020-01-01 01:00:00", "2020-01-01 00:00:00"],
+        "zone": ["ZONA", "ZONA", "ZONB"],
+        "value": [1, 2, 3],
+    }).to_csv(history_path, index=False)
+    api_json = json.dumps([
+        {"datetime": "2020-01-01T01", "zone": "ZONA", "value": 2},
+        {"datetime": "2020-01-01T02", "zone": "ZONA", "value": 4},
+        {"datetime": "2020-01-01T01", "zone": "ZONB", "value": 5},
+        {"datetime": "2020-01-01T00", "zone": "ZONC", "value": 6},
+    ])
+
+    # First run: watermarks are bootstrapped from the history, then only the delta is appended
+    new_json = filter_new_data(api_json, history_path)
+    new_df = pd.read_json(new_json)
+    assert new_df["value"].tolist() == [4, 5, 6], f"Expected only rows past the watermarks, got {new_df['value'].tolist()}"
+
+    append_data(new_json, history_path)
+    update_watermarks(new_json)
+    history_df = pd.read_csv(history_path)
+    assert history_df["value"].tolist() == [1, 2, 3, 4, 5, 6], "Delta rows should be appended after the history"
+    assert history_df.columns.tolist() == ["datetime", "zone", "value"], "Appended rows should follow the file header"
+
+    # Second run over the same window: nothing new
+    assert not has_new_data(filter_new_data(api_json, history_path)), "Rows at or before the watermarks should be dropped"
+
+def test_revised_rows_pass_the_watermark_filter(api_env):
+    from dataset.scripts.data_store import write_dataset, read_dataset
+    dataset_path = str(api_env / "data_raw")
+    write_dataset(dataset_path, pd.DataFrame({
+        "datetime": ["2020-01-01T00", "2020-01-01T01"],
+        "zone": ["ZONA", "ZONA"],
+        "subba-name": ["Zone A", "Zone A"],
+        "value": [1.0, 2.0],
+    }))
+    api_json = json.dumps([
+        {"datetime": "2020-01-01T00", "zone": "ZONA", "subba-name": "Zone A", "value": 1.0},
+        {"datetime": "2020-01-01T01", "zone": "ZONA", "subba-name": "Zone A", "value": 2.5},
+        {"datetime": "2020-01-01T02", "zone": "ZONA", "subba-name": "Zone A", "value": 3.0},
+    ])
+
+    new_json = filter_new_data(api_json, dataset_path)
+    assert pd.read_json(new_json)["value"].tolist() == [2.5, 3.0], "The revised row should pass with the new one"
+
+    merge_data(new_json, dataset_path)
+    update_watermarks(new_json)
+    assert read_dataset(dataset_path)["value"].tolist() == [1.0, 2.5, 3.0], "The revised row should replace the stored one"
+    assert not has_new_data(filter_new_data(api_json, dataset_path)), "Merged revisions should not pass again"
+
+def test_replay_server_drives_collector_with_injected_errors(api_env, monkeypatch):
+    from dataset.scripts.replay_server import ReplayServer
+    zones = {"ZONA": [42.8864, -78.8784]}
+
+    with ReplayServer(mode="synthetic", error_rate=0.3, error_statuses=(503,), seed=1) as server:
+        for name, value in server.env().items():
+            monkeypatch.setenv(name, value)
+        df_map = DataCollector().generate_dataset(zones, "01-01-2020", "03-01-2020")
+        stats = server.get_stats()
+
+    assert len(df_map["ZONA"]) == 72, f"Expected 3 days of hourly rows but got {len(df_map['ZONA'])}"
+    injected = sum(service["injected_errors"] for service in stats.values())
+    assert injected > 0, "Injected errors should have been retried by the client"
+
+def test_replay_server_records_then_replays(api_env):
+    import requests
+    from dataset.scripts.replay_server import ReplayServer
+    record_dir = str(api_env / "replay")
+    path = "/v2/electricity/rto/region-sub-ba-data/data/?api_key=secret&facets[subba][]=ZONA&start=2020-01-01&end=2020-01-01"
+
+    with ReplayServer(mode="synthetic") as upstream:
+        with ReplayServer(mode="record", record_dir=record_dir, upstreams={"eia_demand": upstream.url}) as recorder:
+            recorded = requests.get(recorder.url + path).json()
+
+    with ReplayServer(mode="replay", record_dir=record_dir, fallback_synthetic=False) as replay:
+        assert requests.get(replay.url + path.replace("secret", "other")).json() == recorded, "Replay should ignore the api key"
+        assert requests.get(replay.url + path.replace("ZONA", "ZONB")).status_code == 404, "Unrecorded requests should miss"
+
+    for root, _, files in os.walk(record_dir):
+        for name in files:
+            assert "secret" not in open(os.path.join(root, name)).read(), "Api keys must not be written to recordings"
+
+def test_data_store_projection_and_pushdown(api_env):
+    from dataset.scripts.data_store import ParquetDataStore
+    store = ParquetDataStore(str(api_env / "store"))
+    df = pd.DataFrame({
+        "datetime": pd.date_range("2020-01-31", periods=48, freq="h").strftime("%Y-%m-%dT%H"),
+        "zone": ["4001", "ZONA"] * 24,
+        "subba-name": ["North Zone", "Zone A"] * 24,
+        "value": np.arange(48),
+    })
+    store.write("data_raw", df.iloc[:30])
+    store.write("data_raw", df.iloc[30:], mode="append")
+
+    assert sorted(os.listdir(store.path("data_raw"))) == ["_schema.json", "zone=4001", "zone=ZONA"]
+    full_df = store.read("data_raw")
+    assert full_df.columns.tolist() == ["datetime", "zone", "subba-name", "value"], "The derived month key should be dropped"
+    assert full_df["zone"].tolist() == ["4001"] * 24 + ["ZONA"] * 24, "Zones should keep their string dtype"
+    assert full_df.groupby("zone")["datetime"].is_monotonic_increasing.all(), "Appended files should be read back in time order"
+
+    part_df = store.read("data_raw", columns=["datetime", "value"], filters=[("zone", "=", "ZONA")], start="2020-02-01", end="2020-02-01T06")
+    assert part_df.columns.tolist() == ["datetime", "value"]
+    assert part_df["value"].tolist() == [25, 27, 29], f"Expected the ZONA rows of [start, end) but got {part_df['value'].tolist()}"
+
+def test_append_data_to_dataset(api_env):
+    from dataset.scripts.data_store import write_dataset, read_dataset
+    dataset_path = str(api_env / "data_raw")
+    write_dataset(dataset_path, pd.DataFrame({"datetime": ["2020-01-01T00"], "zone": ["ZONA"], "value": [1]}))
+    api_json = json.dumps([{"datetime": "2020-01-01T01", "zone": "ZONA", "value": 2.5}])
+
+    new_json = filter_new_data(api_json, dataset_path)
+    append_data(new_json, dataset_path)
+    df = read_dataset(dataset_path)
+    assert df["value"].tolist() == [1, 2.5], "New rows should be appended to the dataset"
+    assert read_dataset(dataset_path, columns=["zone"]).columns.tolist() == ["zone"]
+
+def test_merge_data_upserts_by_key(api_env, monkeypatch):
+    from dataset.scripts.data_store import ParquetDataStore, read_dataset
+    dataset_path = str(api_env / "data_raw")
+    history = pd.DataFrame({
+        "datetime": ["2020-01-01T00", "2020-01-01T01", "2020-02-01T00", "2020-01-01T00"],
+        "zone": ["ZONA", "ZONA", "ZONA", "ZONB"],
+        "subba-name": ["Zone A", "Zone A", "Zone A", "Zone B"],
+        "value": [1, 2, 3, 4],
+    })
+    merge_data(history.to_json(orient="records"), dataset_path)
+
+    reads = []
+    original_read_partition = ParquetDataStore.read_partition
+    def read_partition(self, name, key, columns=None):
+        reads.append(key)
+        return original_read_partition(self, name, key, columns)
+    monkeypatch.setattr(ParquetDataStore, "read_partition", read_partition)
+
+    api_json = json.dumps([
+        {"datetime": "2020-01-01T01", "zone": "ZONA", "subba-name": "Zone A", "value": 20},
+        {"datetime": "2020-01-01T00", "zone": "ZONB", "subba-name": "Zone B", "value": 4},
+        {"datetime": "2020-01-01T01", "zone": "ZONB", "subba-name": "Zone B", "value": 5},
+    ])
+    merge_data(api_json, dataset_path)
+    df = read_dataset(dataset_path)
+    assert df["value"].tolist() == [1, 20, 3, 4, 5], "New keys should be appended and changed rows replaced"
+    assert reads == [{"zone": "ZONA", "subba-name": "Zone A", "month": "2020-01"}], "Only the partition of the changed row should be read"
+
+    # Rows appended without the index, e.g. by append_data, only rescan their partition
+    reads.clear()
+    append_data(api_json, dataset_path)
+    redundant_removal(dataset_path)
+    df = read_dataset(dataset_path)
+    assert df["value"].tolist() == [1, 20, 3, 4, 5], "Repeated keys should be dropped, rows of zones sharing a timestamp kept"
+    assert {key["month"] for key in reads} == {"2020-01"}, "Partitions the append did not touch should not be read"
+
+def test_dvc_download_pulls_each_version_once(monkeypatch, tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+    from dataset.scripts.dvc_manager import DVCManager
+    monkeypatch.setenv("DVC_OBJECT_CACHE_DIR", str(tmp_path / "dvc_cache"))
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    (data_dir / "data_raw.csv.dvc").write_text("outs:\n- md5: 95613f6cd3ae0eb60fbd11beedfae820\n  path: data_raw.csv\n")
+    (data_dir / "other.csv").write_text("a\n1\n")
+
+    import fcntl
+    pulls, unlocked = [], []
+    def fake_dvc(command, check=False):
+        if command[1] in ("pull", "add", "push"):
+            # Every dvc command runs under the repo-wide lock
+            with open(tmp_path / "dvc_cache" / "_dvc.lock", "w") as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    unlocked.append(command[1])
+                except BlockingIOError:
+                    pass
+        if command[:2] == ["dvc", "pull"]:
+            pulls.append(command[2:])
+            (data_dir / "data_raw.csv").write_text("zone,value\nZONA,1\nZONB,2\n")
+        if command[:2] == ["dvc", "add"]:
+            (data_dir / "data_raw.csv.dvc").write_text("outs:\n- md5: 0123456789abcdef0123456789abcdef\n  path: data_raw.csv\n")
+        return MagicMock(returncode=0)
+
+    with patch("dataset.scripts.dvc_manager.subprocess.run", side_effect=fake_dvc):
+        dvc_manager = DVCManager()
+        dvc_manager.data_dir = str(data_dir)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda _: dvc_manager.download_data_from_dvc("data_raw.csv", save_local=1), range(4)))
+        assert pulls == [["--force", str(data_dir / "data_raw.csv.dvc")]], "Only the target should be pulled, and only once"
+        assert all(df["value"].tolist() == [1, 2] for df, _ in results)
+
+        # A task modified the local copy: it is restored from the cache, not pulled again
+        (data_dir / "data_raw.csv").write_text("zone,value\nZONA,1\n")
+        df, _ = dvc_manager.download_data_from_dvc("data_raw.csv", save_local=0)
+        assert df["value"].tolist() == [1, 2] and len(pulls) == 1
+        assert not (data_dir / "data_raw.csv").exists() and (data_dir / "other.csv").exists(), "Only the target should be deleted"
+
+        # The pushed version is cached: the next download restores it without a pull
+        (data_dir / "data_raw.csv").write_text("zone,value\nZONA,3\n")
+        dvc_manager.push_file_to_dvc(str(data_dir / "data_raw.csv"))
+        df, _ = dvc_manager.download_data_from_dvc("data_raw.csv", save_local=0)
+        assert df["value"].tolist() == [3] and len(pulls) == 1
+    assert unlocked == [], f"dvc {unlocked} ran without the dvc lock"
 
 # ----------------------------------------------------------
 # data_preprocess.py
@@ -90,6 +480,42 @@ def test_clean_data():
     assert df_cleaned.isnull().sum().sum() == 0, "Missing values were not removed"
     assert len(df_cleaned) == 3, f"Expected 3 rows after removing duplicates, but got {len(df_cleaned)}"
 
+def test_tasks_pass_artifact_references(monkeypatch, tmp_path):
+    from types import SimpleNamespace
+    from dags.src.artifact_store import cleanup_artifacts, is_reference
+    from dags.src.data_drift import pull_frames
+    monkeypatch.setenv("ARTIFACT_STORE_DIR", str(tmp_path / "artifacts"))
+    df = pd.DataFrame({
+        "datetime": pd.to_datetime(["2024-01-01 00:00", "2024-01-01 01:00", "2024-01-01 02:00", "2024-01-01 03:00", "2024-01-01 00:00"]),
+        "col1": [1, 2, None, 3, 1],
+        "col2": [4, 5, 6, 5, 4],
+    })
+    xcom = {}
+    ti = SimpleNamespace(
+        dag_id="test_dag", run_id="manual__2024-01-01T00:00:00+00:00",
+        xcom_push=lambda key, value: xcom.__setitem__(key, value),
+        xcom_pull=lambda key, task_ids: xcom[key],
+    )
+
+    reference = clean_data(df.to_json(orient="records"), ti=ti)
+    assert is_reference(reference) and reference["rows"] == 3
+    assert len(json.dumps(reference)) < 500, "Only a small reference should go to XCom"
+    cleaned = load_frame(reference)
+    assert pd.api.types.is_datetime64_any_dtype(cleaned["datetime"]), "Artifacts should keep the dtypes"
+    pd.testing.assert_frame_equal(cleaned, load_frame(clean_data(df, ti=None)), check_dtype=False)
+    assert has_new_data(reference)
+
+    # The drift tasks read the frames load_data stored
+    ti.xcom_push(key="baseline_df", value=save_task_frame(df.iloc[1:], "baseline_df", ti=ti))
+    ti.xcom_push(key="new_data_df", value=save_task_frame(df.iloc[:1], "new_data_df", ti=ti))
+    baseline_df, new_data_df = pull_frames(ti)
+    assert len(baseline_df) == 4 and len(new_data_df) == 1
+
+    assert cleanup_artifacts(ti=ti) == 3
+    assert not os.listdir(tmp_path / "artifacts" / "test_dag")
+    with pytest.raises(FileNotFoundError):
+        load_frame(reference)
+
 def test_engineer_features():
     df_json = pd.DataFrame({
         "tempF": [70, 71, 69, 68, 72, 74, 73, 75, 76, 78],
@@ -121,6 +547,55 @@ def test_engineer_features():
     expected_rows = len(pd.read_json(df_json)) - max(6, 6)  
     assert len(df_engineered) == expected_rows, f"Expected {expected_rows} rows, but got {len(df_engineered)}"
 
+def test_daily_delta_keeps_all_rows(api_env):
+    from dataset.scripts.benchmark import make_raw_frame
+    from dataset.scripts.data_store import write_dataset
+    df_raw = make_raw_frame(96, zones=("ZONA", "ZONB"))
+    history, delta = df_raw[df_raw["datetime"] < "2019-01-02"], df_raw[df_raw["datetime"] >= "2019-01-02"]
+    dataset_path = str(api_env / "data_raw")
+    write_dataset(dataset_path, history)
+
+    # The new data DAG tasks, from the filtered delta to the cyclic features
+    df_json = clean_data(delta.to_json(orient="records"))
+    df_json = engineer_features(df_json, dataset_path)
+    df_features = load_frame(add_cyclic_features(df_json))
+    assert len(df_features) == 48, f"Expected every row of the 24h x 2 zones delta, got {len(df_features)}"
+
+    expected = DataPreprocessor().engineer_features_df(df_raw)
+    expected = expected[expected["datetime"] >= "2019-01-02"].sort_values(["zone", "datetime"], ignore_index=True)
+    df_features = df_features.sort_values(["zone", "datetime"], ignore_index=True)
+    pd.testing.assert_frame_equal(df_features[["tempF_rolling_std", "humidity_lag_6"]], expected[["tempF_rolling_std", "humidity_lag_6"]], check_dtype=False)
+
+    # A delta past the lookback of the stored rows has no context, its series start over
+    late = delta.assign(datetime=(pd.to_datetime(delta["datetime"]) + pd.Timedelta(days=16)).dt.strftime("%Y-%m-%dT%H"))
+    assert DataPreprocessor().history_context_df(late, dataset_path) is None
+    df_late = load_frame(engineer_features(clean_data(late.to_json(orient="records")), dataset_path))
+    assert len(df_late) == 36, "Without stored history the first window of each series is dropped"
+
+def test_feature_engine_keeps_series_apart():
+    from dataset.scripts.feature_engine import FeatureEngine
+    df = pd.DataFrame({
+        "datetime": list(pd.date_range("2024-01-01", periods=10, freq="h")) * 2,
+        "subba-name": ["A"] * 10 + ["B"] * 10,
+        "zone": "ZONA",
+        "tempF": np.arange(20, dtype=float),
+    }).sample(frac=1, random_state=0)
+    engine = FeatureEngine(columns=("tempF",), windows=(3, 5), lags=(2,))
+
+    df_features = engine.transform(df)
+    df_b = df_features[df_features["subba-name"] == "B"].sort_values("datetime")
+    assert df_features.index.equals(df.index), "Rows should come back in the input order"
+    assert df_b["tempF_rolling_mean"].isna().sum() == 2, "Windows should not reach into the previous series"
+    assert df_b["tempF_rolling_mean"].iloc[2] == 11.0
+    assert df_b["tempF_rolling_mean_5"].iloc[4] == 12.0
+    assert df_b["tempF_lag_2"].iloc[2] == 10.0
+
+    # Chunk by chunk with the tail of the previous chunk as context gives the same features
+    df_sorted = df.sort_values("datetime", kind="stable")
+    first, second = df_sorted.iloc[:7], df_sorted.iloc[7:]
+    df_chunked = pd.concat([engine.transform(first), engine.transform(second, context=engine.tail(first))])
+    pd.testing.assert_frame_equal(df_chunked.loc[df.index], df_features)
+
 def test_add_cyclic_features():
     df_json = pd.DataFrame({
         "datetime": [
@@ -178,7 +653,261 @@ def test_normalize_and_encode():
     unique_encoded_values = sorted(df_normalized['category'].unique())
     expected_labels = [0, 1, 2]  # Based on ["A", "B", "C"]
     assert unique_encoded_values == expected_labels, f"Unexpected label encoding: {unique_encoded_values}"
-    
+
+def test_feature_transformer_fits_chunks_and_round_trips(tmp_path):
+    from dataset.scripts.feature_transformer import FeatureTransformer
+    df = pd.DataFrame({
+        "value": [100, 400, 250, 1000],
+        "tempF": [60.0, 70.5, 80.0, 90.0],
+        "month_sin": [0.5, -0.5, 0.5, -0.5],
+        "category": ["B", "A", "C", "A"],
+    })
+    transformer = FeatureTransformer()
+    for chunk in (df.iloc[:2], df.iloc[2:]):
+        transformer.partial_fit(chunk)
+
+    # Chunk by chunk fitting gives the scaling of one fit over the whole frame
+    expected = FeatureTransformer().fit_transform(df)
+    pd.testing.assert_frame_equal(transformer.transform(df), expected)
+    assert expected["category"].tolist() == [1, 0, 2, 0]
+
+    loaded = FeatureTransformer.load(transformer.save(str(tmp_path / "feature_transformer.json")))
+    pd.testing.assert_frame_equal(loaded.transform(df), expected)
+    assert loaded.transform(pd.DataFrame({"category": ["D"]}))["category"].tolist() == [-1]
+    np.testing.assert_allclose(loaded.inverse_transform(expected["value"].to_numpy()), df["value"])
+
+    with open(tmp_path / "old.json", "w") as f:
+        json.dump({**loaded.to_dict(), "version": 0}, f)
+    with pytest.raises(ValueError):
+        FeatureTransformer.load(str(tmp_path / "old.json"))
+
+def test_transform_df_matches_json_stages():
+    from dataset.scripts.benchmark import make_raw_frame, legacy_preprocess
+    df_raw = make_raw_frame(120)
+    # API weather values arrive as strings, the JSON stages parsed them into numbers
+    df_raw["tempF"] = df_raw["tempF"].astype(str)
+    preprocess_obj = DataPreprocessor()
+
+    expected = legacy_preprocess(preprocess_obj, df_raw)
+    result = preprocess_obj.transform_df(df_raw)
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+def test_streaming_preprocess_matches_in_memory_run(tmp_path):
+    from dataset.scripts.benchmark import make_raw_frame
+    from dataset.scripts.streaming_preprocess import StreamingPreprocessor
+    df_raw = make_raw_frame(600, zones=("1", "ZONB"))
+    # Duplicates in a later chunk, series interleaved in time order as in data_raw
+    df_raw = pd.concat([df_raw, df_raw.iloc[40:60]]).sort_values("datetime", kind="stable")
+    raw_path = tmp_path / "data_raw.csv"
+    df_raw.to_csv(raw_path, index=False)
+
+    df_whole = pd.read_csv(raw_path)
+    for col in ["datetime", "zone", "subba-name"]:
+        df_whole[col] = df_whole[col].astype(str)
+    expected_path = tmp_path / "expected.csv"
+    DataPreprocessor().transform_df(df_whole).to_csv(expected_path, index=False)
+
+    output_path = StreamingPreprocessor(DataPreprocessor(), chunk_rows=45).run(str(raw_path))
+    assert output_path == str(tmp_path / "data_preprocess.csv")
+    assert open(output_path).read() == open(expected_path).read(), "Streaming output should match the in-memory run"
+    assert not [name for name in os.listdir(tmp_path) if name.startswith(".preprocess-")], "Work directory left behind"
+
+def test_parallel_preprocess_matches_serial_run(tmp_path):
+    from dataset.scripts.benchmark import make_raw_frame
+    df_raw = make_raw_frame(400, zones=("ZONA", "ZONB", "ZONC", "1")).sort_values("datetime", kind="stable")
+    for name in ["serial", "parallel"]:
+        (tmp_path / name).mkdir()
+        df_raw.to_csv(tmp_path / name / "data_raw.csv", index=False)
+
+    serial_path = DataPreprocessor().preprocess_pipeline(str(tmp_path / "serial" / "data_raw.csv"))
+    parallel_path = DataPreprocessor().preprocess_pipeline(str(tmp_path / "parallel" / "data_raw.csv"), max_workers=2)
+    assert open(parallel_path).read() == open(serial_path).read(), "Partitions should be merged in the serial order"
+    assert sorted(os.listdir(tmp_path / "parallel")) == ["data_preprocess.csv", "data_raw.csv", "feature_transformer.json"]
+
+def test_statistics_store_renormalizes_stale_partitions(tmp_path):
+    from dataset.scripts.data_store import write_dataset, read_dataset
+    from dataset.scripts.statistics_store import ColumnStatistics, FeatureStatistics, StatisticsStore
+    features = pd.DataFrame({
+        "datetime": pd.date_range("2024-01-30", periods=6, freq="D"),
+        "zone": [0, 0, 0, 1, 1, 1],
+        "value": [10.0, 20.0, 30.0, 40.0, 50.0, 60.0],
+    })
+    history, batch = features.iloc[:4], features.iloc[4:].assign(value=[50.0, 90.0])
+
+    # Chunk statistics merge into the statistics of the whole column
+    merged = ColumnStatistics().merge(FeatureStatistics().fold(history).columns["value"])
+    merged.merge(FeatureStatistics().fold(batch).columns["value"])
+    values = pd.concat([history, batch])["value"]
+    assert (merged.count, merged.minimum, merged.maximum) == (6, 10.0, 90.0)
+    assert np.isclose(merged.mean, values.mean()) and np.isclose(merged.variance, values.var())
+
+    dataset_path = str(tmp_path / "data_preprocess")
+    statistics = FeatureStatistics().fold(history)
+    write_dataset(dataset_path, statistics.transformer().transform(history))
+    store = StatisticsStore(dataset_path)
+    assert store.reset(statistics) == 1 and store.stale_partitions() == []
+
+    # Folding the batch moves the max; a retried fold of the same batch is skipped
+    assert store.fold(batch) == 2 and store.fold(batch) == 2
+    rewritten = store.renormalize()
+    assert rewritten == ["zone=0/month=2024-01", "zone=0/month=2024-02", "zone=1/month=2024-02"]
+    assert store.renormalize() == [], "Current partitions should not be rewritten"
+
+    expected = FeatureStatistics().fold(pd.concat([history, batch])).transformer().transform(history)
+    np.testing.assert_allclose(read_dataset(dataset_path)["value"], expected["value"])
+
+    # Bounds that moved only for features the dataset does not store rewrite nothing
+    assert store.fold(batch.assign(value=55.0, tempF=[70.0, 80.0])) == 3
+    assert store.stale_partitions() and store.renormalize() == []
+    assert store.stale_partitions() == []
+    np.testing.assert_allclose(read_dataset(dataset_path)["value"], expected["value"])
+
+def test_statistics_preview_keeps_stored_codes(tmp_path):
+    from dataset.scripts.data_store import write_dataset
+    from dataset.scripts.statistics_store import FeatureStatistics, StatisticsStore
+    history = pd.DataFrame({
+        "datetime": pd.date_range("2024-01-01", periods=4, freq="h"),
+        "zone": ["4001", "4001", "ZONB", "ZONB"],
+        "value": [10.0, 20.0, 30.0, 40.0],
+    })
+    delta = pd.DataFrame({"datetime": pd.date_range("2024-01-02", periods=2, freq="h"), "zone": ["4001", "ZONA"], "value": [15.0, 25.0]})
+    dataset_path = str(tmp_path / "data_preprocess")
+    statistics = FeatureStatistics().fold(history)
+    write_dataset(dataset_path, statistics.transformer().transform(history))
+    store = StatisticsStore(dataset_path)
+    store.reset(statistics)
+
+    stored_codes = statistics.transformer().transform(history)["zone"].tolist()
+    previewed = store.preview(delta).transformer()
+    assert previewed.transform(history)["zone"].tolist() == stored_codes, "Stored labels should keep their codes"
+    assert previewed.transform(delta)["zone"].tolist() == [stored_codes[0], -1], "Unseen labels should encode as -1"
+    assert store.statistics().classes["zone"] == {"4001", "ZONB"}
+
+def test_update_statistics_versions_the_transformer_with_the_dataset(tmp_path, monkeypatch):
+    from dataset.scripts.data_store import write_dataset
+    from dataset.scripts.feature_transformer import FeatureTransformer, DEFAULT_TRANSFORMER_PATH, current_transformer_path
+    from dataset.scripts.statistics_store import FeatureStatistics, StatisticsStore
+    history = pd.DataFrame({"datetime": pd.date_range("2024-01-01", periods=3, freq="h"), "zone": ["ZONA"] * 3, "value": [10.0, 20.0, 30.0]})
+    batch = pd.DataFrame({"datetime": pd.date_range("2024-01-02", periods=2, freq="h"), "zone": ["ZONA"] * 2, "value": [40.0, 90.0]})
+    statistics = FeatureStatistics().fold(history)
+    dataset_path = str(tmp_path / "data_preprocess")
+    write_dataset(dataset_path, statistics.transformer().transform(history))
+    store = StatisticsStore(dataset_path)
+    store.reset(statistics)
+
+    with open(DEFAULT_TRANSFORMER_PATH) as f:
+        tracked = f.read()
+    update_statistics(batch, dataset_path)
+    with open(DEFAULT_TRANSFORMER_PATH) as f:
+        assert f.read() == tracked, "The tracked transformer should not be rewritten by the DAG"
+    assert FeatureTransformer.load(store.transformer_path).maximums["value"] == 90.0
+
+    monkeypatch.setenv("FEATURE_TRANSFORMER_PATH", store.transformer_path)
+    assert current_transformer_path() == store.transformer_path
+
+def test_merge_preprocessed_data_keys_on_stored_codes(tmp_path):
+    from dataset.scripts.data_store import write_dataset, read_dataset
+    from dataset.scripts.statistics_store import FeatureStatistics, StatisticsStore
+    history = pd.DataFrame({
+        "datetime": pd.to_datetime(["2024-01-01 00:00", "2024-01-01 00:00"]),
+        "zone": ["4001", "ZONB"],
+        "value": [10.0, 40.0],
+    })
+    delta = pd.DataFrame({
+        "datetime": pd.to_datetime(["2024-01-01 00:00", "2024-01-01 01:00", "2024-01-01 01:00"]),
+        "zone": ["4001", "ZONA", "ZONC"],
+        "value": [20.0, 30.0, 35.0],
+    })
+    statistics = FeatureStatistics().fold(history)
+    dataset_path = str(tmp_path / "data_preprocess")
+    write_dataset(dataset_path, statistics.transformer().transform(history))
+    store = StatisticsStore(dataset_path)
+    store.reset(statistics)
+
+    # The revised row of a stored zone replaces it, the two unseen zones (both -1) are both kept
+    merge_preprocessed_data(store.preview(delta).transformer().transform(delta), dataset_path)
+    df = read_dataset(dataset_path)
+    assert len(df) == 4 and df["zone"].tolist().count(-1) == 2
+    assert (df["zone"] == 0).sum() == 1, "The revised row should replace the stored one"
+
+    # Without statistics the codes are fitted per batch, rows are only appended
+    other_path = str(tmp_path / "other")
+    write_dataset(other_path, FeatureStatistics().fold(history).transformer().transform(history))
+    batch = delta.iloc[1:].assign(datetime=history["datetime"].iloc[0])
+    merge_preprocessed_data(FeatureStatistics().fold(batch).transformer().transform(batch), other_path)
+    assert len(read_dataset(other_path)) == 4, "Batch codes should not overwrite the rows of other zones"
+
+def test_feature_store_refreshes_incrementally(tmp_path):
+    from dataset.scripts.benchmark import make_raw_frame
+    from dataset.scripts.feature_store import FeatureStore
+    df_raw = make_raw_frame(400, zones=("1", "ZONB")).sort_values("datetime", kind="stable")
+    for col in ["datetime", "zone", "subba-name"]:
+        df_raw[col] = df_raw[col].astype(str)
+    expected = DataPreprocessor().features_df(df_raw).drop(columns=["datetime_1"])
+    expected["zone"] = expected["zone"].astype(str)
+    expected = expected.sort_values(["zone", "subba-name", "datetime"]).reset_index(drop=True)
+
+    # The middle batch arrives late and is refreshed twice
+    store = FeatureStore(str(tmp_path / "feature_store.sqlite"), DataPreprocessor())
+    for start, end in [(0, 200), (300, 400), (200, 300), (200, 300)]:
+        store.refresh(df_raw.iloc[start:end])
+    pd.testing.assert_frame_equal(store.load()[expected.columns], expected, check_dtype=False)
+
+    as_of = pd.Timestamp("2019-01-03 10:30")
+    assert store.load(end=as_of)["datetime"].max() == as_of.floor("h")
+    latest = store.lookup("ZONB", as_of=as_of)
+    assert latest[["subba-name", "datetime"]].values.tolist() == [["Zone ZONB", as_of.floor("h")]]
+    assert store.lookup("unknown").empty
+
+def test_dtype_plan_compacts_preprocessed_frame():
+    from dataset.scripts.dtype_plan import apply_dtype_plan, dtype_plan, memory_report
+    df = pd.DataFrame({
+        "datetime": ["2024-01-01T00", "2024-01-01T01", "2024-01-01T02", "2024-01-01T03"],
+        "value": [0.1, 0.25, 0.5, 1.0],
+        "zone": ["ZONA", "ZONA", "4001", "4001"],
+        "subba-name": [0, 1, 1, 300],
+    })
+    assert dtype_plan(df) == {"datetime": "datetime64[ns]", "value": "float32", "zone": "category", "subba-name": "int16"}
+    assert dtype_plan(df, chunked=True) == {"datetime": "datetime64[ns]", "value": "float32"}
+
+    compact = apply_dtype_plan(df)
+    assert compact["datetime"].iloc[1] == pd.Timestamp("2024-01-01 01:00")
+    assert compact["zone"].tolist() == df["zone"].tolist()
+    np.testing.assert_allclose(compact["value"], df["value"], rtol=1e-7)
+    assert dtype_plan(compact) == {}, "A compact frame should have nothing left to plan"
+
+    report = memory_report(df)
+    assert report.loc["total", "compact_bytes"] < report.loc["total", "bytes"]
+
+def test_polars_engine_matches_pandas_engine(tmp_path):
+    pytest.importorskip("polars")
+    from dataset.scripts.benchmark import make_raw_frame
+    from dataset.scripts.feature_transformer import FeatureTransformer
+    df_raw = make_raw_frame(600, zones=("1", "ZONB", "ZONC"))
+    df_raw = pd.concat([df_raw, df_raw.iloc[40:60]]).sort_values("datetime", kind="stable")
+    for col in ["datetime", "zone", "subba-name"]:
+        df_raw[col] = df_raw[col].astype(str)
+
+    expected = DataPreprocessor(engine="pandas").transform_df(df_raw)
+    result = DataPreprocessor(engine="polars").transform_df(df_raw)
+    pd.testing.assert_frame_equal(result, expected, rtol=1e-5)
+
+    for name in ["pandas", "polars"]:
+        (tmp_path / name).mkdir()
+        df_raw.to_csv(tmp_path / name / "data_raw.csv", index=False)
+    # The streaming run keeps the input row order, as the lazy query
+    pandas_path = DataPreprocessor().preprocess_pipeline(str(tmp_path / "pandas" / "data_raw.csv"), chunk_by_subba=False)
+    polars_obj = DataPreprocessor(engine="polars")
+    polars_path = polars_obj.preprocess_pipeline(str(tmp_path / "polars" / "data_raw.csv"))
+    pd.testing.assert_frame_equal(pd.read_csv(polars_path), pd.read_csv(pandas_path), rtol=1e-5)
+    expected_transformer = FeatureTransformer.load(str(tmp_path / "pandas" / "feature_transformer.json"))
+    assert polars_obj.transformer.classes == expected_transformer.classes
+    assert polars_obj.transformer.minimums == pytest.approx(expected_transformer.minimums)
+    assert polars_obj.transformer.maximums == pytest.approx(expected_transformer.maximums)
+
+    with pytest.raises(ValueError):
+        DataPreprocessor(engine="spark")
+
 # ---------------------------------------------------------------
 # data_schema.py
 @pytest.fixture
@@ -197,6 +926,81 @@ def test_validate_data(sample_csv_file, sample_api_json_data):
     is_valid = validate_data(sample_csv_file, sample_api_json_data)
     assert is_valid == 1, "API data did not validate against schema."
 
+def test_schema_cache_reinfers_changed_partitions_only(tmp_path, monkeypatch, sample_api_json_data):
+    from dataset.scripts.data_store import ParquetDataStore, read_dataset
+    from dataset.scripts.schema_cache import SchemaCache, infer_schema_dict
+    monkeypatch.setenv("SCHEMA_CACHE_DIR", str(tmp_path / "schemas"))
+    store = ParquetDataStore(str(tmp_path))
+    df = pd.read_csv(StringIO(sample_csv_data))
+    df["zone"] = ["ZONA", "ZONB"]
+    store.write("data_preprocess", df)
+    dataset_path = store.path("data_preprocess")
+    assert validate_data(dataset_path, sample_api_json_data) == 1
+
+    reads = []
+    original_read_partition = ParquetDataStore.read_partition
+    def read_partition(self, name, key, columns=None):
+        reads.append(key["zone"])
+        return original_read_partition(self, name, key, columns)
+    monkeypatch.setattr(ParquetDataStore, "read_partition", read_partition)
+
+    assert validate_data(dataset_path, sample_api_json_data) == 1
+    assert reads == [], "An unchanged dataset should be validated with the cached schema"
+
+    new_df = df.iloc[[1]].assign(value=9000, precipMM=None)
+    store.write("data_preprocess", new_df, mode="append")
+    schema = SchemaCache().schema_dict(dataset_path)
+    assert reads == ["ZONB"], "Only the partition the append changed should be read"
+    assert schema == infer_schema_dict(read_dataset(dataset_path)), "The updated schema should match a full inference"
+    assert schema["columns"]["value"]["less_than_or_equal_to"] == 9000
+
+    # A CSV source is only hashed again once its size or mtime changed
+    import dataset.scripts.schema_cache as schema_cache
+    csv_path = str(tmp_path / "data_raw.csv")
+    df.to_csv(csv_path, index=False)
+    hashes = []
+    original_data_version = schema_cache.data_version
+    def data_version(path):
+        hashes.append(path)
+        return original_data_version(path)
+    monkeypatch.setattr(schema_cache, "data_version", data_version)
+    SchemaCache().schema_dict(csv_path)
+    SchemaCache().schema_dict(csv_path)
+    assert len(hashes) == 1, "An unchanged CSV file should not be hashed again"
+    new_df.to_csv(csv_path, mode="a", header=False, index=False)
+    assert SchemaCache().schema_dict(csv_path)["columns"]["value"]["less_than_or_equal_to"] == 9000
+    assert len(hashes) == 2
+
+def test_chunked_validation_summarizes_failures(tmp_path, monkeypatch):
+    from dataset.scripts.data_store import ParquetDataStore
+    monkeypatch.setenv("SCHEMA_CACHE_DIR", str(tmp_path / "schemas"))
+    store = ParquetDataStore(str(tmp_path))
+    df = pd.DataFrame({
+        "datetime": pd.date_range("2020-01-01", periods=400, freq="h"),
+        "zone": ["ZONA", "ZONB"] * 200,
+        "value": np.arange(400.0),
+    })
+    store.write("data_preprocess", df)
+    dataset_path = store.path("data_preprocess")
+
+    summary = revalidate_data(dataset_path, chunk_rows=150)
+    assert summary["valid"] and summary["rows"] == 400 and summary["batches"] == 3
+
+    schema_obj = DataSchemaAndStatistics(df)
+    schema_obj.infer_schema()
+    bad_df = df.assign(value=np.where(df.index % 4 == 0, -1.0, df["value"]))
+    bad_path = str(tmp_path / "bad.csv")
+    bad_df.to_csv(bad_path, index=False)
+    summary = schema_obj.validate_dataset(bad_path, chunk_rows=150, max_examples=5)
+    assert not summary["valid"] and summary["batches"] == 3
+    assert summary["failures"] == {"value: greater_than_or_equal_to(0.0)": 100}
+    assert summary["failed_rows"] == 100
+    assert len(summary["examples"]) == 5 and summary["examples"][0]["row"] == 0
+
+    sampled = schema_obj.validate_dataset(bad_path, chunk_rows=150, sample_fraction=0.5)
+    assert sampled["validated_rows"] == 200 and sampled["rows"] == 400
+    assert sampled["estimated_failures"]["value: greater_than_or_equal_to(0.0)"] == pytest.approx(100, rel=0.5)
+
 def test_fix_anomalies(sample_api_json_data):
     # Introduce negative and NaN anomalies in data
     api_data = json.loads(sample_api_json_data)
@@ -211,6 +1015,33 @@ def test_fix_anomalies(sample_api_json_data):
     assert (fixed_df["visibility"] >= 0).all(), "Negative values in 'visibility' not fixed"
     assert fixed_df["HeatIndexF"].isnull().sum() == 0, "NaN values in 'HeatIndexF' not fixed"
 
+def test_anomaly_rules_report_repairs():
+    from dataset.scripts.anomaly_rules import AnomalyRules
+    from dataset.scripts.benchmark import legacy_fix_anomalies, make_anomaly_frame
+    df = make_anomaly_frame(500)
+    schema_obj = DataSchemaAndStatistics(None)
+    fixed_df = schema_obj.fix_anomalies(df.copy())
+    pd.testing.assert_frame_equal(fixed_df, legacy_fix_anomalies(df.copy()), check_dtype=False)
+    report = schema_obj.anomaly_report
+    assert report["fill"]["value"] == df["value"].isna().sum()
+    assert report["dedup"] == len(df) - len(fixed_df)
+    assert report["clip"]["precipMM"] == (df["precipMM"].fillna(0).loc[fixed_df.index] < 0).sum()
+
+    rules = AnomalyRules(fill={"tempF": "ffill"}, dedup=["datetime", "zone"], clip={"humidity": [0, 100]})
+    df = pd.DataFrame({
+        "datetime": ["2020-01-01T00", "2020-01-01T00", "2020-01-01T01", "2020-01-01T02"],
+        "zone": ["ZONA", "ZONB", "ZONA", "ZONA"],
+        "tempF": [30.0, None, None, 33.0],
+        "humidity": [105, 50, -2, 70],
+    })
+    fixed_df, report = rules.apply(df)
+    assert fixed_df["tempF"].tolist() == [30.0, 30.0, 30.0, 33.0]
+    assert fixed_df["humidity"].tolist() == [100, 50, 0, 70]
+    assert report == {"fill": {"tempF": 2}, "dedup": 0, "clip": {"humidity": 2}}
+    assert df["humidity"].tolist() == [105, 50, -2, 70], "apply() should not modify its input"
+    with pytest.raises(ValueError):
+        AnomalyRules(fill={"tempF": "mode"})
+
 # ---------------------------------------------------------------
 # data_bias_detection.py 
 
@@ -0,0 +1,124 @@
+import json
+import logging
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    handlers=[logging.StreamHandler()],
+)
+logger = logging.getLogger(__name__)
+
+# Weather measures, their rolling/lag features and the demand can not be negative
+NON_NEGATIVE_COLUMNS = [
+    'precipMM', 'visibility', 'HeatIndexF', 'WindChillF', 'windspeedMiles',
+    'FeelsLikeF', 'tempF_rolling_mean', 'windspeedMiles_rolling_mean',
+    'humidity_rolling_mean', 'pressure', 'pressureInches', 'cloudcover',
+    'uvIndex', 'tempF_rolling_std', 'windspeedMiles_rolling_std',
+    'humidity_rolling_std', 'tempF_lag_2', 'tempF_lag_4', 'tempF_lag_6',
+    'windspeedMiles_lag_2', 'windspeedMiles_lag_4', 'windspeedMiles_lag_6',
+    'humidity_lag_2', 'humidity_lag_4', 'humidity_lag_6', 'value'
+]
+
+# Fill policies besides a constant value
+FILL_POLICIES = ("mean", "median", "ffill", "bfill")
+
+# Applied in this order: missing values, duplicates, then out of range values
+DEFAULT_ANOMALY_RULES = {
+    # {column: constant or policy}; "*" applies to every column without its own entry
+    "fill": {"*": 0},
+    # Key columns of duplicate rows, the first row is kept; None compares whole rows
+    "dedup": None,
+    # {column: [lower, upper]}, None leaves a side open
+    "clip": {col: [0, None] for col in NON_NEGATIVE_COLUMNS},
+}
+
+
+class AnomalyRules:
+    """
+    Declared anomaly repairs (null fills, deduplication, clip bounds), each applied to all its columns
+    at once as an array operation. apply() also counts the cells every rule repaired.
+    """
+
+    def __init__(self, fill: Optional[dict] = None, dedup: Optional[list] = None, clip: Optional[dict] = None):
+        self.fill = dict(fill or {})
+        self.dedup = list(dedup) if dedup else None
+        self.clip = {col: tuple(bounds) for col, bounds in (clip or {}).items()}
+        for col, policy in self.fill.items():
+            if isinstance(policy, str) and policy not in FILL_POLICIES:
+                raise ValueError(f"Unknown fill policy for {col}: {policy}, expected a value or one of {FILL_POLICIES}")
+
+    @classmethod
+    def from_dict(cls, rules: dict) -> "AnomalyRules":
+        return cls(rules.get("fill"), rules.get("dedup"), rules.get("clip"))
+
+    @classmethod
+    def load(cls, path: str) -> "AnomalyRules":
+        """Rules from a JSON file shaped as DEFAULT_ANOMALY_RULES."""
+        with open(path, "r") as f:
+            return cls.from_dict(json.load(f))
+
+    @classmethod
+    def default(cls) -> "AnomalyRules":
+        return cls.from_dict(DEFAULT_ANOMALY_RULES)
+
+    # ---------------------------------
+    def __fill_values(self, df: pd.DataFrame) -> tuple[dict, dict]:
+        """Returns {column: fill value} of the constant and statistic policies and {column: ffill/bfill}."""
+        values, directions = {}, {}
+        for col in df.columns:
+            policy = self.fill.get(col, self.fill.get("*"))
+            if policy is None:
+                continue
+            if policy in ("ffill", "bfill"):
+                directions[col] = policy
+            elif policy in ("mean", "median"):
+                values[col] = getattr(df[col], policy)()
+            else:
+                values[col] = policy
+        return values, directions
+
+    def apply(self, df: pd.DataFrame, inplace: bool = False) -> tuple[pd.DataFrame, dict]:
+        """
+        Repairs df with the rules. Returns the repaired frame (df itself with inplace) and the
+        repaired cells per rule: {"fill": {column: cells}, "dedup": rows, "clip": {column: cells}}.
+        """
+        if not inplace:
+            df = df.copy()
+        report = {"fill": {}, "dedup": 0, "clip": {}}
+
+        # Missing values, counted before the fill
+        values, directions = self.__fill_values(df)
+        missing = df.isna().sum()
+        report["fill"] = {col: int(missing[col]) for col in [*values, *directions] if missing[col]}
+        if values:
+            df.fillna(value=values, inplace=True)
+        for direction in ("ffill", "bfill"):
+            columns = [col for col, policy in directions.items() if policy == direction]
+            if columns:
+                df[columns] = getattr(df[columns], direction)()
+
+        # Duplicates
+        rows = len(df)
+        df.drop_duplicates(subset=self.dedup, inplace=True)
+        report["dedup"] = rows - len(df)
+
+        # Out of range values, all columns in one array
+        columns = [col for col in self.clip if col in df.columns and pd.api.types.is_numeric_dtype(df[col])]
+        if columns:
+            lower = np.array([np.nan if self.clip[col][0] is None else self.clip[col][0] for col in columns], dtype=float)
+            upper = np.array([np.nan if self.clip[col][1] is None else self.clip[col][1] for col in columns], dtype=float)
+            block = df[columns].to_numpy(dtype=float)
+            with np.errstate(invalid="ignore"):
+                out_of_range = (block < lower) | (block > upper)
+            counts = out_of_range.sum(axis=0)
+            report["clip"] = {col: int(count) for col, count in zip(columns, counts) if count}
+            changed = [col for col, count in zip(columns, counts) if count]
+            if changed:
+                bounds = pd.DataFrame([lower, upper], index=["lower", "upper"], columns=columns)[changed]
+                df[changed] = df[changed].clip(lower=bounds.loc["lower"], upper=bounds.loc["upper"], axis=1)
+        return df, report
@@ -0,0 +1,204 @@
+# usage -
+# python dataset/scripts/artifact_store.py info
+# python dataset/scripts/artifact_store.py cleanup data_new_preprocess_dag scheduled__2024-01-01T00:00:00+00:00
+# python dataset/scripts/artifact_store.py prune --max_age_hours 48
+
+import os
+import re
+import time
+import shutil
+import logging
+import argparse
+from io import StringIO
+from typing import Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    handlers=[logging.StreamHandler()],
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_ARTIFACT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../data/artifacts"))
+
+# Marks an XCom value as a reference to a stored frame
+REFERENCE_TYPE = "dataframe"
+
+# Runs whose cleanup never ran (killed scheduler, cleared DAG run) are pruned after this age
+DEFAULT_MAX_AGE_HOURS = 48
+
+
+def is_reference(value) -> bool:
+    return isinstance(value, dict) and value.get("type") == REFERENCE_TYPE and "artifact" in value
+
+
+def safe_name(value: str) -> str:
+    """A DAG id, run id or artifact name as one path component; run ids contain ':' and '+'."""
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", str(value))
+
+
+class ArtifactStore:
+    """
+    Frames passed between the tasks of a DAG run, stored as Parquet files in a local directory shared
+    by the workers: <root_dir>/<dag_id>/<run_id>/<name>.parquet.
+
+    put() writes a frame and returns a small reference, which is what the task pushes to XCom:
+    {"type": "dataframe", "artifact": <path relative to root_dir>, "rows": n, "columns": {col: dtype}}.
+    get() reads the frame of a reference back (only the columns asked for), so the metadata database
+    and the deserialization at task start no longer grow with the data. cleanup() removes the
+    artifacts of a run once the DAG is done.
+    """
+
+    def __init__(self, root_dir: Optional[str] = None):
+        self.root_dir = os.path.abspath(root_dir or os.getenv("ARTIFACT_STORE_DIR", DEFAULT_ARTIFACT_DIR))
+
+    def run_dir(self, dag_id: str, run_id: str) -> str:
+        return os.path.join(self.root_dir, safe_name(dag_id), safe_name(run_id))
+
+    def path(self, reference: dict) -> str:
+        return os.path.join(self.root_dir, reference["artifact"])
+
+    # ---------------------------------
+    @staticmethod
+    def __to_table(df: pd.DataFrame) -> pa.Table:
+        try:
+            return pa.Table.from_pandas(df, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Object columns mixing labels and numbers ('4001' and 4001), stored as their strings
+            mixed = [col for col in df.columns if df[col].dtype == object]
+            logger.warning(f"Storing the mixed type columns {mixed} as strings.")
+            df = df.astype({col: "string" for col in mixed})
+            return pa.Table.from_pandas(df, preserve_index=False)
+
+    def put(self, df: pd.DataFrame, name: str, dag_id: str, run_id: str) -> dict:
+        """Writes df as the artifact name of the run (replacing it on a task retry), returns its reference."""
+        run_dir = self.run_dir(dag_id, run_id)
+        os.makedirs(run_dir, exist_ok=True)
+        path = os.path.join(run_dir, f"{safe_name(name)}.parquet")
+
+        temp_path = path + ".tmp"
+        pq.write_table(self.__to_table(df), temp_path)
+        os.replace(temp_path, path)
+
+        return {
+            "type": REFERENCE_TYPE,
+            "artifact": os.path.relpath(path, self.root_dir),
+            "rows": int(len(df)),
+            "columns": {str(col): str(dtype) for col, dtype in df.dtypes.items()},
+        }
+
+    def get(self, reference: dict, columns: Optional[list] = None) -> pd.DataFrame:
+        path = self.path(reference)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Artifact {reference['artifact']} is missing, was its run cleaned up?")
+        return pq.read_table(path, columns=columns).to_pandas()
+
+    def cleanup(self, dag_id: str, run_id: str) -> int:
+        """Removes the artifacts of a run, returns the number of files removed."""
+        run_dir = self.run_dir(dag_id, run_id)
+        if not os.path.isdir(run_dir):
+            return 0
+        files = len(os.listdir(run_dir))
+        shutil.rmtree(run_dir, ignore_errors=True)
+        logger.info(f"Removed {files} artifacts of {dag_id} run {run_id}.")
+        return files
+
+    def prune(self, max_age_hours: float = DEFAULT_MAX_AGE_HOURS) -> list:
+        """Removes the run directories not written to for max_age_hours, returns them."""
+        removed = []
+        if not os.path.isdir(self.root_dir):
+            return removed
+        cutoff = time.time() - max_age_hours * 3600
+        for dag_id in os.listdir(self.root_dir):
+            dag_dir = os.path.join(self.root_dir, dag_id)
+            if not os.path.isdir(dag_dir):
+                continue
+            for run_id in os.listdir(dag_dir):
+                run_dir = os.path.join(dag_dir, run_id)
+                if os.path.isdir(run_dir) and os.path.getmtime(run_dir) < cutoff:
+                    shutil.rmtree(run_dir, ignore_errors=True)
+                    removed.append(run_dir)
+        if removed:
+            logger.info(f"Pruned {len(removed)} run directories older than {max_age_hours} hours.")
+        return removed
+
+    def info(self) -> list:
+        runs = []
+        if not os.path.isdir(self.root_dir):
+            return runs
+        for dag_id in sorted(os.listdir(self.root_dir)):
+            dag_dir = os.path.join(self.root_dir, dag_id)
+            for run_id in sorted(os.listdir(dag_dir)) if os.path.isdir(dag_dir) else []:
+                run_dir = os.path.join(dag_dir, run_id)
+                files = [os.path.join(run_dir, f) for f in os.listdir(run_dir)]
+                runs.append({
+                    "dag_id": dag_id, "run_id": run_id, "artifacts": len(files),
+                    "bytes": sum(os.path.getsize(f) for f in files),
+                })
+        return runs
+
+
+# -----------------------------------------------------------------------
+# Task payloads: references in DAG runs, JSON records outside of them (tests, manual calls)
+def load_frame(payload, columns: Optional[list] = None, store: Optional[ArtifactStore] = None) -> pd.DataFrame:
+    """The frame of a task payload: an artifact reference, JSON records or a to_dict() (older runs) or a frame."""
+    if is_reference(payload):
+        return (store or ArtifactStore()).get(payload, columns=columns)
+    if isinstance(payload, pd.DataFrame):
+        df = payload
+    elif isinstance(payload, dict):
+        df = pd.DataFrame.from_dict(payload)
+    else:
+        df = pd.read_json(StringIO(payload) if isinstance(payload, str) else payload)
+    return df[columns] if columns is not None else df
+
+
+def save_frame(df: pd.DataFrame, name: str, dag_id: Optional[str] = None, run_id: Optional[str] = None,
+               store: Optional[ArtifactStore] = None):
+    """The payload a task returns for df: a reference when it runs in a DAG run, JSON records otherwise."""
+    if dag_id is None or run_id is None:
+        return df.to_json(orient="records", lines=False)
+    return (store or ArtifactStore()).put(df, name, dag_id, run_id)
+
+
+def payload_rows(payload) -> int:
+    """Number of rows of a task payload, without reading the artifact of a reference."""
+    if is_reference(payload):
+        return payload["rows"]
+    return len(load_frame(payload))
+
+
+# -----------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Artifact store tools.")
+    parser.add_argument("--root_dir", default=None)
+    subparsers = parser.add_subparsers(dest="action", required=True)
+
+    subparsers.add_parser("info", help="List the runs with stored artifacts")
+
+    cleanup_parser = subparsers.add_parser("cleanup", help="Remove the artifacts of a DAG run")
+    cleanup_parser.add_argument("dag_id")
+    cleanup_parser.add_argument("run_id")
+
+    prune_parser = subparsers.add_parser("prune", help="Remove the artifacts of old runs")
+    prune_parser.add_argument("--max_age_hours", type=float, default=DEFAULT_MAX_AGE_HOURS)
+
+    args = parser.parse_args()
+    store = ArtifactStore(args.root_dir)
+
+    if args.action == "info":
+        for run in store.info():
+            logger.info(run)
+    elif args.action == "cleanup":
+        store.cleanup(args.dag_id, args.run_id)
+    elif args.action == "prune":
+        store.prune(args.max_age_hours)
+
+
+if __name__ == "__main__":
+    main()
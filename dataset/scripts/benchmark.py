@@ -0,0 +1,279 @@
+# usage -
+# python dataset/scripts/benchmark.py weather --rows 120000
+# python dataset/scripts/benchmark.py preprocess --rows 200000
+# python dataset/scripts/benchmark.py preprocess --path dataset/data/data_raw
+# python dataset/scripts/benchmark.py memory --rows 200000
+# python dataset/scripts/benchmark.py engines --rows 200000
+# python dataset/scripts/benchmark.py anomalies --rows 1000000
+
+import argparse
+import contextlib
+import io
+import time
+import os
+import sys
+import logging
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from dataset.scripts.data import process_weather_frame, WEATHER_DROP_COLUMNS
+from dataset.scripts.data_preprocess import DataPreprocessor
+from dataset.scripts.data_store import read_dataset
+from dataset.scripts.dtype_plan import memory_report
+from dataset.scripts.polars_engine import PolarsEngine, pl
+from dataset.scripts.data_schema import DataSchemaAndStatistics
+from dataset.scripts.anomaly_rules import NON_NEGATIVE_COLUMNS
+from dataset.scripts.replay_server import WEATHER_HOURLY_FIELDS
+
+# Keep the benchmark output readable
+logging.getLogger("dataset.scripts.data").setLevel(logging.WARNING)
+logging.getLogger("dataset.scripts.data_store").setLevel(logging.WARNING)
+logging.getLogger("dataset.scripts.data_schema").setLevel(logging.WARNING)
+
+
+def time_it(func, setup, repeat=3):
+    """Returns the best wall time of `repeat` runs of func(setup()) and the result of the last run."""
+    best = float("inf")
+    for _ in range(repeat):
+        arg = setup()
+        start = time.perf_counter()
+        result = func(arg)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def report(name, baseline_seconds, new_seconds, rows):
+    print(f"\n{name} ({rows} rows)")
+    print(f"  baseline : {baseline_seconds:8.3f}s")
+    print(f"  optimized: {new_seconds:8.3f}s")
+    print(f"  speedup  : {baseline_seconds / new_seconds:8.1f}x")
+
+
+# -----------------------------------------------------------------------
+# weather - DataCollector.process_weather_data
+def legacy_process_weather_data(df_weather):
+    """Row by row implementation that process_weather_frame replaced, kept as the reference."""
+    processed_data = []
+    for index, row in df_weather.iterrows():
+        date = row["date"]
+        hourly_data = row["hourly"]
+
+        for hour in hourly_data:
+            time = hour["time"]
+            time = time.zfill(4)
+            hour_of_day = time[:2]
+
+            datetime_str = f"{date}T{hour_of_day}"
+
+            hour["datetime"] = datetime_str
+            processed_data.append(hour)
+
+    df_processed = pd.DataFrame(processed_data)
+    cols = ["datetime"] + [col for col in df_processed.columns if col != "datetime"]
+    df_processed = df_processed[cols]
+    df_processed = df_processed.drop(
+        columns=["time", "tempC", "windspeedKmph", "weatherIconUrl", "weatherDesc", "winddirDegree", "winddir16Point"]
+    )
+    return df_processed
+
+
+def make_weather_frame(rows, seed=42):
+    """Builds a raw weather DataFrame ('date' + 24 'hourly' dicts per day) with about `rows` hours."""
+    rng = np.random.default_rng(seed)
+    days = pd.date_range("2019-01-01", periods=max(1, rows // 24), freq="D")
+    values = rng.integers(0, 100, size=(len(days), 24, len(WEATHER_HOURLY_FIELDS))).astype(str)
+
+    weather = []
+    for d, day in enumerate(days):
+        hourly = []
+        for h in range(24):
+            hour = {"time": str(h * 100)}
+            hour.update(zip(WEATHER_HOURLY_FIELDS, values[d, h]))
+            hour["weatherIconUrl"] = [{"value": "https://cdn.worldweatheronline.com/images/wsymbol_0001.png"}]
+            hour["weatherDesc"] = [{"value": "Sunny"}]
+            hourly.append(hour)
+        weather.append({"date": day.strftime("%Y-%m-%d"), "maxtempC": "10", "hourly": hourly})
+    return pd.DataFrame(weather)
+
+
+def benchmark_weather(rows, repeat):
+    # A fresh frame per run, the legacy loop mutates the hourly dicts in place
+    setup = lambda: make_weather_frame(rows)
+    baseline_seconds, expected = time_it(legacy_process_weather_data, setup, repeat)
+    new_seconds, result = time_it(process_weather_frame, setup, repeat)
+
+    pd.testing.assert_frame_equal(result, expected)
+    report("process_weather_data", baseline_seconds, new_seconds, len(result))
+
+
+# -----------------------------------------------------------------------
+# preprocess - DataPreprocessor stages, JSON round trips vs DataFrame pipeline
+def legacy_preprocess(preprocess_obj, df):
+    """The five JSON stages as the DAG tasks and preprocess_pipeline used to chain them."""
+    df_json = df.to_json(orient="records", lines=False)
+    df_json = preprocess_obj.clean_data(df_json)
+    df_json = preprocess_obj.engineer_features(df_json)
+    df_json = preprocess_obj.add_cyclic_features(df_json)
+    df_json = preprocess_obj.normalize_and_encode(df_json)
+    df_json = preprocess_obj.select_final_features(df_json)
+    return pd.read_json(df_json)
+
+
+def make_raw_frame(rows, zones=("ZONA", "ZONB"), seed=42):
+    """Builds a frame shaped like data_raw (merged demand and weather columns) with about `rows` rows."""
+    rng = np.random.default_rng(seed)
+    hours = max(1, rows // len(zones))
+    datetimes = pd.date_range("2019-01-01", periods=hours, freq="h").strftime("%Y-%m-%dT%H")
+    weather_fields = [field for field in WEATHER_HOURLY_FIELDS if field not in WEATHER_DROP_COLUMNS]
+
+    frames = []
+    for zone in zones:
+        df = pd.DataFrame({"datetime": datetimes, "subba-name": f"Zone {zone}"})
+        df["value"] = rng.integers(500, 5000, size=hours)
+        df["value-units"] = "megawatthours"
+        for field in weather_fields:
+            df[field] = rng.integers(0, 100, size=hours)
+        df["zone"] = zone
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+
+def benchmark_preprocess(rows, path, repeat):
+    df_raw = read_dataset(path) if path else make_raw_frame(rows)
+    for col in ["datetime", "zone", "subba-name"]:
+        df_raw[col] = df_raw[col].astype(str)
+    preprocess_obj = DataPreprocessor()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        baseline_seconds, expected = time_it(lambda df: legacy_preprocess(preprocess_obj, df), lambda: df_raw, repeat)
+        new_seconds, result = time_it(preprocess_obj.transform_df, lambda: df_raw, repeat)
+
+    # Whole floats come back from JSON as int64, compare the values
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+    report("DataPreprocessor stages", baseline_seconds, new_seconds, len(df_raw))
+
+
+# -----------------------------------------------------------------------
+# memory - default dtypes vs the compact dtype plan of the preprocessed data
+def benchmark_memory(rows, path):
+    df_raw = read_dataset(path) if path else make_raw_frame(rows)
+    for col in ["datetime", "zone", "subba-name"]:
+        df_raw[col] = df_raw[col].astype(str)
+    preprocess_obj = DataPreprocessor()
+    with contextlib.redirect_stdout(io.StringIO()):
+        # The frame as read back from a CSV file or JSON: default dtypes, datetime as strings
+        df = preprocess_obj.transform_df(df_raw).astype({"datetime": str, "subba-name": str, "zone": str})
+        df = df.astype({col: "float64" for col in df.select_dtypes("float").columns})
+
+    report = memory_report(df)
+    print(f"\nmemory ({len(df)} rows)")
+    with pd.option_context("display.max_rows", None, "display.width", 120):
+        print(report)
+
+
+# -----------------------------------------------------------------------
+# engines - DataPreprocessor.transform_df, pandas vs the polars lazy query
+def benchmark_engines(rows, path, repeat):
+    if pl is None:
+        print("polars is not installed, install it with 'pip install polars' to run this benchmark.")
+        return
+    df_raw = read_dataset(path) if path else make_raw_frame(rows)
+    for col in ["datetime", "zone", "subba-name"]:
+        df_raw[col] = df_raw[col].astype(str)
+    preprocess_obj = DataPreprocessor(engine="pandas")
+    engine = PolarsEngine(preprocess_obj)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        baseline_seconds, expected = time_it(preprocess_obj.transform_df, lambda: df_raw, repeat)
+        new_seconds, result = time_it(engine.transform, lambda: df_raw, repeat)
+
+    # Rolling std sums in a different order, equal to float32 precision
+    pd.testing.assert_frame_equal(result, expected, rtol=1e-5)
+    report("DataPreprocessor.transform_df, pandas vs polars", baseline_seconds, new_seconds, len(df_raw))
+
+
+# -----------------------------------------------------------------------
+# anomalies - DataSchemaAndStatistics.fix_anomalies, per cell vs the vectorized rules
+def legacy_fix_anomalies(df):
+    """fix_anomalies before the rules: a Python call per cell of the non-negative columns."""
+    df.fillna(0, inplace=True)
+    df.drop_duplicates(inplace=True)
+    for col in NON_NEGATIVE_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].apply(lambda x: x if x >= 0 else 0)
+    return df
+
+
+def make_anomaly_frame(rows, seed=42):
+    """Preprocessed-like rows with negative values, missing values and duplicate rows."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        col: rng.normal(1, 1, rows).round(3) if i % 2 else rng.integers(-10, 100, rows)
+        for i, col in enumerate(NON_NEGATIVE_COLUMNS)
+    })
+    df.insert(0, "datetime", pd.date_range("2019-01-01", periods=rows, freq="h").strftime("%Y-%m-%dT%H"))
+    df = df.mask(rng.random(df.shape) < 0.01)
+    df.loc[rng.choice(rows, rows // 100, replace=False), :] = df.iloc[: rows // 100].to_numpy()
+    return df
+
+
+def benchmark_anomalies(rows, repeat):
+    df = make_anomaly_frame(rows)
+    schema_obj = DataSchemaAndStatistics(None)
+
+    baseline_seconds, expected = time_it(legacy_fix_anomalies, lambda: df.copy(), repeat)
+    new_seconds, result = time_it(schema_obj.fix_anomalies, lambda: df.copy(), repeat)
+
+    # apply() gives object columns back as numbers
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+    report("DataSchemaAndStatistics.fix_anomalies", baseline_seconds, new_seconds, len(df))
+    repaired = schema_obj.anomaly_report
+    print(f"  repaired : {sum(repaired['fill'].values())} filled, {repaired['dedup']} duplicate rows, {sum(repaired['clip'].values())} clipped")
+
+
+# -----------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the data pipeline hot spots.")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    weather_parser = subparsers.add_parser("weather", help="Flattening of hourly weather responses")
+    weather_parser.add_argument("--rows", type=int, default=120000, help="Number of hourly rows")
+    weather_parser.add_argument("--repeat", type=int, default=3, help="Runs per implementation, best is reported")
+
+    preprocess_parser = subparsers.add_parser("preprocess", help="DataPreprocessor stages, JSON vs DataFrame")
+    preprocess_parser.add_argument("--rows", type=int, default=200000, help="Number of synthetic raw rows")
+    preprocess_parser.add_argument("--path", default=None, help="Raw CSV file or dataset to use instead")
+    preprocess_parser.add_argument("--repeat", type=int, default=3, help="Runs per implementation, best is reported")
+
+    memory_parser = subparsers.add_parser("memory", help="Preprocessed data, default vs compact dtypes")
+    memory_parser.add_argument("--rows", type=int, default=200000, help="Number of synthetic raw rows")
+    memory_parser.add_argument("--path", default=None, help="Raw CSV file or dataset to use instead")
+
+    engines_parser = subparsers.add_parser("engines", help="DataPreprocessor.transform_df, pandas vs polars")
+    engines_parser.add_argument("--rows", type=int, default=200000, help="Number of synthetic raw rows")
+    engines_parser.add_argument("--path", default=None, help="Raw CSV file or dataset to use instead")
+    engines_parser.add_argument("--repeat", type=int, default=3, help="Runs per implementation, best is reported")
+
+    anomalies_parser = subparsers.add_parser("anomalies", help="fix_anomalies, per cell vs vectorized rules")
+    anomalies_parser.add_argument("--rows", type=int, default=1000000, help="Number of synthetic rows")
+    anomalies_parser.add_argument("--repeat", type=int, default=1, help="Runs per implementation, best is reported")
+
+    args = parser.parse_args()
+
+    if args.benchmark == "weather":
+        benchmark_weather(args.rows, args.repeat)
+    elif args.benchmark == "preprocess":
+        benchmark_preprocess(args.rows, args.path, args.repeat)
+    elif args.benchmark == "memory":
+        benchmark_memory(args.rows, args.path)
+    elif args.benchmark == "engines":
+        benchmark_engines(args.rows, args.path, args.repeat)
+    elif args.benchmark == "anomalies":
+        benchmark_anomalies(args.rows, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,23 @@
 import os
-import requests
+import sys
+import time
+import numpy as np
 import pandas as pd
 import logging
+from itertools import chain
+from typing import Optional
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from dataset.scripts.http_client import get_http_client
+from dataset.scripts.response_cache import ResponseCache
+from dataset.scripts.quota_scheduler import QuotaScheduler, QuotaExhaustedError
+from dataset.scripts.partitioned_writer import PartitionedParquetWriter
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -14,6 +26,54 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Hourly weather fields that are not used downstream
+WEATHER_DROP_COLUMNS = [
+    "time",
+    "tempC",
+    "windspeedKmph",
+    "weatherIconUrl",
+    "weatherDesc",
+    "winddirDegree",
+    "winddir16Point",
+]
+
+# API hosts, overridable (e.g. EIA_API_BASE_URL=http://127.0.0.1:8765) to run against replay_server.py
+DEFAULT_EIA_API_BASE_URL = "https://api.eia.gov"
+DEFAULT_WEATHER_API_BASE_URL = "https://api.worldweatheronline.com"
+
+# Default number of parallel requests per API provider for concurrent dataset generation
+DEFAULT_MAX_WORKERS = {"demand": 4, "weather": 8}
+
+# Default number of regions collected in parallel by get_data_from_api
+DEFAULT_REGION_WORKERS = 4
+
+
+# -----------------------------------------------------------------------
+def process_weather_frame(df_weather: pd.DataFrame) -> pd.DataFrame:
+    """
+    Flattens the nested 'hourly' lists of a WorldWeatherOnline response into one row per hour.
+
+    All hourly dicts are chained into one list and loaded in a single DataFrame construction, so
+    hours missing some fields get NaN for them. The 'YYYY-MM-DDTHH' datetime is built with array
+    ops: the hour is derived once per distinct 'time' value and joined to the day dates repeated for
+    each of their hours.
+    """
+    hourly = df_weather["hourly"].tolist()
+    hours = list(chain.from_iterable(hourly))
+    if not hours:
+        return pd.DataFrame(columns=["datetime"])
+
+    df_processed = pd.DataFrame(hours)
+    times = df_processed["time"]
+    df_processed = df_processed.drop(columns=WEATHER_DROP_COLUMNS + ["datetime"], errors="ignore")
+
+    codes, unique_times = pd.factorize(times.astype(str))
+    hour_of_day = unique_times.str.zfill(4).str[:2].to_numpy(dtype=object)[codes]
+    dates = np.repeat(df_weather["date"].astype(str).to_numpy(dtype=object), [len(h) for h in hourly])
+    df_processed.insert(0, "datetime", dates + "T" + hour_of_day)
+
+    return df_processed
+
 
 # -----------------------------------------------------------------------
 class DataRegions:
@@ -64,7 +124,7 @@ class DataRegions:
 
 # -----------------------------------------------------------------------
 class DataCollector:
-    def __init__(self):
+    def __init__(self, use_cache: bool = True):
         """Initializes the DataCollector object, loading API keys and defining geographic zones."""
         load_dotenv()
 
@@ -79,6 +139,58 @@ class DataCollector:
             logger.error("WEATHER_API_KEY not found in environment variables.")
             raise ValueError("WEATHER_API_KEY not found in environment variables.")
 
+        self._eia_base_url = os.getenv("EIA_API_BASE_URL", DEFAULT_EIA_API_BASE_URL).rstrip("/")
+        self._weather_base_url = os.getenv("WEATHER_API_BASE_URL", DEFAULT_WEATHER_API_BASE_URL).rstrip("/")
+
+        # Cache and quota names; a non default host gets its own cache entries and is not rate limited
+        self._demand_endpoint = self.__endpoint_name("eia_demand", self._eia_base_url, DEFAULT_EIA_API_BASE_URL)
+        self._weather_endpoint = self.__endpoint_name(
+            "wwo_past_weather", self._weather_base_url, DEFAULT_WEATHER_API_BASE_URL
+        )
+        self._forecast_endpoint = self.__endpoint_name(
+            "wwo_forecast", self._weather_base_url, DEFAULT_WEATHER_API_BASE_URL
+        )
+
+        # Pooled, retrying transport shared by every DataCollector in the process
+        self._http = get_http_client()
+
+        # On-disk response cache, closed date ranges are never fetched twice
+        self._cache = ResponseCache() if use_cache else None
+
+        # Per provider token buckets and daily budgets, shared across task runs
+        self._quota = QuotaScheduler()
+
+    @staticmethod
+    def __endpoint_name(name: str, base_url: str, default_base_url: str) -> str:
+        if base_url == default_base_url:
+            return name
+        return f"{name}@{urlparse(base_url).netloc}"
+
+    def __fetch_json(
+        self, url: str, endpoint: str, location: str, start: str, end: str, cacheable: bool = True
+    ) -> tuple[int, Optional[dict]]:
+        """
+        Returns (status code, json payload) for a request, reading from the response cache first.
+        Only successful responses are cached; start and end are 'YYYY-MM-DD' dates.
+        """
+        use_cache = cacheable and self._cache is not None
+
+        if use_cache:
+            payload = self._cache.get(endpoint, location, start, end)
+            if payload is not None:
+                logger.info(f"Cache hit for {endpoint} {location} {start} - {end}")
+                return 200, payload
+
+        self._quota.acquire(endpoint)
+        response = self._http.get(url)
+        if response.status_code != 200:
+            return response.status_code, None
+
+        payload = response.json()
+        if use_cache:
+            self._cache.put(endpoint, location, start, end, payload)
+        return response.status_code, payload
+
     def __split_dates_monthly(self, start_date: str, end_date: str) -> list[list[str]]:
         """Splits the date range into monthly ranges."""
         logger.info(f"Splitting date range into months: {start_date} - {end_date}")
@@ -136,15 +248,15 @@ class DataCollector:
         end_date = datetime.strptime(end_date, "%d-%m-%Y").strftime("%Y-%m-%d")
 
         demand_url = (
-            "https://api.eia.gov/v2/electricity/rto/region-sub-ba-data/data/?api_key={0}"
-            "&data[]=value&facets[subba][]={1}&start={2}&end={3}"
-        ).format(self._DEMAND_API_KEY, subba, start_date, end_date)
-
-        response = requests.get(demand_url)
+            "{0}/v2/electricity/rto/region-sub-ba-data/data/?api_key={1}"
+            "&data[]=value&facets[subba][]={2}&start={3}&end={4}"
+        ).format(self._eia_base_url, self._DEMAND_API_KEY, subba, start_date, end_date)
 
-        if response.status_code == 200:
-            json_data = response.json()
+        status_code, json_data = self.__fetch_json(
+            demand_url, self._demand_endpoint, subba, start_date, end_date
+        )
 
+        if status_code == 200:
             if json_data["response"]["total"] != "0":
                 df_demand = pd.DataFrame(json_data["response"]["data"])
                 df_demand = df_demand.drop(columns=["subba", "parent", "parent-name"])
@@ -156,7 +268,56 @@ class DataCollector:
                 )
                 return pd.DataFrame()  # Return an empty DataFrame
         else:
-            logger.error(f"Failed to retrieve demand data: {response.status_code}")
+            logger.error(f"Failed to retrieve demand data: {status_code}")
+            return pd.DataFrame()  # Return an empty DataFrame
+
+    def __get_weather_month(
+        self, location: str, start: str, end: str, current: int = 0
+    ) -> Optional[pd.DataFrame]:
+        """Fetches one monthly slice of weather data, returns None on a failed request."""
+        logger.info(f"Fetching weather data for dates {start} to {end}")
+
+        if current == 0:
+            weather_url = (
+                "{0}/premium/v1/past-weather.ashx?key={1}&q={2}"
+                "&format=json&date={3}&enddate={4}&tp=1"
+            ).format(self._weather_base_url, self._WEATHER_API_KEY, location, start, end)
+        elif current == 1:
+            weather_url = (
+                "{0}/premium/v1/weather.ashx?key={1}&q={2}"
+                "&format=json&date={3}&tp=24"
+            ).format(self._weather_base_url, self._WEATHER_API_KEY, location, "today")
+        else:
+            weather_url = (
+                "{0}/premium/v1/weather.ashx?key={1}&q={2}"
+                "&format=json&date={3}&tp=24"
+            ).format(self._weather_base_url, self._WEATHER_API_KEY, location, "tomorrow")
+
+        # Forecasts (current=1/2) change during the day and are never cached, and have their own quota
+        endpoint = self._weather_endpoint if current == 0 else self._forecast_endpoint
+        status_code, json_data = self.__fetch_json(
+            weather_url, endpoint, location, start, end, cacheable=(current == 0)
+        )
+        if status_code == 200:
+            df_weather = pd.DataFrame(json_data["data"]["weather"])
+            logger.info(f"Successfully fetched weather data for {start} to {end}")
+            return df_weather
+        else:
+            logger.error(
+                f"Failed to retrieve weather data for {start} to {end}: {status_code}"
+            )
+            return None
+
+    def __combine_weather(self, location: str, dataframes: list) -> pd.DataFrame:
+        """Combines the monthly weather slices into a single DataFrame."""
+        all_dataframes = [df for df in dataframes if df is not None]
+
+        if all_dataframes:
+            combined_df = pd.concat(all_dataframes, ignore_index=True)
+            logger.info(f"Successfully combined weather data.")
+            return combined_df
+        else:
+            logger.warning(f"No weather data found for {location}.")
             return pd.DataFrame()  # Return an empty DataFrame
 
     def get_weather_data(
@@ -171,143 +332,249 @@ class DataCollector:
         all_dataframes = []
 
         for start, end in monthly_date_ranges:
-            logger.info(f"Fetching weather data for dates {start} to {end}")
-
-            if current == 0:
-                weather_url = (
-                    "https://api.worldweatheronline.com/premium/v1/past-weather.ashx?key={0}&q={1}"
-                    "&format=json&date={2}&enddate={3}&tp=1"
-                ).format(self._WEATHER_API_KEY, location, start, end)
-            elif current == 1:
-                weather_url = (
-                    "https://api.worldweatheronline.com/premium/v1/weather.ashx?key={0}&q={1}"
-                    "&format=json&date={2}&tp=24"
-                ).format(self._WEATHER_API_KEY, location, "today")
-            else:
-                weather_url = (
-                    "https://api.worldweatheronline.com/premium/v1/weather.ashx?key={0}&q={1}"
-                    "&format=json&date={2}&tp=24"
-                ).format(self._WEATHER_API_KEY, location, "tomorrow")
-
-            response = requests.get(weather_url)
-            if response.status_code == 200:
-                json_data = response.json()
-                df_weather = pd.DataFrame(json_data["data"]["weather"])
-                all_dataframes.append(df_weather)
-                logger.info(f"Successfully fetched weather data for {start} to {end}")
-            else:
-                logger.error(
-                    f"Failed to retrieve weather data for {start} to {end}: {response.status_code}"
-                )
+            all_dataframes.append(self.__get_weather_month(location, start, end, current))
 
         # Combine all DataFrames into a single DataFrame
-        if all_dataframes:
-            combined_df = pd.concat(all_dataframes, ignore_index=True)
-            logger.info(f"Successfully combined weather data.")
-            return combined_df
-        else:
-            logger.warning(f"No weather data found for {location}.")
-            return pd.DataFrame()  # Return an empty DataFrame
+        return self.__combine_weather(location, all_dataframes)
 
     def process_weather_data(self, df_weather: pd.DataFrame) -> pd.DataFrame:
         """Processes the weather data DataFrame into a standardized format."""
         logger.info("Processing weather data.")
-        processed_data = []
-        for index, row in df_weather.iterrows():
-            date = row["date"]
-            hourly_data = row["hourly"]
-
-            for hour in hourly_data:
-                time = hour["time"]
-                time = time.zfill(4)
-                hour_of_day = time[:2]
-
-                datetime_str = f"{date}T{hour_of_day}"
-
-                hour["datetime"] = datetime_str
-                processed_data.append(hour)
-
-        df_processed = pd.DataFrame(processed_data)
-        cols = ["datetime"] + [col for col in df_processed.columns if col != "datetime"]
-        df_processed = df_processed[cols]
-        df_processed = df_processed.drop(
-            columns=[
-                "time",
-                "tempC",
-                "windspeedKmph",
-                "weatherIconUrl",
-                "weatherDesc",
-                "winddirDegree",
-                "winddir16Point",
-            ]
-        )
-
+        df_processed = process_weather_frame(df_weather)
         logger.info("Weather data processing complete.")
         return df_processed
 
-    def generate_dataset(self, zones: dict, start_date: str, end_date: str) -> dict:
-        """Generates a dataset by fetching and merging demand and weather data for specified zones."""
-        logger.info(f"Generating dataset for zones from {start_date} to {end_date}.")
-        api_calls = 0
-        dates = self.__split_dates_yearwise(start_date, end_date)
-        df_map = {}
+    def __merge_slice(
+        self, zone: str, start: str, end: str, df_demand: pd.DataFrame, df_weather: pd.DataFrame
+    ) -> Optional[pd.DataFrame]:
+        """Merges the demand and raw weather data of one (zone, date range) slice."""
+        if df_demand.empty:
+            logger.warning(
+                f"Demand data not available for {zone} between {start} and {end}."
+            )
+            return None
 
-        for zone in zones:
-            if api_calls >= 500:
-                logger.warning("Reached API call limit.")
-                break
+        if df_weather.empty:
+            logger.warning(
+                f"Weather data not available for {zone} between {start} and {end}."
+            )
+            return None
 
-            logger.info(f"Fetching data for zone: {zone}")
-            zone_name = zone
-            date_df_list = []
+        df_weather = self.process_weather_data(df_weather)
 
-            for date in dates:
-                start = date[0]
-                end = date[1]
-                logger.info(f"Fetching data for {zone} from {start} to {end}")
+        df_weather.rename(columns={"datetime": "datetime"}, inplace=True)
+        df_demand.rename(columns={"period": "datetime"}, inplace=True)
 
-                df_demand = self.get_demand_data(zone, start, end)
+        df_merged_dataset = pd.merge(
+            df_weather, df_demand, on="datetime", how="inner"
+        )
+        df_merged_dataset["zone"] = zone
+        return df_merged_dataset
 
-                if df_demand.empty:
-                    logger.warning(
-                        f"Demand data not available for {zone} between {start} and {end}."
-                    )
-                    continue
+    def __plan_slices(self, zones: dict, start_date: str, end_date: str) -> dict:
+        """
+        Returns {zone: [[start, end], ...]} with the yearly ranges to fetch for each zone.
+        Ranges deferred by an earlier run for these zones are picked up first.
+        """
+        dates = self.__split_dates_yearwise(start_date, end_date)
+        deferred = self._quota.pop_deferred(lambda item: item["zone"] in zones)
 
-                city_location = ",".join(map(str, zones[zone]))
-                df_weather = self.get_weather_data(city_location, start, end)
+        plan = {zone: [] for zone in zones}
+        for item in deferred:
+            logger.info(f"Resuming deferred range for {item['zone']}: {item['start']} - {item['end']}")
+            plan[item["zone"]].append([item["start"], item["end"]])
 
-                if df_weather.empty:
-                    logger.warning(
-                        f"Weather data not available for {zone} between {start} and {end}."
-                    )
-                    continue
+        for zone in zones:
+            for date in dates:
+                if date not in plan[zone]:
+                    plan[zone].append(date)
+        return plan
 
-                df_weather = self.process_weather_data(df_weather)
+    def __fetch_slice(self, zone: str, coordinates: list, start: str, end: str) -> Optional[pd.DataFrame]:
+        """Fetches and merges the demand and weather data of one (zone, date range) slice."""
+        logger.info(f"Fetching data for {zone} from {start} to {end}")
 
-                df_weather.rename(columns={"datetime": "datetime"}, inplace=True)
-                df_demand.rename(columns={"period": "datetime"}, inplace=True)
+        df_demand = self.get_demand_data(zone, start, end)
 
-                df_merged_dataset = pd.merge(
-                    df_weather, df_demand, on="datetime", how="inner"
-                )
-                df_merged_dataset["zone"] = zone_name
+        if df_demand.empty:
+            logger.warning(
+                f"Demand data not available for {zone} between {start} and {end}."
+            )
+            return None
+
+        city_location = ",".join(map(str, coordinates))
+        df_weather = self.get_weather_data(city_location, start, end)
+
+        return self.__merge_slice(zone, start, end, df_demand, df_weather)
+
+    def generate_dataset(
+        self,
+        zones: dict,
+        start_date: str,
+        end_date: str,
+        concurrent: bool = False,
+        max_workers: Optional[dict] = None,
+        output_dir: Optional[str] = None,
+    ) -> dict:
+        """
+        Generates a dataset by fetching and merging demand and weather data for specified zones.
 
-                date_df_list.append(df_merged_dataset)
+        With concurrent=True the requests for every zone/year/month slice are issued in parallel,
+        capped per provider by max_workers (defaults to DEFAULT_MAX_WORKERS). Requests are paced by
+        the quota scheduler; slices that do not fit in today's budget are deferred to the next run.
 
-                api_calls += 12
+        With output_dir set, each merged (zone, year) slice is upserted to the Parquet dataset
+        output_dir (data store layout, read back with read_dataset) as soon as it is merged, and then
+        released. Peak memory is one slice (the in-flight window of max_workers["demand"] slices when
+        concurrent), and the returned map holds the data files written for each zone instead of DataFrames.
+        """
+        writer = PartitionedParquetWriter(output_dir) if output_dir is not None else None
+        slices = {zone: [] for zone in zones}
 
-            if date_df_list:
-                combined_df = pd.concat(date_df_list, ignore_index=True)
+        def sink(zone, start, end, df_merged_dataset):
+            if writer is not None:
+                slices[zone].extend(writer.write(zone, start, end, df_merged_dataset))
             else:
-                combined_df = pd.DataFrame()
+                slices[zone].append(df_merged_dataset)
 
-            df_map[zone] = combined_df
-            logger.info(f"Data generation complete for {zone}.")
+        if concurrent:
+            deferred = self.__generate_dataset_concurrent(
+                zones, start_date, end_date, sink, max_workers, streaming=writer is not None
+            )
+        else:
+            deferred = self.__generate_dataset_serial(zones, start_date, end_date, sink)
+
+        if writer is not None:
+            df_map = slices
+            logger.info(f"Streamed {writer.rows_written} rows to {len(writer.files_written)} files in {output_dir}.")
+        else:
+            df_map = {
+                zone: pd.concat(date_df_list, ignore_index=True) if date_df_list else pd.DataFrame()
+                for zone, date_df_list in slices.items()
+            }
 
+        self._quota.defer(deferred)
         logger.info("Dataset generation complete for all zones.")
+        logger.info(f"HTTP endpoint stats: {self._http.get_stats()}")
         return df_map
 
+    def __generate_dataset_serial(self, zones: dict, start_date: str, end_date: str, sink) -> list:
+        """Fetches slice by slice in plan order, handing each merged slice to sink. Returns the deferred slices."""
+        logger.info(f"Generating dataset for zones from {start_date} to {end_date}.")
+        plan = self.__plan_slices(zones, start_date, end_date)
+        deferred = []
+
+        for zone in zones:
+            logger.info(f"Fetching data for zone: {zone}")
+
+            for start, end in plan[zone]:
+                # Once the budget is spent, queue the rest of the work instead of dropping it
+                if deferred:
+                    deferred.append({"zone": zone, "start": start, "end": end})
+                    continue
+
+                try:
+                    df_merged_dataset = self.__fetch_slice(zone, zones[zone], start, end)
+                except QuotaExhaustedError as e:
+                    logger.warning(f"{e} Deferring remaining slices.")
+                    deferred.append({"zone": zone, "start": start, "end": end})
+                    continue
+
+                if df_merged_dataset is not None:
+                    sink(zone, start, end, df_merged_dataset)
+
+            logger.info(f"Data generation complete for {zone}.")
+
+        return deferred
+
+    def __generate_dataset_concurrent(
+        self,
+        zones: dict,
+        start_date: str,
+        end_date: str,
+        sink,
+        max_workers: Optional[dict] = None,
+        streaming: bool = False,
+    ) -> list:
+        """
+        Concurrent counterpart of __generate_dataset_serial.
+
+        Demand requests for the (zone, year) slices are submitted to a demand pool. As each one
+        returns with data, the monthly weather requests of that slice are submitted to a weather
+        pool. Slices are merged and handed to sink in the serial order. When streaming, slices are
+        fetched in windows of max_workers["demand"] so only one window is held in memory; otherwise
+        all slices are fetched in a single window.
+        """
+        max_workers = {**DEFAULT_MAX_WORKERS, **(max_workers or {})}
+        logger.info(
+            f"Generating dataset concurrently for zones from {start_date} to {end_date} "
+            f"(max workers: {max_workers})."
+        )
+        plan = self.__plan_slices(zones, start_date, end_date)
+        slices = [(zone, start, end) for zone in zones for start, end in plan[zone]]
+        window = max_workers["demand"] if streaming else max(1, len(slices))
+        deferred = []
+
+        with ThreadPoolExecutor(max_workers=max_workers["demand"]) as demand_pool, \
+                ThreadPoolExecutor(max_workers=max_workers["weather"]) as weather_pool:
+            for i in range(0, len(slices), window):
+                self.__fetch_window(zones, slices[i:i + window], demand_pool, weather_pool, sink, deferred)
+
+        return deferred
+
+    def __fetch_window(self, zones: dict, slices: list, demand_pool, weather_pool, sink, deferred: list) -> None:
+        """Fetches a window of slices concurrently, then merges them in order and hands them to sink."""
+        demand_results = {}
+        weather_futures = {}
+
+        demand_futures = {
+            demand_pool.submit(self.get_demand_data, zone, start, end): (zone, start, end)
+            for zone, start, end in slices
+        }
+
+        for future in as_completed(demand_futures):
+            zone, start, end = demand_futures[future]
+            try:
+                df_demand = future.result()
+            except QuotaExhaustedError:
+                demand_results[(zone, start, end)] = None
+                continue
+            demand_results[(zone, start, end)] = df_demand
+
+            # Weather is only needed for slices that have demand data
+            if df_demand.empty:
+                continue
+
+            city_location = ",".join(map(str, zones[zone]))
+            weather_futures[(zone, start, end)] = [
+                weather_pool.submit(self.__get_weather_month, city_location, month_start, month_end)
+                for month_start, month_end in self.__split_dates_monthly(start, end)
+            ]
+
+        # Merge in the serial order once all slices are fetched
+        for zone, start, end in slices:
+            df_demand = demand_results.pop((zone, start, end))
+            city_location = ",".join(map(str, zones[zone]))
+
+            try:
+                if df_demand is None:
+                    raise QuotaExhaustedError(f"No demand budget for {zone} {start} - {end}.")
+                if df_demand.empty:
+                    df_weather = pd.DataFrame()
+                else:
+                    df_weather = self.__combine_weather(
+                        city_location,
+                        [f.result() for f in weather_futures.pop((zone, start, end))],
+                    )
+            except QuotaExhaustedError:
+                # Slices that ran out of budget are queued for the next run
+                deferred.append({"zone": zone, "start": start, "end": end})
+                continue
+
+            df_merged_dataset = self.__merge_slice(zone, start, end, df_demand, df_weather)
+            if df_merged_dataset is not None:
+                sink(zone, start, end, df_merged_dataset)
+
     def save_dataset(self, df: pd.DataFrame, path: str) -> None:
         """Saves the combined dataset to a CSV file."""
         logger.info(f"Saving dataset to {path}.")
@@ -326,21 +593,55 @@ class DataCollector:
         yesterday = today - timedelta(days=1)
         return yesterday.strftime("%d-%m-%Y"), today.strftime("%d-%m-%Y")
 
-    def get_data_from_api(self, regions, start_date, end_date, today_flag):
-        combined_df = pd.DataFrame()
-        for region in regions:
-            data_zones = regions[region]
-            df_map = self.generate_dataset(data_zones, start_date, end_date)
-    
-            first_df = next(iter(df_map.values()))  # Get the first DataFrame from the map
-            if first_df.empty:
-                print("This region has monthly data updates and not daily, skipping")
-                continue
-            else:
-                api_df = pd.concat(df_map.values(), ignore_index=True)
-                api_df.sort_values(by="datetime", inplace=True)
-        
-            combined_df = pd.concat([combined_df, api_df], ignore_index=True)
-        
+    def __collect_region(self, region, zones, start_date, end_date, concurrent) -> tuple[Optional[pd.DataFrame], float]:
+        """Fetches the zones of one region. Returns the sorted region frame (None when skipped) and the seconds taken."""
+        start = time.perf_counter()
+        logger.info(f"[{region}] Collecting {len(zones)} zones from {start_date} to {end_date}.")
+
+        df_map = self.generate_dataset(zones, start_date, end_date, concurrent=concurrent)
+
+        first_df = next(iter(df_map.values()))  # Get the first DataFrame from the map
+        if first_df.empty:
+            logger.info(f"[{region}] This region has monthly data updates and not daily, skipping.")
+            return None, time.perf_counter() - start
+
+        api_df = pd.concat(df_map.values(), ignore_index=True)
+        api_df.sort_values(by="datetime", inplace=True)
+
+        elapsed = time.perf_counter() - start
+        logger.info(f"[{region}] Collected {len(api_df)} rows in {elapsed:.2f}s.")
+        return api_df, elapsed
+
+    def get_data_from_api(
+        self, regions, start_date, end_date, today_flag, concurrent=False, max_region_workers=DEFAULT_REGION_WORKERS
+    ):
+        """
+        Collects every region in its own worker thread and concatenates the region frames once, in
+        region order. The HTTP client, response cache and quota scheduler are shared, so the
+        per-host connection cap and the provider quotas still apply across all regions.
+        """
+        start = time.perf_counter()
+        region_dfs = {}
+        timings = {}
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_region_workers, len(regions)))) as region_pool:
+            futures = {
+                region_pool.submit(
+                    self.__collect_region, region, regions[region], start_date, end_date, concurrent
+                ): region
+                for region in regions
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                region = futures[future]
+                region_dfs[region], timings[region] = future.result()
+                logger.info(f"{done}/{len(regions)} regions done ({region}).")
+
+        collected = [region_dfs[region] for region in regions if region_dfs[region] is not None]
+        combined_df = pd.concat(collected, ignore_index=True) if collected else pd.DataFrame()
+
+        logger.info(
+            f"Collected {len(combined_df)} rows from {len(collected)}/{len(regions)} regions in "
+            f"{time.perf_counter() - start:.2f}s. Region timings: "
+            + ", ".join(f"{region}={seconds:.2f}s" for region, seconds in timings.items())
+        )
         return combined_df
-    
\ No newline at end of file
@@ -14,6 +14,18 @@ def get_updated_data_from_api(dates: Tuple[str, str], regions: Dict[str, Dict[st
     data = data_obj.get_data_from_api(regions, start_date, end_date, today_flag=0)
     return data
 
+def stream_data_from_api(dates: Tuple[str, str], regions: Dict[str, Dict[str, list]], output_dir: str) -> dict:
+    """
+    Fetches data for a specified date range and regions, upserting each (zone, year) slice to the
+    Parquet dataset output_dir (zone/subba-name/month partitions, see data_store) as soon as it is merged.
+    """
+    data_obj = DataCollector()
+    start_date, end_date = dates
+    path_map = {}
+    for zones in regions.values():
+        path_map.update(data_obj.generate_dataset(zones, start_date, end_date, concurrent=True, output_dir=output_dir))
+    return path_map
+
 def validate_date(date_str: str) -> str:
     """
     Validates the date format as DD-MM-YYYY.
@@ -51,6 +63,12 @@ def main():
         required=True,
         help="Regions in JSON format, e.g., '{\"texas\": {\"COAS\": [29.749907, -95.358421]}}'"
     )
+    parser.add_argument(
+        '--output_dir',
+        type=str,
+        default=None,
+        help="Stream the data to a Parquet dataset partitioned by zone/subba-name/month in this directory, instead of one CSV."
+    )
     
     # Parse arguments
     args = parser.parse_args()
@@ -59,6 +77,11 @@ def main():
     dates = (args.start_date, args.end_date)
     regions = json.loads(args.regions)  # Parse JSON string to a dictionary
     
+    if args.output_dir:
+        path_map = stream_data_from_api(dates, regions, args.output_dir)
+        print(f"Data successfully written to {sum(len(paths) for paths in path_map.values())} files in '{args.output_dir}'")
+        return
+
     # Fetch data
     data = get_updated_data_from_api(dates, regions)
     
@@ -75,3 +98,6 @@ if __name__ == '__main__':
 # example
 # python dataset/scripts/data_downloader.py --start_date 09-11-2024 --end_date 10-11-2024 --regions '{"new_york": {"ZONEA": [42.8864, -78.8784]}}'
 
+# streaming backfill to a zone/subba-name/month partitioned Parquet dataset
+# python dataset/scripts/data_downloader.py --start_date 01-01-2019 --end_date 31-12-2023 --regions '{"new_york": {"ZONA": [42.8864, -78.8784]}}' --output_dir dataset/data/lake
+
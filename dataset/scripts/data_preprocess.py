@@ -9,16 +9,47 @@ import json
 
 import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from dataset.scripts.feature_engine import FeatureEngine
+from dataset.scripts.data_store import read_dataset, is_dataset
+from dataset.scripts.key_index import key_hashes
+from dataset.scripts.feature_transformer import FeatureTransformer, DEFAULT_TRANSFORMER_PATH
+from dataset.scripts.streaming_preprocess import StreamingPreprocessor
+from dataset.scripts.parallel_preprocess import ParallelPreprocessor
+from dataset.scripts.dtype_plan import apply_dtype_plan, dtype_plan
+from dataset.scripts.polars_engine import PolarsEngine, ENGINES, DEFAULT_ENGINE
 warnings.filterwarnings("ignore")
 
+# Days of stored rows read before the first new row of a series, to find its window context
+DEFAULT_CONTEXT_LOOKBACK_DAYS = 7
+
 class DataPreprocessor:
     """
     A class to preprocess data for a machine learning pipeline, including data cleaning,
     feature engineering, cyclic feature addition, normalization, encoding, and DVC tracking.
     """
-    def __init__(self):
-        with open(os.path.join(os.path.dirname(__file__), "../data/min_max_map.json"), 'r') as f:
-            self.normalize_json = json.load(f)
+    selected_features = [
+        'datetime', 'precipMM', 'weatherCode', 'visibility', 'HeatIndexF', 'WindChillF',
+        'windspeedMiles', 'FeelsLikeF', 'tempF_rolling_mean', 'windspeedMiles_rolling_mean',
+        'humidity_rolling_mean', 'value', 'pressure', 'pressureInches', 'cloudcover', 'uvIndex',
+        'tempF_rolling_std', 'windspeedMiles_rolling_std', 'humidity_rolling_std',
+        'tempF_lag_2', 'windspeedMiles_lag_2', 'humidity_lag_2',
+        'tempF_lag_4', 'windspeedMiles_lag_4', 'humidity_lag_4',
+        'tempF_lag_6', 'windspeedMiles_lag_6', 'humidity_lag_6',
+        'month_sin', 'month_cos', 'subba-name', 'zone'
+    ]
+
+    def __init__(self, feature_engine=None, transformer_path=DEFAULT_TRANSFORMER_PATH, engine=None):
+        # Scaling fitted on the training data, shared with inference, see feature_transformer.py
+        self.transformer_path = transformer_path
+        self.transformer = FeatureTransformer.load(transformer_path)
+
+        # Rolling and lag features per subba-name/zone series, see feature_engine.py
+        self.feature_engine = feature_engine or FeatureEngine()
+
+        # 'pandas', or 'polars' to run transform_df and preprocess_pipeline as one lazy query, see polars_engine.py
+        self.engine = engine or os.getenv("PREPROCESS_ENGINE", DEFAULT_ENGINE)
+        if self.engine not in ENGINES:
+            raise ValueError(f"Unknown preprocessing engine: {self.engine}, expected one of {ENGINES}")
     
     def save_data(self, df, step_name="processed_data"):
         """
@@ -40,193 +71,252 @@ class DataPreprocessor:
             print(f"An error occurred: {e}")
         return filename
 
-    def clean_data(self, df_json):
+    # ---------------------------------
+    # DataFrame pipeline. The *_df methods take and return DataFrames, the JSON methods below
+    # wrap them for the Airflow tasks, so JSON is only produced at task boundaries.
+    @staticmethod
+    def type_plan_df(df):
+        """
+        Returns {column: 'datetime' | 'int64' | 'float64' | None}, the dtype each column gets from
+        coerce_types_df: the dtypes a pd.read_json round trip would give. 'datetime' is parsed,
+        numeric strings become numbers and whole floats become int64; None leaves a column as is.
+        """
+        plan = {}
+        for col in df.columns:
+            data = df[col]
+            if col == 'datetime':
+                plan[col] = 'datetime'
+                continue
+            if data.dtype == object:
+                try:
+                    data = data.astype('float64')
+                except (TypeError, ValueError):
+                    plan[col] = None
+                    continue
+            if data.dtype.kind == 'f' and len(data):
+                try:
+                    plan[col] = 'int64' if (data.astype('int64') == data).all() else 'float64'
+                except (TypeError, ValueError, OverflowError):
+                    plan[col] = 'float64'
+            else:
+                plan[col] = str(data.dtype) if data.dtype.kind in 'iuf' else None
+        return plan
+
+    @staticmethod
+    def apply_type_plan_df(df, plan):
+        df = df.copy()
+        for col, dtype in plan.items():
+            if col not in df.columns or dtype is None:
+                continue
+            if dtype == 'datetime':
+                df[col] = pd.to_datetime(df[col])
+            elif df[col].dtype != dtype:
+                df[col] = df[col].astype('float64').astype(dtype)
+        return df
+
+    def coerce_types_df(self, df):
+        """
+        Gives a frame the dtypes a pd.read_json round trip would, see type_plan_df. Applied once on
+        pipeline entry so the DataFrame pipeline produces the same values as the JSON one.
+        """
+        return self.apply_type_plan_df(df, self.type_plan_df(df))
+
+    def clean_data_df(self, df):
         """
         Cleans data by removing missing values and duplicates.
         """
-        df = pd.read_json(df_json)
         df = df.dropna().drop_duplicates().reset_index(drop=True)
         print("Data cleaning complete: missing values and duplicates removed.")
-        json_data_cleaned = df.to_json(orient='records', lines=False)
-        return json_data_cleaned
+        return df
 
-    def engineer_features(self, df_json, window_size=6):
+    def engineer_features_df(self, df, window_size=None, context=None):
         """
         Engineers rolling and lag features to capture temporal patterns.
+        Windows and lags never reach across 'subba-name'/'zone' series; rows are taken in 'datetime' order.
+        context holds stored rows of the same series (see history_context_df); their values fill the
+        windows and lags of the rows of df, so only series without any history lose their first rows.
         """
-        df = pd.read_json(df_json)
-        df['tempF_rolling_mean'] = df['tempF'].rolling(window=window_size).mean()
-        df['tempF_rolling_std'] = df['tempF'].rolling(window=window_size).std()
-        df['windspeedMiles_rolling_mean'] = df['windspeedMiles'].rolling(window=window_size).mean()
-        df['windspeedMiles_rolling_std'] = df['windspeedMiles'].rolling(window=window_size).std()
-        df['humidity_rolling_mean'] = df['humidity'].rolling(window=window_size).mean()
-        df['humidity_rolling_std'] = df['humidity'].rolling(window=window_size).std()
-        
-        for lag in [2, 4, 6]:
-            df[f'tempF_lag_{lag}'] = df['tempF'].shift(lag)
-            df[f'windspeedMiles_lag_{lag}'] = df['windspeedMiles'].shift(lag)
-            df[f'humidity_lag_{lag}'] = df['humidity'].shift(lag)
-        
-        df.dropna(inplace=True)
+        feature_engine = self.feature_engine
+        if window_size is not None and window_size != feature_engine.windows[0]:
+            feature_engine = FeatureEngine(
+                columns=feature_engine.columns, windows=(window_size,), lags=feature_engine.lags,
+                group_columns=feature_engine.group_columns, time_column=feature_engine.time_column,
+            )
+        if context is not None:
+            df, context = self.__align_series(df), self.__align_series(context)
+        df = feature_engine.transform(df, context=context)
+        df = df.dropna().reset_index(drop=True)
         print("Feature engineering complete: rolling and lag features added.")
-        json_data = df.to_json(orient='records', lines=False)
-        return json_data
+        return df
 
-    def add_cyclic_features(self, df_json):
+    def __align_series(self, df):
+        """Series labels as strings and times as timestamps, so new rows and stored rows sort together."""
+        feature_engine = self.feature_engine
+        df = df.copy()
+        for col in feature_engine.group_columns:
+            if col in df.columns:
+                df[col] = df[col].astype(str)
+        df[feature_engine.time_column] = pd.to_datetime(df[feature_engine.time_column], format="ISO8601")
+        return df
+
+    def history_context_df(self, df, dataset_path, lookback_days=DEFAULT_CONTEXT_LOOKBACK_DAYS):
+        """
+        The stored rows of the raw data in dataset_path that the features of df depend on, cleaned like
+        df: for every series of df, the last history_size rows before its first row, and the rows between
+        its rows that df does not replace. Only the days df spans and lookback_days before them are read;
+        None when nothing is stored there.
+        """
+        feature_engine = self.feature_engine
+        time_column = feature_engine.time_column
+        df = self.__align_series(df)
+        start = df[time_column].min() - pd.Timedelta(days=lookback_days)
+        end = df[time_column].max() + pd.Timedelta(hours=1)
+
+        if is_dataset(dataset_path):
+            history = read_dataset(dataset_path, start=start, end=end)
+        else:
+            history = read_dataset(dataset_path)
+        history = self.__align_series(self.clean_data_df(history))
+        history = history[(history[time_column] >= start) & (history[time_column] < end)]
+
+        # Stored rows that df revises are replaced, not context
+        group_columns = [col for col in feature_engine.group_columns if col in df.columns]
+        key_columns = group_columns + [time_column]
+        history = history[~key_hashes(history, key_columns).isin(key_hashes(df, key_columns))]
+        if history.empty:
+            # Nothing stored in the window, e.g. a first run after the lookback
+            return None
+
+        first = df.groupby(group_columns, as_index=False)[time_column].min().rename(columns={time_column: "_first"})
+        history = history.merge(first, on=group_columns, how="inner")
+        before = history[time_column] < history["_first"]
+        context = pd.concat([feature_engine.tail(history[before]), history[~before]], ignore_index=True)
+        return context.drop(columns=["_first"])
+
+    def add_cyclic_features_df(self, df):
         """
         Adds cyclic features to capture seasonality patterns.
         """
-        df = pd.read_json(df_json)
+        df = df.copy()
         df['datetime_1'] = pd.to_datetime(df['datetime'])
-        df['month'] = df['datetime_1'].dt.month
-        df['month_sin'] = np.round(np.sin(2 * np.pi * df['month'] / 12), decimals=6)
-        df['month_cos'] = np.round(np.cos(2 * np.pi * df['month'] / 12), decimals=6)
-        df.drop(columns=['month'], inplace=True)
+        month = df['datetime_1'].dt.month
+        df['month_sin'] = np.round(np.sin(2 * np.pi * month / 12), decimals=6)
+        df['month_cos'] = np.round(np.cos(2 * np.pi * month / 12), decimals=6)
         print("Cyclic features added for month seasonality.")
-        json_data = df.to_json(orient='records', lines=False)
-        return json_data
+        return df
 
-    def normalize_and_encode(self, df_json):
+    def normalize_and_encode_df(self, df, transformer=None):
         """
         Normalizes numerical features and encodes categorical features.
+        transformer (a fitted FeatureTransformer) gives the min/max and labels, e.g. the ones of the
+        whole dataset when processing it in chunks; by default they are fitted on df itself.
         """
-        df = pd.read_json(df_json)
-        columns_to_normalize = df.select_dtypes(include=[np.number]).columns.difference(['month_sin', 'month_cos', "zone", "datetime", "subba-name"])
-        df[columns_to_normalize] = df[columns_to_normalize].apply(lambda x: (x - x.min()) / (x.max() - x.min()))
-        df['month_cos'] = (df['month_cos'] + 1) / 2
-        df['month_sin'] = (df['month_sin'] + 1) / 2
-
-        for col in df.select_dtypes(include=['object']).columns:
-            if col != 'datetime':
-                df[col] = df[col].astype(str)
-                le = LabelEncoder()
-                df[col] = le.fit_transform(df[col])
+        df = (transformer or FeatureTransformer().fit(df)).transform(df)
+        print("Data normalization and encoding complete.")
+        return df
 
+    def normalize_data_single_df(self, df):
+        """
+        Normalizes numerical features with the stored transformer, for single predictions.
+        """
+        df = self.transformer.transform(df, encode=False)
         print("Data normalization and encoding complete.")
-        json_data = df.to_json(orient='records', lines=False)
-        return json_data
-    
-    def normalize_data_single(self, df_json):
-        df = pd.read_json(df_json)
-        columns_to_normalize = df.select_dtypes(include=[np.number]).columns.difference(['month_sin', 'month_cos', "zone", "datetime", "datetime_1", "subba-name"])
+        return df
+
+    def select_final_features_df(self, df):
+        """
+        Selects relevant features for the final dataset, as float32 (see dtype_plan.py).
+        """
+        df_selected = df[self.selected_features]
+        df_selected = apply_dtype_plan(df_selected, dtype_plan(df_selected, chunked=True))
+        print("Feature selection complete: selected features retained.")
+        return df_selected
 
-        for col in columns_to_normalize:
-            min_value = float(self.normalize_json[col]["min"])
-            max_value = float(self.normalize_json[col]["max"]) 
+    def features_df(self, df):
+        """
+        Runs the steps before normalization: type coercion, cleaning, rolling/lag and cyclic features.
+        """
+        df = self.coerce_types_df(df)
+        df = self.clean_data_df(df)
+        df = self.engineer_features_df(df)
+        return self.add_cyclic_features_df(df)
 
-            # Normalize the column using min-max scaling
-            df[col] = (df[col] - min_value) / (max_value - min_value)
+    def transform_df(self, df, single=False):
+        """
+        Runs all preprocessing steps on a DataFrame without intermediate serialization.
+        single=True normalizes with the stored transformer and keeps all columns, as used for inference.
+        With the polars engine, a full run (not single) is executed by PolarsEngine with the same output.
+        """
+        if self.engine == "polars" and not single:
+            return PolarsEngine(self).transform(df)
+        df = self.features_df(df)
+        if single:
+            return self.normalize_data_single_df(df)
+        df = self.normalize_and_encode_df(df)
+        return self.select_final_features_df(df)
 
-        df['month_cos'] = (df['month_cos'] + 1) / 2
-        df['month_sin'] = (df['month_sin'] + 1) / 2
+    # ---------------------------------
+    # JSON wrappers for the Airflow tasks
+    def clean_data(self, df_json):
+        """
+        Cleans data by removing missing values and duplicates.
+        """
+        df = self.clean_data_df(pd.read_json(df_json))
+        return df.to_json(orient='records', lines=False)
 
-        print("Data normalization and encoding complete.")
-        json_data = df.to_json(orient='records', lines=False)
-        return json_data
+    def engineer_features(self, df_json, window_size=None):
+        """
+        Engineers rolling and lag features to capture temporal patterns.
+        """
+        df = self.engineer_features_df(pd.read_json(df_json), window_size=window_size)
+        return df.to_json(orient='records', lines=False)
+
+    def add_cyclic_features(self, df_json):
+        """
+        Adds cyclic features to capture seasonality patterns.
+        """
+        df = self.add_cyclic_features_df(pd.read_json(df_json))
+        return df.to_json(orient='records', lines=False)
+
+    def normalize_and_encode(self, df_json):
+        """
+        Normalizes numerical features and encodes categorical features.
+        """
+        df = self.normalize_and_encode_df(pd.read_json(df_json))
+        return df.to_json(orient='records', lines=False)
+    
+    def normalize_data_single(self, df_json):
+        df = self.normalize_data_single_df(pd.read_json(df_json))
+        return df.to_json(orient='records', lines=False)
     
     def denormalize_output(self, output):
-        original_max = self.normalize_json["value"]["min"]
-        original_min = self.normalize_json["value"]["max"]
-        output = output * (original_max - original_min) + original_min
-        return output
+        return self.transformer.inverse_transform(output, "value")
 
     
     def select_final_features(self, df_json):
         """
         Selects relevant features for the final dataset.
         """
-        df = pd.read_json(df_json)
-        selected_features = [
-            'datetime', 'precipMM', 'weatherCode', 'visibility', 'HeatIndexF', 'WindChillF',
-            'windspeedMiles', 'FeelsLikeF', 'tempF_rolling_mean', 'windspeedMiles_rolling_mean',
-            'humidity_rolling_mean', 'value', 'pressure', 'pressureInches', 'cloudcover', 'uvIndex',
-            'tempF_rolling_std', 'windspeedMiles_rolling_std', 'humidity_rolling_std',
-            'tempF_lag_2', 'windspeedMiles_lag_2', 'humidity_lag_2',
-            'tempF_lag_4', 'windspeedMiles_lag_4', 'humidity_lag_4',
-            'tempF_lag_6', 'windspeedMiles_lag_6', 'humidity_lag_6',
-            'month_sin', 'month_cos', 'subba-name', 'zone'
-        ]
-        df_selected = df[selected_features]
-        print("Feature selection complete: selected features retained.")
-        json_data_selected = df_selected.to_json(orient='records', lines=False)
-        return json_data_selected
-    
-    def preprocess_pipeline(self, file_path, chunk_by_subba=True):
-        """
-        Processes the data by either chunking based on unique 'subba-name' values or by row count (100 rows).
-        Each subset is processed independently and saved in a single output CSV file.
-        """
-        # Define the output file path for the preprocessed data
-        preprocessed_file_path = os.path.join(os.path.dirname(file_path), "data_preprocess.csv")
-
-        if chunk_by_subba:
-            # Load the entire dataset
-            data = pd.read_csv(file_path)
-            unique_subbas = data['subba-name'].unique()  # Get unique values of 'subba-name'
-
-            print(f"Total unique 'subba-name' values: {len(unique_subbas)}")
-
-            with open(preprocessed_file_path, 'w') as output_file:
-                for i, subba in enumerate(unique_subbas):
-                    print(f"Processing chunk {i+1} for subba-name: {subba}...")
-                    
-                    # Filter the data for the current 'subba-name'
-                    chunk = data[data['subba-name'] == subba]
-
-                    # Ensure columns are in the correct data type
-                    chunk['datetime'] = chunk['datetime'].astype(str)
-                    chunk['zone'] = chunk['zone'].astype(str)
-                    chunk['subba-name'] = chunk['subba-name'].astype(str)
-                    
-                    # Convert to JSON format for DAG compatibility
-                    df_json = chunk.to_json(orient='records', lines=False)
-                    
-                    # Preprocessing steps
-                    df_json = self.clean_data(df_json)
-                    df_json = self.engineer_features(df_json)
-                    df_json = self.add_cyclic_features(df_json)
-                    df_json = self.normalize_and_encode(df_json)
-                    df_json = self.select_final_features(df_json)
-                    
-                    # Convert back to DataFrame
-                    processed_chunk = pd.read_json(df_json)
-                    
-                    # Save the chunk to CSV, appending from the second chunk onward
-                    header = (i == 0)  # Write header only for the first chunk
-                    processed_chunk.to_csv(output_file, index=False, mode='a', header=header)
-                    print(f"Chunk {i+1} processed and saved for subba-name: {subba}.")
+        df_selected = self.select_final_features_df(pd.read_json(df_json))
+        return df_selected.to_json(orient='records', lines=False)
+
+    def preprocess_pipeline(self, file_path, chunk_by_subba=True, max_workers=1):
+        """
+        Processes the data either by chunks of unique 'subba-name' values (ParallelPreprocessor, in
+        max_workers processes; None uses PREPROCESS_WORKERS or all cores) or by streaming row chunks
+        (StreamingPreprocessor). Features are computed chunk by chunk, then every chunk is normalized
+        with one FeatureTransformer fitted on all of them; it is saved next to the output and becomes
+        self.transformer. The result is saved in a single output CSV file, or in the
+        'data_preprocess' dataset for a Parquet dataset directory as input.
+        With the polars engine, the whole input is preprocessed as one lazy query instead of chunks.
+        """
+        if self.engine == "polars":
+            preprocessed_file_path = PolarsEngine(self).run(file_path)
+        elif chunk_by_subba:
+            preprocessed_file_path = ParallelPreprocessor(self, max_workers).run(file_path)
         else:
-            # Get total number of rows in the file
-            total_rows = sum(1 for _ in open(file_path)) - 1  # Exclude header row
-            chunk_size = max(1, total_rows // 100)  # Ensure at least 1 row per chunk
-            print(f"Total rows: {total_rows}, Chunk size: {chunk_size}")
-
-            with open(preprocessed_file_path, 'w') as output_file:
-                for i, chunk in enumerate(pd.read_csv(file_path, chunksize=chunk_size)):
-                    print(f"Processing chunk {i+1}...")
-
-                    # Ensure columns are in the correct data type
-                    chunk['datetime'] = chunk['datetime'].astype(str)
-                    chunk['zone'] = chunk['zone'].astype(str)
-                    chunk['subba-name'] = chunk['subba-name'].astype(str)
-                    
-                    # Convert to JSON format for DAG compatibility
-                    df_json = chunk.to_json(orient='records', lines=False)
-                    
-                    # Preprocessing steps
-                    df_json = self.clean_data(df_json)
-                    df_json = self.engineer_features(df_json)
-                    df_json = self.add_cyclic_features(df_json)
-                    df_json = self.normalize_and_encode(df_json)
-                    df_json = self.select_final_features(df_json)
-                    
-                    # Convert back to DataFrame
-                    processed_chunk = pd.read_json(df_json)
-                    
-                    # Save the chunk to CSV, appending from the second chunk onward
-                    header = (i == 0)  # Write header only for the first chunk
-                    processed_chunk.to_csv(output_file, index=False, mode='a', header=header)
-                    print(f"Chunk {i+1} processed and saved.")
-            
+            # Stream fixed size chunks, carrying each series' window history across chunk boundaries
+            preprocessed_file_path = StreamingPreprocessor(self).run(file_path)
+
         print("All chunks processed and saved to the final preprocessed file.")
         return preprocessed_file_path
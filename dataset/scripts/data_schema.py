@@ -4,6 +4,12 @@ import json
 from typing import Optional, Any
 import logging
 import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from dataset.scripts.anomaly_rules import AnomalyRules
+from dataset.scripts.data_store import ParquetDataStore, is_dataset
 
 # Setup logging
 logging.basicConfig(
@@ -13,10 +19,91 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Rows per batch of chunked validation, and failure examples kept in its summary
+DEFAULT_VALIDATION_CHUNK_ROWS = 100_000
+DEFAULT_MAX_EXAMPLES = 20
+
+
+def iter_batches(path: str, chunk_rows: int = DEFAULT_VALIDATION_CHUNK_ROWS):
+    """Yields a CSV file or dataset in batches of at most chunk_rows rows, indexed by row number."""
+    if is_dataset(path):
+        root_dir, name = os.path.split(os.path.abspath(path))
+        partitions = ParquetDataStore(root_dir).iter_partitions(name)
+    else:
+        partitions = pd.read_csv(path, chunksize=chunk_rows)
+
+    buffer, offset = [], 0
+    for partition in partitions:
+        buffer.append(partition)
+        if sum(len(df) for df in buffer) < chunk_rows:
+            continue
+        pending = pd.concat(buffer, ignore_index=True)
+        while len(pending) >= chunk_rows:
+            batch, pending = pending.iloc[:chunk_rows], pending.iloc[chunk_rows:]
+            yield batch.set_axis(pd.RangeIndex(offset, offset + len(batch)))
+            offset += len(batch)
+        buffer = [pending]
+    pending = pd.concat(buffer, ignore_index=True) if buffer else pd.DataFrame()
+    if len(pending):
+        yield pending.set_axis(pd.RangeIndex(offset, offset + len(pending)))
+
+
+class ValidationSummary:
+    """
+    Compact result of a validation: the failures per column and check, the failed rows and the first
+    max_examples failure cases, folded batch by batch instead of kept as one exception.
+    """
+
+    def __init__(self, max_examples: int = DEFAULT_MAX_EXAMPLES, sample_fraction: Optional[float] = None):
+        self.max_examples = max_examples
+        self.sample_fraction = sample_fraction
+        self.rows = 0
+        self.validated_rows = 0
+        self.batches = 0
+        self.failed_rows = 0
+        self.failures = {}
+        self.examples = []
+
+    def add(self, rows: int, validated_rows: int, failure_cases: Optional[pd.DataFrame] = None) -> None:
+        self.rows += rows
+        self.validated_rows += validated_rows
+        self.batches += 1
+        if failure_cases is None or failure_cases.empty:
+            return
+        counts = failure_cases.groupby(["column", "check"], dropna=False).size()
+        for (column, check), count in counts.items():
+            key = f"{column}: {check}"
+            self.failures[key] = self.failures.get(key, 0) + int(count)
+        self.failed_rows += failure_cases["index"].dropna().nunique()
+        for case in failure_cases.head(self.max_examples - len(self.examples)).itertuples(index=False):
+            self.examples.append({
+                "column": case.column, "check": str(case.check),
+                "failure_case": str(case.failure_case), "row": None if pd.isna(case.index) else int(case.index),
+            })
+
+    @property
+    def valid(self) -> bool:
+        return not self.failures
+
+    def to_dict(self) -> dict:
+        summary = {
+            "valid": self.valid, "rows": self.rows, "validated_rows": self.validated_rows, "batches": self.batches,
+            "failed_rows": self.failed_rows, "failures": dict(self.failures), "examples": list(self.examples),
+        }
+        if self.sample_fraction is not None:
+            # Failures of the sample scaled to all rows
+            summary["sample_fraction"] = self.sample_fraction
+            summary["estimated_failures"] = {key: round(count / self.sample_fraction) for key, count in self.failures.items()}
+        return summary
+
+
 class DataSchemaAndStatistics:
-    def __init__(self, data: pd.DataFrame):
+    def __init__(self, data: pd.DataFrame, anomaly_rules: Optional[AnomalyRules] = None):
         self.data = data
         self.schema: Optional[pa.DataFrameSchema] = None
+        # Repairs of fix_anomalies, see anomaly_rules.py
+        self.anomaly_rules = anomaly_rules or AnomalyRules.default()
+        self.anomaly_report: Optional[dict] = None
 
     def infer_schema(self) -> pa.DataFrameSchema:
         """
@@ -41,35 +128,63 @@ class DataSchemaAndStatistics:
             return 1
         except pa.errors.SchemaErrors as e:
             new_data.fillna(0, inplace=True)
+            summary = ValidationSummary()
+            summary.add(len(new_data), len(new_data), e.failure_cases)
             logger.error("Schema validation errors found:")
-            logger.error(e)
+            logger.error(summary.to_dict())
             return 0
-        
-    def fix_anomalies(self, df: pd.DataFrame) -> None:
+
+    def validate_batches(
+        self, batches, max_examples: int = DEFAULT_MAX_EXAMPLES, sample_fraction: Optional[float] = None, seed: int = 42
+    ) -> dict:
         """
-        Identifies and fixes common data anomalies.
+        Validates the frames of batches one by one against the schema, so only one batch and its
+        failure cases are in memory. With sample_fraction, only that random share of each batch is
+        validated, as a quick pre-check whose failure counts are also estimated for all rows.
+        Returns the ValidationSummary as a dict.
         """
-        # Fix missing values
-        df.fillna(0, inplace=True)  # Replace NaNs with 0
-        
-        # Remove duplicates
-        df.drop_duplicates(inplace=True)
-        
-        # Ensure no negative values for specific columns
-        columns_to_check = [
-            'precipMM', 'visibility', 'HeatIndexF', 'WindChillF', 'windspeedMiles',
-            'FeelsLikeF', 'tempF_rolling_mean', 'windspeedMiles_rolling_mean', 
-            'humidity_rolling_mean', 'pressure', 'pressureInches', 'cloudcover', 
-            'uvIndex', 'tempF_rolling_std', 'windspeedMiles_rolling_std', 
-            'humidity_rolling_std', 'tempF_lag_2', 'tempF_lag_4', 'tempF_lag_6', 
-            'windspeedMiles_lag_2', 'windspeedMiles_lag_4', 'windspeedMiles_lag_6', 
-            'humidity_lag_2', 'humidity_lag_4', 'humidity_lag_6', 'value'
-        ]
-        for col in columns_to_check:
-            if col in df.columns:
-                df[col] = df[col].apply(lambda x: x if x >= 0 else 0)
+        if not self.schema:
+            raise ValueError("Schema has not been inferred. Run infer_schema() first.")
+        if sample_fraction is not None and not 0 < sample_fraction <= 1:
+            raise ValueError(f"sample_fraction must be in (0, 1], got {sample_fraction}")
+
+        summary = ValidationSummary(max_examples, sample_fraction)
+        for i, batch in enumerate(batches):
+            rows = len(batch)
+            if sample_fraction is not None:
+                batch = batch.sample(frac=sample_fraction, random_state=seed + i).sort_index()
+            try:
+                self.schema.validate(batch, lazy=True)
+                summary.add(rows, len(batch))
+            except pa.errors.SchemaErrors as e:
+                summary.add(rows, len(batch), e.failure_cases)
+
+        result = summary.to_dict()
+        if summary.valid:
+            logger.info(f"{summary.validated_rows} of {summary.rows} rows validated successfully in {summary.batches} batches.")
+        else:
+            logger.error(f"Schema validation errors found in {summary.failed_rows} rows: {summary.failures}")
+        return result
+
+    def validate_dataset(
+        self,
+        path: str,
+        chunk_rows: int = DEFAULT_VALIDATION_CHUNK_ROWS,
+        max_examples: int = DEFAULT_MAX_EXAMPLES,
+        sample_fraction: Optional[float] = None,
+        seed: int = 42,
+    ) -> dict:
+        """Streams a CSV file or dataset through validate_batches in batches of chunk_rows rows."""
+        return self.validate_batches(iter_batches(path, chunk_rows), max_examples, sample_fraction, seed)
         
-        logger.info("Anomalies fixed successfully.")
+    def fix_anomalies(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Identifies and fixes common data anomalies in place: missing values are filled with 0,
+        duplicates removed and negative values of the non-negative columns set to 0, as declared
+        in self.anomaly_rules. The repaired cells per rule are kept in self.anomaly_report.
+        """
+        df, self.anomaly_report = self.anomaly_rules.apply(df, inplace=True)
+        logger.info(f"Anomalies fixed successfully: {self.anomaly_report}")
 
         return df
 
@@ -103,6 +218,8 @@ def main():
     parser.add_argument("--fix-anomalies", action="store_true", help="Fix anomalies in the data")
     parser.add_argument("--save-schema", type=str, help="File path to save inferred schema as JSON")
     parser.add_argument("--load-schema", type=str, help="File path to load schema from JSON")
+    parser.add_argument("--chunk-rows", type=int, help="Validate the data in batches of this many rows (CSV file or dataset)")
+    parser.add_argument("--sample-fraction", type=float, help="Only validate this random share of each batch")
     
     args = parser.parse_args()
 
@@ -119,7 +236,10 @@ def main():
         tool.load_schema(args.load_schema)
 
     # Validate new data if provided
-    if args.validate_data:
+    if args.validate_data and (args.chunk_rows or args.sample_fraction):
+        summary = tool.validate_dataset(args.validate_data, args.chunk_rows or DEFAULT_VALIDATION_CHUNK_ROWS, sample_fraction=args.sample_fraction)
+        print(json.dumps(summary, indent=4))
+    elif args.validate_data:
         new_data = pd.read_csv(args.validate_data)
         tool.validate_data(new_data)
 
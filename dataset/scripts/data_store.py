@@ -0,0 +1,573 @@
+# usage -
+# python dataset/scripts/data_store.py migrate dataset/data/data_raw.csv data_raw
+# python dataset/scripts/data_store.py info data_raw
+
+import os
+import json
+import time
+import uuid
+import shutil
+import logging
+import argparse
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from dataset.scripts.key_index import (
+    KeyIndex, KEY_COLUMNS, LABEL_SEPARATOR, key_hashes, row_hashes, partition_key, partition_label,
+)
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    handlers=[logging.StreamHandler()],
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_DIR = os.path.join(os.path.dirname(__file__), "../data")
+
+# Hive partition keys, in directory order. 'month' is derived from 'datetime' on write.
+DEFAULT_PARTITION_COLS = ("zone", "subba-name", "month")
+
+# Sidecar with the pandas dtypes and column order of a dataset; '_' files are skipped by readers
+SCHEMA_FILE = "_schema.json"
+
+
+class ParquetDataStore:
+    """
+    Typed, compressed Parquet datasets, partitioned by zone/subba-name/month.
+
+    Each dataset is a directory <root>/<name> in Hive layout (zone=.../subba-name=.../month=YYYY-MM).
+    read() only opens the partitions and row groups that can match its filters (predicate pushdown)
+    and only decodes the requested columns (projection). The time column is stored as a timestamp.
+    The pandas dtypes and the column order of the written frames are kept in a sidecar, so the
+    partition columns come back with their original dtype and the derived 'month' key is dropped.
+    Rows are returned ordered by zone, subba-name and time.
+    """
+
+    def __init__(
+        self,
+        root_dir: Optional[str] = None,
+        partition_cols: tuple = DEFAULT_PARTITION_COLS,
+        compression: str = "zstd",
+        time_column: str = "datetime",
+    ):
+        self.root_dir = os.path.abspath(root_dir or os.getenv("DATA_STORE_DIR", DEFAULT_STORE_DIR))
+        self.partition_cols = tuple(partition_cols)
+        self.compression = compression
+        self.time_column = time_column
+        os.makedirs(self.root_dir, exist_ok=True)
+
+    # ---------------------------------
+    def path(self, name: str) -> str:
+        return os.path.join(self.root_dir, name)
+
+    def exists(self, name: str) -> bool:
+        return os.path.exists(os.path.join(self.path(name), SCHEMA_FILE))
+
+    def list(self) -> list:
+        """Returns the names of the datasets in the store."""
+        return sorted(
+            name for name in os.listdir(self.root_dir)
+            if os.path.isdir(self.path(name)) and self.exists(name)
+        )
+
+    def delete(self, name: str) -> None:
+        shutil.rmtree(self.path(name), ignore_errors=True)
+
+    def schema(self, name: str) -> dict:
+        with open(os.path.join(self.path(name), SCHEMA_FILE), "r") as f:
+            return json.load(f)
+
+    def __save_schema(
+        self, name: str, df: pd.DataFrame, partition_cols: Optional[list], types: Optional[dict] = None
+    ) -> None:
+        schema = {"columns": list(df.columns), "dtypes": {col: str(dtype) for col, dtype in df.dtypes.items()}}
+        if self.exists(name):
+            # Appends may add columns, keep the first seen order and dtypes
+            previous = self.schema(name)
+            schema["columns"] = previous["columns"] + [col for col in schema["columns"] if col not in previous["columns"]]
+            schema["dtypes"] = {**schema["dtypes"], **previous["dtypes"]}
+            types = {**previous.get("types", {}), **(types or {})}
+            if partition_cols is None:
+                partition_cols = previous["partition_cols"]
+        schema["partition_cols"] = partition_cols or []
+        schema["types"] = types or {}
+
+        temp_path = os.path.join(self.path(name), SCHEMA_FILE + ".tmp")
+        with open(temp_path, "w") as f:
+            json.dump(schema, f, indent=4)
+        os.replace(temp_path, os.path.join(self.path(name), SCHEMA_FILE))
+
+    def __partitioning(self, partition_cols: list):
+        # Partition values are always strings, so '4001' and 'ZONA' zones behave the same
+        if not partition_cols:
+            return None
+        return ds.partitioning(pa.schema([(col, pa.string()) for col in partition_cols]), flavor="hive")
+
+    def __partitioned(self, df: pd.DataFrame) -> tuple[pd.DataFrame, list]:
+        """Adds the derived month key and returns the frame with the partition columns it has."""
+        df = df.copy(deep=False)
+        if "month" in self.partition_cols and "month" not in df.columns and self.time_column in df.columns:
+            df["month"] = df[self.time_column].dt.strftime("%Y-%m")
+        partition_cols = [col for col in self.partition_cols if col in df.columns]
+        # Partition values become directory names, keep them as strings there
+        for col in partition_cols:
+            df[col] = df[col].astype(str)
+        return df, partition_cols
+
+    def __has_files(self, name: str) -> bool:
+        return any(f.endswith(".parquet") and not f.startswith("_") for _, _, files in os.walk(self.path(name)) for f in files)
+
+    def __conform(self, name: str, table: pa.Table, partition_cols: list) -> tuple[pa.Table, dict]:
+        """
+        Casts an appended table to the Arrow types already in the dataset. A column that does not fit
+        (e.g. 2.5 into int64) is kept as is and the dataset type is widened; read() then casts the
+        older files to the wider type. Returns the table and the dataset types of its columns.
+        """
+        existing = self.schema(name).get("types", {}) if self.exists(name) and self.__has_files(name) else {}
+        types = {}
+        for i, field in enumerate(table.schema):
+            if field.name in partition_cols:
+                continue
+            if field.name not in existing or existing[field.name] == str(field.type):
+                types[field.name] = str(field.type)
+                continue
+
+            existing_type = pa.type_for_alias(existing[field.name])
+            try:
+                table = table.set_column(i, field.name, table.column(i).cast(existing_type))
+                types[field.name] = existing[field.name]
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                widened = pa.unify_schemas(
+                    [pa.schema([(field.name, existing_type)]), pa.schema([field])], promote_options="permissive"
+                )
+                types[field.name] = str(widened.field(field.name).type)
+        return table, types
+
+    # ---------------------------------
+    def write(self, name: str, df: pd.DataFrame, mode: str = "append") -> None:
+        """
+        Writes df to a dataset.
+
+        mode:
+            append              - adds new files next to the existing ones
+            overwrite           - replaces the whole dataset
+            overwrite_partitions - replaces only the partitions that df touches
+        """
+        if mode not in ("append", "overwrite", "overwrite_partitions"):
+            raise ValueError(f"Unknown write mode: {mode}")
+        if mode == "overwrite":
+            self.delete(name)
+        os.makedirs(self.path(name), exist_ok=True)
+        if self.time_column in df.columns and not pd.api.types.is_datetime64_any_dtype(df[self.time_column]):
+            df = df.copy(deep=False)
+            df[self.time_column] = pd.to_datetime(df[self.time_column], format="ISO8601")
+        if df.empty:
+            self.__save_schema(name, df, None)
+            return
+
+        table_df, partition_cols = self.__partitioned(df)
+        table, types = self.__conform(name, pa.Table.from_pandas(table_df, preserve_index=False), partition_cols)
+
+        ds.write_dataset(
+            table,
+            self.path(name),
+            format="parquet",
+            partitioning=self.__partitioning(partition_cols),
+            # Names sort in write order, so rows that tie in read()'s sort keep the order they were appended in
+            basename_template=f"part-{time.time_ns():020d}-{uuid.uuid4().hex[:8]}-{{i}}.parquet",
+            existing_data_behavior="delete_matching" if mode == "overwrite_partitions" else "overwrite_or_ignore",
+            file_options=ds.ParquetFileFormat().make_write_options(compression=self.compression),
+        )
+        self.__save_schema(name, df, partition_cols, types)
+        logger.info(f"Wrote {len(df)} rows to dataset {name} ({mode}).")
+
+    def read(
+        self,
+        name: str,
+        columns: Optional[list] = None,
+        filters: Optional[list] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """
+        Reads a dataset, or the part of it that matches.
+
+        columns - projection, only these columns are decoded
+        filters - [(column, op, value), ...] ANDed together, pushed down to partitions and row groups
+        start, end - time range [start, end) on the time column; also prunes month partitions
+        """
+        schema = self.schema(name)
+        partition_cols = schema.get("partition_cols", [])
+        if not self.__has_files(name):
+            return pd.DataFrame(columns=columns or schema["columns"])
+        dataset = self.__dataset(name, schema)
+
+        conditions = list(filters or [])
+        if start is not None:
+            conditions.append((self.time_column, ">=", pd.Timestamp(start)))
+            if "month" in partition_cols:
+                conditions.append(("month", ">=", pd.Timestamp(start).strftime("%Y-%m")))
+        if end is not None:
+            conditions.append((self.time_column, "<", pd.Timestamp(end)))
+            if "month" in partition_cols:
+                conditions.append(("month", "<=", pd.Timestamp(end).strftime("%Y-%m")))
+
+        expression = None
+        for column, op, value in conditions:
+            condition = self.__condition(dataset, column, op, value, column in partition_cols)
+            expression = condition if expression is None else expression & condition
+
+        wanted = [col for col in (columns or schema["columns"]) if col in schema["columns"]]
+        table = dataset.to_table(columns=[col for col in wanted if col in dataset.schema.names], filter=expression)
+        return self.__to_frame(table, wanted, schema)
+
+    def iter_partitions(self, name: str, columns: Optional[list] = None):
+        """
+        Yields the dataset one leaf partition (e.g. zone, subba-name, month) at a time, in the row order
+        of read(), so a dataset can be processed without loading it whole.
+        """
+        for key in self.partition_keys(name):
+            yield self.read_partition(name, key, columns)
+
+    def partition_keys(self, name: str) -> list:
+        """Returns the {partition column: value} of every leaf partition, in the row order of read()."""
+        schema = self.schema(name)
+        if not self.__has_files(name):
+            return []
+        partition_cols = schema.get("partition_cols", [])
+        keys = self.__partition_files(name, schema)
+        return [dict(zip(partition_cols, key)) for key in keys]
+
+    def partition_files(self, name: str) -> dict:
+        """
+        {partition label: sorted data file paths relative to the dataset} of every leaf partition.
+        Files are never modified once written, so the files of a partition identify its content.
+        partition_key(label, partition_cols) gives the key read_partition takes.
+        """
+        if not self.exists(name) or not self.__has_files(name):
+            return {}
+        return {
+            partition_label(key): sorted(os.path.relpath(path, self.path(name)) for path in paths)
+            for key, paths in self.__partition_files(name, self.schema(name)).items()
+        }
+
+    def read_partition(self, name: str, key: dict, columns: Optional[list] = None) -> pd.DataFrame:
+        """Reads the leaf partition key (as returned by partition_keys), rows in the order of read()."""
+        schema = self.schema(name)
+        partition_cols = schema.get("partition_cols", [])
+        paths = self.__partition_files(name, schema)[tuple(key.get(col) for col in partition_cols)]
+        partition = ds.dataset(
+            paths, format="parquet", schema=self.__dataset(name, schema).schema,
+            partitioning=self.__partitioning(partition_cols), partition_base_dir=self.path(name),
+        )
+        wanted = [col for col in (columns or schema["columns"]) if col in schema["columns"]]
+        table = partition.to_table(columns=[col for col in wanted if col in partition.schema.names])
+        return self.__to_frame(table, wanted, schema)
+
+    def __partition_files(self, name: str, schema: dict) -> dict:
+        """{partition key tuple: file paths}, keys sorted by series columns, then by month."""
+        partition_cols = schema.get("partition_cols", [])
+        paths = {}
+        for fragment in self.__dataset(name, schema).get_fragments():
+            keys = ds.get_partition_keys(fragment.partition_expression)
+            paths.setdefault(tuple(keys.get(col) for col in partition_cols), []).append(fragment.path)
+
+        # read() orders by the series columns, then by time, i.e. by month
+        series = [i for i, col in enumerate(partition_cols) if col != "month"]
+        return {key: paths[key] for key in sorted(paths, key=lambda key: ([key[i] for i in series], key))}
+
+    def __dataset(self, name: str, schema: dict):
+        partition_cols = schema.get("partition_cols", [])
+        # Explicit schema: files written before a type was widened are cast on the fly
+        arrow_schema = pa.schema(
+            [(col, pa.type_for_alias(schema["types"][col])) for col in schema["columns"] if col in schema.get("types", {})]
+            + [(col, pa.string()) for col in partition_cols]
+        )
+        return ds.dataset(
+            self.path(name), format="parquet", schema=arrow_schema, partitioning=self.__partitioning(partition_cols)
+        )
+
+    def __to_frame(self, table: pa.Table, wanted: list, schema: dict) -> pd.DataFrame:
+        partition_cols = schema.get("partition_cols", [])
+        df = table.to_pandas()
+
+        # Appends leave a partition in several files, return each series in time order
+        sort_cols = [col for col in partition_cols if col != "month" and col in df.columns]
+        if self.time_column in df.columns:
+            sort_cols.append(self.time_column)
+        if sort_cols:
+            df = df.sort_values(sort_cols, kind="stable", ignore_index=True)
+
+        # Partition keys are read back as strings, restore the written dtypes and order
+        for col in wanted:
+            if col in df.columns and col in partition_cols:
+                df[col] = df[col].astype(str).astype(schema["dtypes"][col])
+        return df[[col for col in wanted if col in df.columns]]
+
+    @staticmethod
+    def __condition(dataset, column: str, op: str, value, is_partition: bool):
+        field = ds.field(column)
+        field_type = dataset.schema.field(column).type
+
+        def convert(v):
+            if is_partition:
+                return str(v)
+            if pa.types.is_timestamp(field_type):
+                return pa.scalar(pd.Timestamp(v).to_pydatetime(), type=field_type)
+            return v
+
+        if op in ("in", "not in"):
+            values = pa.array([convert(v) for v in value], type=field_type)
+            return field.isin(values) if op == "in" else ~field.isin(values)
+
+        value = convert(value)
+        ops = {
+            "=": field == value, "==": field == value, "!=": field != value,
+            "<": field < value, "<=": field <= value, ">": field > value, ">=": field >= value,
+        }
+        if op not in ops:
+            raise ValueError(f"Unsupported filter operator: {op}")
+        return ops[op]
+
+    # ---------------------------------
+    # Upserts keyed on zone/subba-name/datetime, see key_index.py
+    def upsert(self, name: str, df: pd.DataFrame, key_columns=KEY_COLUMNS) -> dict:
+        """
+        Writes the rows of df by key: new keys are appended, rows whose key is stored with other
+        values replace it and rows already stored as they are are skipped. Only the partitions of
+        replaced rows are rewritten; the stored keys come from the persisted key index, so the
+        history is not reread. Returns the number of inserted, updated and unchanged rows.
+        """
+        key_columns = [col for col in key_columns if col in df.columns]
+        if not key_columns:
+            raise ValueError(f"None of the key columns {list(KEY_COLUMNS)} are in the frame.")
+        counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+        if df.empty:
+            return counts
+
+        df = df.copy(deep=False)
+        if self.time_column in df.columns and not pd.api.types.is_datetime64_any_dtype(df[self.time_column]):
+            df[self.time_column] = pd.to_datetime(df[self.time_column], format="ISO8601")
+        keys = key_hashes(df, key_columns)
+        # The last row of a key in the batch wins
+        last = ~keys.duplicated(keep="last")
+        df, keys = df[last], keys[last]
+
+        index, _ = self.__refresh_index(name, key_columns)
+        rows = row_hashes(df, key_columns)
+        known, stored_rows = index.lookup(keys)
+        inserted = ~known
+        updated = known & (stored_rows != rows.to_numpy())
+        labels = self.__labels(df)
+
+        if inserted.any():
+            self.write(name, df[inserted], mode="append")
+        if updated.any():
+            partition_cols = self.schema(name).get("partition_cols", [])
+            replaced = set(keys[updated])
+            partitions = []
+            for label, changed in df[updated].groupby(labels[updated], sort=False):
+                stored = self.read_partition(name, partition_key(label, partition_cols))
+                partitions.append(stored[~key_hashes(stored, key_columns).isin(replaced)])
+                partitions.append(changed)
+            self.write(name, pd.concat(partitions, ignore_index=True), mode="overwrite_partitions")
+
+        written = inserted | updated
+        index.add(keys[written], rows[written], labels[written])
+        index.files = self.partition_files(name)
+        index.save(self.path(name))
+
+        counts = {"inserted": int(inserted.sum()), "updated": int(updated.sum()), "unchanged": int((~written).sum())}
+        logger.info(f"Upserted into dataset {name}: {counts}.")
+        return counts
+
+    def changed(self, name: str, df: pd.DataFrame, key_columns=KEY_COLUMNS) -> np.ndarray:
+        """
+        Mask of the rows of df that upsert() would write: keys that are not stored, or stored with
+        other values. The refreshed key index is saved, so the upsert that follows reads nothing again.
+        """
+        key_columns = [col for col in key_columns if col in df.columns]
+        if not key_columns:
+            raise ValueError(f"None of the key columns {list(KEY_COLUMNS)} are in the frame.")
+        if df.empty or not self.exists(name):
+            return np.ones(len(df), dtype=bool)
+
+        index, _ = self.__refresh_index(name, key_columns)
+        index.save(self.path(name))
+        known, stored_rows = index.lookup(key_hashes(df, key_columns))
+        return ~known | (stored_rows != row_hashes(df, key_columns).to_numpy())
+
+    def deduplicate(self, name: str, key_columns=KEY_COLUMNS) -> int:
+        """
+        Keeps the last row of every key. Only the partitions changed since the key index was saved
+        are read, and only the ones with repeated keys are rewritten. Returns the number of rows dropped.
+        """
+        if not self.exists(name):
+            return 0
+        key_columns = [col for col in key_columns if col in self.schema(name)["columns"]]
+        if not key_columns:
+            raise ValueError(f"None of the key columns {list(KEY_COLUMNS)} are in dataset {name}.")
+        index, dropped = self.__refresh_index(name, key_columns, deduplicate=True)
+        index.save(self.path(name))
+        logger.info(f"Dropped {dropped} rows with repeated keys from dataset {name}.")
+        return dropped
+
+    def __labels(self, df: pd.DataFrame) -> pd.Series:
+        """The partition label every row of df is written to."""
+        partitioned, partition_cols = self.__partitioned(df)
+        if not partition_cols:
+            return pd.Series("", index=df.index)
+        labels = partitioned[partition_cols[0]]
+        for col in partition_cols[1:]:
+            labels = labels + LABEL_SEPARATOR + partitioned[col]
+        return labels
+
+    def __refresh_index(self, name: str, key_columns: list, deduplicate: bool = False) -> tuple[KeyIndex, int]:
+        """
+        Loads the key index of a dataset and reads again the partitions whose files changed since it
+        was saved (all of them the first time). With deduplicate, the partitions with repeated keys
+        are rewritten with the last row of each key. Returns the index and the number of rows dropped.
+        """
+        index = KeyIndex.load(self.path(name), key_columns)
+        files = self.partition_files(name)
+        stale = index.stale_partitions(files)
+        index.drop_partitions(stale)
+
+        partition_cols = self.schema(name).get("partition_cols", []) if files else []
+        rewritten, dropped = [], 0
+        for label in sorted(stale & set(files)):
+            stored = self.read_partition(name, partition_key(label, partition_cols))
+            keys = key_hashes(stored, key_columns)
+            repeated = keys.duplicated(keep="last")
+            if deduplicate and repeated.any():
+                stored, keys = stored[~repeated], keys[~repeated]
+                rewritten.append(stored)
+                dropped += int(repeated.sum())
+            index.add(keys, row_hashes(stored, key_columns), label)
+
+        if rewritten:
+            self.write(name, pd.concat(rewritten, ignore_index=True), mode="overwrite_partitions")
+            files = self.partition_files(name)
+        index.files = files
+        return index, dropped
+
+    def from_csv(self, name: str, csv_path: str, chunksize: int = 500_000) -> str:
+        """Converts a CSV file into a dataset, chunk by chunk. Returns the dataset path."""
+        logger.info(f"Converting {csv_path} into dataset {name}.")
+        self.delete(name)
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+            self.write(name, chunk, mode="append")
+        return self.path(name)
+
+
+# -----------------------------------------------------------------------
+# Path based helpers, so callers handle CSV files and datasets alike
+def is_dataset(path: str) -> bool:
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, SCHEMA_FILE))
+
+
+def read_dataset(path: str, columns: Optional[list] = None, **kwargs) -> pd.DataFrame:
+    """Reads a dataset directory through ParquetDataStore, a Parquet file or a CSV file."""
+    if is_dataset(path):
+        root_dir, name = os.path.split(os.path.abspath(path))
+        return ParquetDataStore(root_dir).read(name, columns=columns, **kwargs)
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path, columns=columns)
+    return pd.read_csv(path, usecols=columns)
+
+
+def write_dataset(path: str, df: pd.DataFrame, mode: str = "overwrite") -> str:
+    """Writes df to a dataset directory, or to a CSV file when path ends with .csv."""
+    if path.endswith(".csv"):
+        header = mode == "overwrite" or not os.path.exists(path) or os.path.getsize(path) == 0
+        if not header:
+            # Align appended rows to the file header
+            df = df.reindex(columns=pd.read_csv(path, nrows=0).columns)
+        df.to_csv(path, mode="w" if mode == "overwrite" else "a", header=header, index=False)
+        return path
+
+    root_dir, name = os.path.split(os.path.abspath(path))
+    ParquetDataStore(root_dir).write(name, df, mode=mode)
+    return path
+
+
+def upsert_dataset(path: str, df: pd.DataFrame, key_columns=KEY_COLUMNS) -> str:
+    """Upserts df by key into a dataset directory, or into a CSV file when path ends with .csv (rewritten whole)."""
+    if path.endswith(".csv"):
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            df = pd.concat([pd.read_csv(path), df], ignore_index=True)
+        key_columns = [col for col in key_columns if col in df.columns]
+        df = df[~key_hashes(df, key_columns).duplicated(keep="last")]
+        return write_dataset(path, df, mode="overwrite")
+
+    root_dir, name = os.path.split(os.path.abspath(path))
+    ParquetDataStore(root_dir).upsert(name, df, key_columns)
+    return path
+
+
+def changed_rows(path: str, df: pd.DataFrame, key_columns=KEY_COLUMNS) -> np.ndarray:
+    """Mask of the rows of df that are not stored as they are in a dataset directory or CSV file."""
+    if path.endswith(".csv"):
+        if df.empty or not os.path.exists(path) or os.path.getsize(path) == 0:
+            return np.ones(len(df), dtype=bool)
+        stored = pd.read_csv(path)
+        key_columns = [col for col in key_columns if col in df.columns and col in stored.columns]
+        stored_keys = key_hashes(stored, key_columns)
+        last = ~stored_keys.duplicated(keep="last")
+        stored_rows = row_hashes(stored.reindex(columns=df.columns)[last], key_columns).to_numpy()
+        positions = pd.Index(stored_keys[last]).get_indexer(key_hashes(df, key_columns))
+        known = positions >= 0
+        rows = np.zeros(len(df), dtype="uint64")
+        rows[known] = stored_rows[positions[known]]
+        return ~known | (rows != row_hashes(df, key_columns).to_numpy())
+
+    root_dir, name = os.path.split(os.path.abspath(path))
+    return ParquetDataStore(root_dir).changed(name, df, key_columns)
+
+
+def deduplicate_dataset(path: str, key_columns=KEY_COLUMNS) -> str:
+    """Keeps the last row of every key in a dataset directory or CSV file."""
+    if path.endswith(".csv"):
+        df = pd.read_csv(path)
+        key_columns = [col for col in key_columns if col in df.columns]
+        return write_dataset(path, df[~key_hashes(df, key_columns).duplicated(keep="last")], mode="overwrite")
+
+    root_dir, name = os.path.split(os.path.abspath(path))
+    ParquetDataStore(root_dir).deduplicate(name, key_columns)
+    return path
+
+
+# -----------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Parquet data store tools.")
+    subparsers = parser.add_subparsers(dest="action", required=True)
+
+    migrate_parser = subparsers.add_parser("migrate", help="Convert a CSV file into a partitioned dataset")
+    migrate_parser.add_argument("csv_path")
+    migrate_parser.add_argument("name")
+    migrate_parser.add_argument("--root_dir", default=None)
+
+    info_parser = subparsers.add_parser("info", help="Show the schema and size of a dataset")
+    info_parser.add_argument("name")
+    info_parser.add_argument("--root_dir", default=None)
+
+    args = parser.parse_args()
+    store = ParquetDataStore(args.root_dir)
+
+    if args.action == "migrate":
+        path = store.from_csv(args.name, args.csv_path)
+        logger.info(f"Dataset written to {path}")
+    elif args.action == "info":
+        files = [os.path.join(root, f) for root, _, names in os.walk(store.path(args.name)) for f in names if f.endswith(".parquet") and not f.startswith("_")]
+        logger.info(f"Schema: {json.dumps(store.schema(args.name), indent=4)}")
+        logger.info(f"{len(files)} files, {sum(os.path.getsize(f) for f in files)} bytes")
+
+
+if __name__ == "__main__":
+    main()
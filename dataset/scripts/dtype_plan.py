@@ -0,0 +1,134 @@
+# usage -
+# python dataset/scripts/dtype_plan.py dataset/data/data_preprocess
+
+import os
+import sys
+import logging
+import argparse
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from dataset.scripts.data_store import read_dataset
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    handlers=[logging.StreamHandler()],
+)
+logger = logging.getLogger(__name__)
+
+# Scaled features and the label; float32 keeps ~7 significant digits, more than the inputs have
+FLOAT_DTYPE = "float32"
+
+# Repeated on every row: categories when they are labels, the smallest int when they are codes
+CATEGORY_COLUMNS = ("zone", "subba-name")
+
+TIME_COLUMNS = ("datetime", "datetime_1")
+
+# Other text columns become categories when at most this share of their values is distinct
+MAX_CATEGORY_RATIO = 0.5
+
+INT_DTYPES = ("int8", "int16", "int32", "int64")
+
+
+def _smallest_int(data: pd.Series) -> str:
+    """The smallest signed integer dtype holding all values of an integer column."""
+    if data.empty:
+        return str(data.dtype)
+    low, high = data.min(), data.max()
+    for dtype in INT_DTYPES:
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return dtype
+    return str(data.dtype)
+
+
+def dtype_plan(df: pd.DataFrame, chunked: bool = False) -> dict:
+    """
+    Returns {column: dtype} with the compact dtype of every column of df that has one:
+    datetime64 for the time columns, float32 for the floats, the smallest int for the integers
+    (label codes included) and category for the zone/subba-name labels and other repeated text.
+    Columns already compact, or without a compact dtype, are left out.
+
+    With chunked, only the dtypes that do not depend on the values (datetime64 and float32) are
+    planned, so the chunks of a dataset written one by one all get the same dtypes.
+    """
+    plan = {}
+    for col in df.columns:
+        data = df[col]
+        kind = data.dtype.kind
+        if col in TIME_COLUMNS:
+            dtype = "datetime64[ns]" if kind != "M" else None
+        elif kind == "f":
+            dtype = FLOAT_DTYPE
+        elif chunked:
+            dtype = None
+        elif kind in "iu":
+            dtype = _smallest_int(data)
+        elif kind == "O" and (col in CATEGORY_COLUMNS or data.nunique() <= MAX_CATEGORY_RATIO * len(data)):
+            dtype = "category"
+        else:
+            dtype = None
+        if dtype is not None and dtype != str(data.dtype):
+            plan[col] = dtype
+    return plan
+
+
+def apply_dtype_plan(df: pd.DataFrame, plan: Optional[dict] = None) -> pd.DataFrame:
+    """Casts df to plan (dtype_plan(df) by default). Columns of the plan that df lacks are skipped."""
+    plan = dtype_plan(df) if plan is None else plan
+    df = df.copy(deep=False)
+    for col, dtype in plan.items():
+        if col not in df.columns:
+            continue
+        if dtype.startswith("datetime64"):
+            df[col] = pd.to_datetime(df[col], format="ISO8601")
+        else:
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+def memory_report(df: pd.DataFrame, plan: Optional[dict] = None) -> pd.DataFrame:
+    """
+    Returns the dtype and memory (bytes, strings included) of every column of df before and after
+    the plan, with a 'total' row.
+    """
+    compact = apply_dtype_plan(df, plan)
+    report = pd.DataFrame({
+        "dtype": df.dtypes.astype(str),
+        "bytes": df.memory_usage(index=False, deep=True),
+        "compact_dtype": compact.dtypes.astype(str),
+        "compact_bytes": compact.memory_usage(index=False, deep=True),
+    })
+    report.loc["total"] = ["", report["bytes"].sum(), "", report["compact_bytes"].sum()]
+    report["reduction"] = 1 - report["compact_bytes"] / report["bytes"]
+    return report
+
+
+def log_memory_report(df: pd.DataFrame, plan: Optional[dict] = None) -> pd.DataFrame:
+    report = memory_report(df, plan)
+    total = report.loc["total"]
+    logger.info(
+        f"Memory: {total['bytes'] / 2**20:.1f} MiB -> {total['compact_bytes'] / 2**20:.1f} MiB "
+        f"({total['reduction']:.0%} less) for {len(df)} rows."
+    )
+    return report
+
+
+# -----------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Memory report of the compact dtype plan of a dataset.")
+    parser.add_argument("path", help="CSV file or dataset")
+    args = parser.parse_args()
+
+    report = log_memory_report(read_dataset(args.path))
+    with pd.option_context("display.max_rows", None, "display.width", 120):
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
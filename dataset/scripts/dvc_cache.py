@@ -0,0 +1,146 @@
+import os
+import json
+import fcntl
+import shutil
+import hashlib
+import logging
+from contextlib import contextmanager
+from typing import Optional
+
+import yaml
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    handlers=[logging.StreamHandler()],
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_DVC_CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../data/dvc_cache"))
+
+# Serializes the dvc commands of concurrent tasks, dvc holds a lock on the whole repo while it runs
+DVC_LOCK = "_dvc"
+
+
+def dvc_outs(dvc_file: str) -> list:
+    """The outputs of a .dvc file: [{"md5": ..., "path": ...}], paths relative to the .dvc file."""
+    with open(dvc_file, "r") as f:
+        content = yaml.safe_load(f) or {}
+    return [{"md5": out["md5"], "path": out["path"]} for out in content.get("outs", []) if out.get("md5")]
+
+
+def tree_signature(path: str) -> list:
+    """Size and mtime of a file, or of every file under a directory. Only metadata is read."""
+    if os.path.isfile(path):
+        stat = os.stat(path)
+        return [["", stat.st_size, stat.st_mtime_ns]]
+    signature = []
+    for root, _, files in os.walk(path):
+        for file in files:
+            stat = os.stat(os.path.join(root, file))
+            signature.append([os.path.relpath(os.path.join(root, file), path), stat.st_size, stat.st_mtime_ns])
+    return sorted(signature)
+
+
+def copy_path(source: str, destination: str) -> None:
+    """Copies a file or directory to destination through a temporary sibling, replacing it at once."""
+    temp_path = destination + ".tmp"
+    if os.path.isdir(temp_path):
+        shutil.rmtree(temp_path)
+    if os.path.isdir(source):
+        shutil.copytree(source, temp_path)
+        if os.path.isdir(destination):
+            shutil.rmtree(destination)
+    else:
+        shutil.copy2(source, temp_path)
+    os.replace(temp_path, destination)
+
+
+class DVCObjectCache:
+    """
+    Local copies of DVC outputs keyed by the md5 of their .dvc file, shared by the tasks of all DAG
+    runs on the machine: <cache_dir>/<md5[:2]>/<md5[2:]>.
+
+    A version that is in the cache is never pulled again, it is copied to the data directory. Each
+    md5 has its own file lock, so concurrent tasks asking for the same object wait for the one that
+    pulls it instead of pulling it too. The copy restored to the data directory is stamped, and is
+    only restored again once a task modified or removed it.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.cache_dir = os.path.abspath(cache_dir or os.getenv("DVC_OBJECT_CACHE_DIR", DEFAULT_DVC_CACHE_DIR))
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def object_path(self, md5: str) -> str:
+        return os.path.join(self.cache_dir, md5[:2], md5[2:])
+
+    def __stamp_path(self, path: str) -> str:
+        name = hashlib.md5(os.path.abspath(path).encode()).hexdigest()
+        return os.path.join(self.cache_dir, "stamps", f"{name}.json")
+
+    @contextmanager
+    def lock(self, name: str):
+        """Exclusive file lock on name (an md5 or DVC_LOCK), across threads and processes."""
+        with open(os.path.join(self.cache_dir, f"{name}.lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # ---------------------------------
+    def has(self, md5: str) -> bool:
+        return os.path.exists(self.object_path(md5))
+
+    def store(self, md5: str, path: str) -> None:
+        """Caches the freshly pulled output at path, which is then the restored copy of md5."""
+        object_path = self.object_path(md5)
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        copy_path(path, object_path)
+        self.__stamp(md5, path)
+
+    def restore(self, md5: str, path: str) -> bool:
+        """Copies the cached object to path unless path is still the copy restored from it. Returns whether it copied."""
+        stamp_path = self.__stamp_path(path)
+        if os.path.exists(path):
+            try:
+                with open(stamp_path, "r") as f:
+                    stamp = json.load(f)
+                if stamp["md5"] == md5 and stamp["signature"] == tree_signature(path):
+                    return False
+            except (OSError, json.JSONDecodeError, KeyError):
+                pass
+        copy_path(self.object_path(md5), path)
+        self.__stamp(md5, path)
+        return True
+
+    def __stamp(self, md5: str, path: str) -> None:
+        stamp_path = self.__stamp_path(path)
+        os.makedirs(os.path.dirname(stamp_path), exist_ok=True)
+        temp_path = stamp_path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump({"path": os.path.abspath(path), "md5": md5, "signature": tree_signature(path)}, f)
+        os.replace(temp_path, stamp_path)
+
+    def prune(self, keep: set) -> list:
+        """Removes the cached objects whose md5 is not in keep (the ones the .dvc files point to), returns them."""
+        removed = []
+        for prefix in os.listdir(self.cache_dir):
+            prefix_dir = os.path.join(self.cache_dir, prefix)
+            if len(prefix) != 2 or not os.path.isdir(prefix_dir):
+                continue
+            for rest in os.listdir(prefix_dir):
+                md5 = prefix + rest
+                if md5 in keep or rest.endswith(".tmp"):
+                    continue
+                with self.lock(md5):
+                    object_path = self.object_path(md5)
+                    if os.path.isdir(object_path):
+                        shutil.rmtree(object_path)
+                    elif os.path.exists(object_path):
+                        os.remove(object_path)
+                removed.append(md5)
+        if removed:
+            logger.info(f"Removed {len(removed)} cached DVC objects.")
+        return removed
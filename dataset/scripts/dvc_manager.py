@@ -2,9 +2,15 @@ import logging
 import subprocess
 import pandas as pd
 import os
+import sys
+import shutil
 import tempfile
 import argparse
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from dataset.scripts.data_store import ParquetDataStore, is_dataset, read_dataset
+from dataset.scripts.dvc_cache import DVCObjectCache, DVC_LOCK, dvc_outs
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -27,6 +33,9 @@ class DVCManager:
         self.all_data_filename = "data_raw.csv"
         self.processed_data_filename = "data_preprocessed.csv"
 
+        # Versions already pulled, shared by the tasks of all runs (see dvc_cache.py)
+        self.object_cache = DVCObjectCache()
+
     def configure_dvc_credentials(self, json_credential_path):
         """
         Function to run the 'dvc remote modify --local' command from Python to set the credential path.
@@ -67,28 +76,48 @@ class DVCManager:
             logger.info(f"Saving DataFrame to CSV file at {temp_file_path}.")
             df.to_csv(temp_file_path, index=False)
 
-            # # Change to the dataset/data directory
-            # os.chdir(self.data_dir)
+        except Exception as e:
+            logger.error(f"An error occurred: {e}")
+            return
+
+        self.push_file_to_dvc(temp_file_path)
+
+    def push_file_to_dvc(self, file_path):
+        """
+        Add an existing CSV file or dataset directory to DVC and push it to the remote, without reading or rewriting it.
+        """
+        try:
+            # dvc commands of concurrent tasks (e.g. both datasets pushed at once) run one at a time
+            with self.object_cache.lock(DVC_LOCK):
+                # Add the file to DVC
+                logger.info(f"Adding {os.path.basename(file_path)} to DVC.")
+                subprocess.run(["dvc", "add", file_path], check=True)
 
-            # Add the file to DVC
-            logger.info(f"Adding {file_name} to DVC.")
-            subprocess.run(["dvc", "add", temp_file_path], check=True)
+                # Push the data to the DVC remote without committing to Git
+                logger.info("Pushing dataset to DVC remote (without Git commit).")
+                result = subprocess.run(["dvc", "push"], check=False)
 
-            # Push the data to the DVC remote without committing to Git
-            logger.info("Pushing dataset to DVC remote (without Git commit).")
-            result = subprocess.run(["dvc", "push"], check=False)
+                if result.returncode != 0:
+                    # Log specific error for invalid credentials or failed push
+                    logger.error(
+                        "DVC push failed. Please check your credentials and remote settings."
+                    )
+                    return
+                outs = dvc_outs(file_path + ".dvc")
 
-            if result.returncode != 0:
-                # Log specific error for invalid credentials or failed push
-                logger.error(
-                    "DVC push failed. Please check your credentials and remote settings."
-                )
-                return
+            # The pushed version is kept in the local cache, so the next download does not pull it.
+            # Locks are taken in the order of pull_target (md5, then dvc) so the two never deadlock.
+            for out in outs:
+                with self.object_cache.lock(out["md5"]), self.object_cache.lock(DVC_LOCK):
+                    self.object_cache.store(out["md5"], os.path.join(os.path.dirname(file_path), out["path"]))
 
-            # If push succeeds, delete the CSV file
-            if os.path.exists(temp_file_path):
-                logger.info(f"Deleting CSV file: {temp_file_path}")
-                os.remove(temp_file_path)
+            # If push succeeds, delete the CSV file or dataset directory
+            if os.path.isdir(file_path):
+                logger.info(f"Deleting dataset directory: {file_path}")
+                shutil.rmtree(file_path)
+            elif os.path.exists(file_path):
+                logger.info(f"Deleting CSV file: {file_path}")
+                os.remove(file_path)
 
             logger.info("Dataset uploaded to DVC and CSV file deleted successfully.")
 
@@ -97,30 +126,62 @@ class DVCManager:
         except Exception as e:
             logger.error(f"An error occurred: {e}")
 
-    def download_data_from_dvc(self, filename, save_local=0):
+    def pull_target(self, target):
+        """
+        Brings the version of target (a file or directory of the data directory) recorded in its .dvc
+        file to the data directory. Only target is pulled, and only when its md5 is not in the local
+        object cache yet; otherwise the cached copy is restored without calling dvc.
+        Returns whether target is tracked by DVC.
+        """
+        dvc_file = os.path.join(self.data_dir, target + ".dvc")
+        if not os.path.exists(dvc_file):
+            logger.info(f"{target} is not tracked by DVC, using the local copy.")
+            return False
+
+        for out in dvc_outs(dvc_file):
+            md5, path = out["md5"], os.path.join(os.path.dirname(dvc_file), out["path"])
+            # Tasks asking for the same version wait here for the one that pulls it
+            with self.object_cache.lock(md5):
+                if self.object_cache.has(md5):
+                    logger.info(f"{out['path']} ({md5}) is in the local DVC cache, skipping the pull.")
+                else:
+                    logger.info(f"Pulling {out['path']} ({md5}) from DVC.")
+                    with self.object_cache.lock(DVC_LOCK):
+                        subprocess.run(["dvc", "pull", "--force", dvc_file], check=True)
+                        self.object_cache.store(md5, path)
+                if self.object_cache.restore(md5, path):
+                    logger.info(f"Restored {out['path']} from the local DVC cache.")
+        return True
+
+    def download_data_from_dvc(self, filename, save_local=0, load=True):
         """
-        Pull the latest version of the dataset from DVC and return it as a DataFrame.
+        Pull the version of the dataset recorded in DVC and return it as a DataFrame.
+
+        filename is either a CSV file or the name of a Parquet dataset directory (no extension).
+        A dataset that is not in DVC yet is converted from '<name>.csv' on first use.
+        With load=False only the local path is returned, the data is not read.
         """
         try:
-            # Pull the latest dataset from DVC
-            logger.info("Pulling latest dataset from DVC.")
-            subprocess.run(["dvc", "pull", "--force"], check=True)
+            if not filename.endswith(".csv"):
+                # The dataset itself once it is tracked, the CSV file it is converted from until then
+                if not self.pull_target(filename):
+                    self.pull_target(filename + ".csv")
+                return self.__load_dataset(filename, save_local, load)
 
             # Load the dataset into a DataFrame
-            logger.info(f"Loading dataset from {self.data_dir}.")
-            csv_files = [f for f in os.listdir(self.data_dir) if f.endswith(".csv")]
-            if filename not in csv_files:
-                logger.error("No CSV files found in the data directory.")
+            self.pull_target(filename)
+            latest_file = os.path.join(self.data_dir, filename)
+            if not os.path.exists(latest_file):
+                logger.error(f"No CSV file named {filename} found in the data directory.")
                 return None
 
-            latest_file = os.path.join(self.data_dir, filename)
-            df = pd.read_csv(latest_file)
+            logger.info(f"Loading dataset from {latest_file}.")
+            df = pd.read_csv(latest_file) if load else None
 
             if save_local == 0:
+                # Still in the local DVC cache, the next download only copies it back
                 logger.info(f"Deleting CSV file in local: {latest_file}")
-                for file in csv_files:
-                    path = os.path.join(self.data_dir, file)
-                    os.remove(path)
+                os.remove(latest_file)
 
             logger.info("Dataset downloaded and loaded into DataFrame successfully.")
             return df, latest_file
@@ -132,6 +193,26 @@ class DVCManager:
             logger.error(f"An error occurred: {e}")
             return None
         
+    def __load_dataset(self, name, save_local, load):
+        store = ParquetDataStore(self.data_dir)
+        dataset_path = store.path(name)
+        csv_path = dataset_path + ".csv"
+
+        if not is_dataset(dataset_path):
+            if not os.path.exists(csv_path):
+                logger.error(f"No dataset or CSV file named {name} found in the data directory.")
+                return None
+            store.from_csv(name, csv_path)
+
+        df = read_dataset(dataset_path) if load else None
+
+        if save_local == 0:
+            logger.info(f"Deleting dataset in local: {dataset_path}")
+            store.delete(name)
+
+        logger.info(f"Dataset {name} is available at {dataset_path}.")
+        return df, dataset_path
+
     def delete_local_data(self):
         csv_files = [f for f in os.listdir(self.data_dir) if f.endswith(".csv")]
         logger.info("Deleting CSV file in local")
@@ -139,9 +220,23 @@ class DVCManager:
             path = os.path.join(self.data_dir, file)
             os.remove(path)
 
+        store = ParquetDataStore(self.data_dir)
+        for name in store.list():
+            logger.info(f"Deleting dataset in local: {name}")
+            store.delete(name)
+
+    def prune_cache(self):
+        """Removes the cached versions no .dvc file of the data directory points to anymore."""
+        keep = {
+            out["md5"]
+            for file in os.listdir(self.data_dir) if file.endswith(".dvc")
+            for out in dvc_outs(os.path.join(self.data_dir, file))
+        }
+        return self.object_cache.prune(keep)
+
 def main():
     parser = argparse.ArgumentParser(description="DVC Manager CLI Tool")
-    parser.add_argument("action", choices=["configure", "upload", "download", "delete"], help="Action to perform")
+    parser.add_argument("action", choices=["configure", "upload", "download", "delete", "prune"], help="Action to perform")
     parser.add_argument("--json_credential_path", default="mlops-437516-b9a69694c897.json", help="Path to DVC JSON credentials")
     parser.add_argument("--file_name", help="File name for upload or download action")
     parser.add_argument("--save_local", type=int, default=0, help="Keep downloaded file locally (1 to save, 0 to delete)")
@@ -168,6 +263,8 @@ def main():
     elif args.action == "delete":
         dvc_manager.delete_local_data()
         logger.info("Local data files deleted successfully.")
+    elif args.action == "prune":
+        dvc_manager.prune_cache()
 
 
 if __name__ == "__main__":
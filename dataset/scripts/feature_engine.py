@@ -0,0 +1,175 @@
+import logging
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    handlers=[logging.StreamHandler()],
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_FEATURE_COLUMNS = ("tempF", "windspeedMiles", "humidity")
+DEFAULT_WINDOWS = (6,)
+DEFAULT_LAGS = (2, 4, 6)
+
+# A series is one subba-name in one zone, ordered by datetime
+DEFAULT_GROUP_COLUMNS = ("subba-name", "zone")
+
+
+class FeatureEngine:
+    """
+    Rolling mean/std and lag features, computed per series in one vectorized pass.
+
+    Rows are ordered by the group columns and the time column, the feature columns are stacked into
+    one array and every window and lag is computed for all columns at once. Values that would reach
+    into the previous series are masked, so windows never leak across subba/zone boundaries.
+
+    Each rolling value only depends on the rows in its window (no running sums), so a frame can be
+    processed in chunks: pass the tail() of the previous chunk as `context` and the features are the
+    same as for the whole frame.
+
+    Features of the first window keep the names used by the model ('tempF_rolling_mean'); further
+    windows get their size as suffix ('tempF_rolling_mean_24'). Lags are named 'tempF_lag_2'.
+    """
+
+    def __init__(
+        self,
+        columns: tuple = DEFAULT_FEATURE_COLUMNS,
+        windows: tuple = DEFAULT_WINDOWS,
+        lags: tuple = DEFAULT_LAGS,
+        group_columns: tuple = DEFAULT_GROUP_COLUMNS,
+        time_column: str = "datetime",
+    ):
+        if not windows and not lags:
+            raise ValueError("At least one window or lag is required.")
+        if any(window < 1 for window in windows) or any(lag < 1 for lag in lags):
+            raise ValueError("Windows and lags must be positive.")
+        self.columns = tuple(columns)
+        self.windows = tuple(windows)
+        self.lags = tuple(lags)
+        self.group_columns = tuple(group_columns)
+        self.time_column = time_column
+
+    @property
+    def history_size(self) -> int:
+        """Rows of a series' past that the features of its next row depend on."""
+        return max([window - 1 for window in self.windows] + list(self.lags))
+
+    def rolling_names(self, column: str, window: int) -> tuple[str, str]:
+        suffix = "" if window == self.windows[0] else f"_{window}"
+        return f"{column}_rolling_mean{suffix}", f"{column}_rolling_std{suffix}"
+
+    def feature_names(self) -> list:
+        names = []
+        for column in self.columns:
+            for window in self.windows:
+                names.extend(self.rolling_names(column, window))
+        for lag in self.lags:
+            names.extend(f"{column}_lag_{lag}" for column in self.columns)
+        return names
+
+    # ---------------------------------
+    def __sort_keys(self, df: pd.DataFrame) -> list:
+        keys = [col for col in self.group_columns if col in df.columns]
+        if self.time_column in df.columns:
+            keys.append(self.time_column)
+        return keys
+
+    def __order(self, frame: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the row order by series and time (stable) and the position of every ordered row
+        within its series.
+        """
+        group_columns = [col for col in self.group_columns if col in frame.columns]
+        groups = (
+            frame.groupby(group_columns, sort=False).ngroup().to_numpy()
+            if group_columns else np.zeros(len(frame), dtype="int64")
+        )
+        if self.time_column in frame.columns:
+            times = pd.factorize(frame[self.time_column], sort=True)[0]
+            order = np.lexsort((times, groups))
+        else:
+            order = np.argsort(groups, kind="stable")
+
+        # Position = index - index of the first row of the series
+        ordered_groups = groups[order]
+        index = np.arange(len(order))
+        starts = np.r_[True, ordered_groups[1:] != ordered_groups[:-1]] if len(order) else np.array([], dtype=bool)
+        positions = index - np.maximum.accumulate(np.where(starts, index, 0))
+        return order, positions
+
+    @staticmethod
+    def __rolling(values: np.ndarray, window: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Mean and sample std of every full window of values (rows), summed slice by slice in a fixed
+        order (two-pass variance), so a result only depends on the values in its window.
+        """
+        count = len(values) - window + 1
+        total = values[:count].copy()
+        for k in range(1, window):
+            total += values[k:k + count]
+        means = total / window
+        if window == 1:
+            return means, np.full(means.shape, np.nan)
+
+        squares = np.square(values[:count] - means)
+        for k in range(1, window):
+            squares += np.square(values[k:k + count] - means)
+        return means, np.sqrt(squares / (window - 1))
+
+    def transform(self, df: pd.DataFrame, context: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        Returns df with the rolling and lag features added, in the row order of df.
+        context holds earlier rows of the same series (see tail()); they are used for the windows
+        and lags of the first rows of df, but are not returned.
+        """
+        has_context = context is not None and not context.empty
+        frame = pd.concat([context, df], ignore_index=True) if has_context else df
+
+        # The stable sort keeps context rows before df rows on ties
+        order, positions = self.__order(frame)
+        values = frame[list(self.columns)].to_numpy(dtype="float64")[order]
+
+        names = self.feature_names()
+        features = np.full((len(values), len(names)), np.nan)
+        n = len(self.columns)
+        offset = 0
+        for window in self.windows:
+            if len(values) >= window:
+                means, stds = self.__rolling(values, window)
+                features[window - 1:, offset:offset + 2 * n:2] = means
+                features[window - 1:, offset + 1:offset + 2 * n:2] = stds
+            # Windows that start in the previous series
+            features[positions < window - 1, offset:offset + 2 * n] = np.nan
+            offset += 2 * n
+
+        for lag in self.lags:
+            block = features[:, offset:offset + n]
+            block[lag:] = values[:-lag]
+            block[positions < lag] = np.nan
+            offset += n
+
+        # feature_names() lists the rolling features column by column
+        rolling = [self.rolling_names(column, window) for window in self.windows for column in self.columns]
+        rolling_names = [name for pair in rolling for name in pair]
+        columns = rolling_names + [f"{column}_lag_{lag}" for lag in self.lags for column in self.columns]
+
+        # Back to the order of frame, then drop the context rows
+        restored = np.empty_like(features)
+        restored[order] = features
+        start = len(context) if has_context else 0
+        df_features = pd.DataFrame(restored[start:], columns=columns, index=df.index)[names]
+        return pd.concat([df.drop(columns=names, errors="ignore"), df_features], axis=1)
+
+    def tail(self, df: pd.DataFrame) -> pd.DataFrame:
+        """The last history_size rows of every series in df, to pass as context for the next chunk."""
+        keys = self.__sort_keys(df)
+        ordered = df.sort_values(keys, kind="stable") if keys else df
+        group_columns = [col for col in self.group_columns if col in df.columns]
+        if not group_columns:
+            return ordered.tail(self.history_size)
+        return ordered.groupby(group_columns, sort=False).tail(self.history_size)
@@ -0,0 +1,261 @@
+# usage -
+# python dataset/scripts/feature_store.py materialize dataset/data/data_raw
+# python dataset/scripts/feature_store.py info
+
+import os
+import sys
+import sqlite3
+import logging
+import argparse
+import contextlib
+from typing import Optional
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from dataset.scripts.streaming_preprocess import StreamingPreprocessor, DEFAULT_CHUNK_ROWS
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    handlers=[logging.StreamHandler()],
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_FEATURE_STORE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "../data/feature_store.sqlite"))
+
+TABLE = "features"
+
+# One row per series and hour
+KEY_COLUMNS = ["zone", "subba-name", "datetime"]
+
+# 0 while a row has too little history for its rolling/lag features; such rows only serve as context
+COMPLETE_COLUMN = "features_complete"
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+class FeatureStore:
+    """
+    Engineered features (the output of DataPreprocessor.features_df, before normalization) keyed by
+    zone, subba-name and hour, in a local SQLite file with an index on (zone, datetime).
+
+    refresh() computes the features of new raw rows only: the last history_size stored rows of each
+    series they belong to are read back as window context, so a series is never recomputed from its
+    start. Rows that arrive late (before the latest stored hour of their series) are featurized again
+    together with the stored rows after them, whose windows they change. Rows are upserted on the key,
+    so a refresh can be repeated.
+
+    Rows are stored with the raw columns they were computed from. The first rows of a series, without
+    enough history for their windows, are kept as context but never returned by load() or lookup().
+    The datetime of a row is the hour its features describe; they only depend on that hour and the
+    ones before it, so a read up to a given time is point-in-time correct.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, preprocessor=None):
+        self.db_path = os.path.abspath(db_path or os.getenv("FEATURE_STORE_PATH", DEFAULT_FEATURE_STORE_PATH))
+        self._preprocessor = preprocessor
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+
+    @staticmethod
+    def is_store(path) -> bool:
+        return os.path.isfile(path) and os.path.splitext(path)[1] in (".sqlite", ".db")
+
+    @property
+    def preprocessor(self):
+        if self._preprocessor is None:
+            # Imported here, data_preprocess loads the fitted transformer artifact
+            from dataset.scripts.data_preprocess import DataPreprocessor
+            self._preprocessor = DataPreprocessor()
+        return self._preprocessor
+
+    @contextlib.contextmanager
+    def __connect(self):
+        """A connection in one transaction, committed on success. WAL lets readers run during a refresh."""
+        connection = sqlite3.connect(self.db_path, timeout=60)
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    @staticmethod
+    def __columns(connection) -> list:
+        return [row[1] for row in connection.execute(f"PRAGMA table_info({TABLE})")]
+
+    def __ensure_columns(self, connection, df: pd.DataFrame) -> list:
+        """Creates the table or adds the columns of df it lacks. Returns the table columns."""
+        columns = self.__columns(connection)
+        missing = [col for col in df.columns if col not in columns]
+        if not missing:
+            return columns
+
+        def declared(col):
+            kind = df[col].dtype.kind
+            return "REAL" if kind == "f" else "INTEGER" if kind in "iub" else "TEXT"
+
+        if not columns:
+            definitions = ", ".join(f"{_quote(col)} {declared(col)}" for col in df.columns)
+            keys = ", ".join(_quote(col) for col in KEY_COLUMNS)
+            connection.execute(f"CREATE TABLE {TABLE} ({definitions}, PRIMARY KEY ({keys}))")
+            connection.execute(f'CREATE INDEX {TABLE}_zone_datetime ON {TABLE} (zone, datetime)')
+        else:
+            for col in missing:
+                connection.execute(f"ALTER TABLE {TABLE} ADD COLUMN {_quote(col)} {declared(col)}")
+        return self.__columns(connection)
+
+    @staticmethod
+    def __read(connection, where: str = "", params: tuple = (), suffix: str = "") -> pd.DataFrame:
+        df = pd.read_sql_query(f"SELECT * FROM {TABLE} {where} {suffix}", connection, params=params)
+        df["datetime"] = pd.to_datetime(df["datetime"], format=TIME_FORMAT)
+        return df
+
+    # ---------------------------------
+    def refresh(self, df_raw: pd.DataFrame) -> int:
+        """Computes and upserts the features of the raw rows in df_raw. Returns the number of rows written."""
+        preprocessor = self.preprocessor
+        df = preprocessor.clean_data_df(preprocessor.coerce_types_df(df_raw))
+        if df.empty:
+            return 0
+        df["zone"] = df["zone"].astype(str)
+        df["subba-name"] = df["subba-name"].astype(str)
+        df = df.drop_duplicates(KEY_COLUMNS, keep="last")
+
+        with self.__connect() as connection:
+            stored = self.__columns(connection)
+            later, context = self.__history(connection, df) if stored else (None, None)
+            # A new row replaces the stored row with its key
+            frame = pd.concat([later, df], ignore_index=True).drop_duplicates(KEY_COLUMNS, keep="last")
+            frame = frame.drop(columns=[COMPLETE_COLUMN], errors="ignore")
+
+            engine = preprocessor.feature_engine
+            df_features = engine.transform(frame, context=context)
+            complete = df_features[engine.feature_names()].notna().all(axis=1).astype("int64")
+            df_features = preprocessor.add_cyclic_features_df(df_features).drop(columns=["datetime_1"])
+            df_features[COMPLETE_COLUMN] = complete
+            df_features["datetime"] = df_features["datetime"].dt.strftime(TIME_FORMAT)
+
+            columns = self.__ensure_columns(connection, df_features)
+            df_features = df_features.reindex(columns=columns)
+            placeholders = ", ".join("?" * len(columns))
+            names = ", ".join(_quote(col) for col in columns)
+            # astype(object) gives Python scalars; NaN is stored as NULL
+            rows = df_features.astype(object).itertuples(index=False, name=None)
+            connection.executemany(f"INSERT OR REPLACE INTO {TABLE} ({names}) VALUES ({placeholders})", rows)
+
+        logger.info(f"Feature store refreshed: {len(df)} new rows, {len(df_features)} rows written.")
+        return len(df_features)
+
+    def __history(self, connection, df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Returns the stored rows at or after the first new hour of each series in df, which are
+        recomputed with the new rows, and the history_size stored rows before it, the window context.
+        """
+        history_size = self.preprocessor.feature_engine.history_size
+        later, context = [], []
+        for (zone, subba), start in df.groupby(["zone", "subba-name"])["datetime"].min().items():
+            params = (zone, subba, start.strftime(TIME_FORMAT))
+            where = 'WHERE zone = ? AND "subba-name" = ? AND datetime'
+            later.append(self.__read(connection, f"{where} >= ?", params))
+            context.append(self.__read(connection, f"{where} < ?", params + (history_size,), "ORDER BY datetime DESC LIMIT ?"))
+        later = pd.concat(later, ignore_index=True)
+        context = pd.concat(context, ignore_index=True).drop(columns=[COMPLETE_COLUMN])
+        return later, context
+
+    def materialize(self, raw_path: str, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> int:
+        """Refreshes the store with a raw CSV file or dataset, chunk by chunk. Returns the number of rows written."""
+        chunks = StreamingPreprocessor(self.preprocessor, chunk_rows).iter_chunks(raw_path)
+        return sum(self.refresh(chunk) for chunk in chunks)
+
+    # ---------------------------------
+    def load(
+        self, start: Optional[str] = None, end: Optional[str] = None, zones: Optional[list] = None
+    ) -> pd.DataFrame:
+        """
+        Returns the rows with all their features between start and end (inclusive), e.g. the
+        features known at end for training, ordered by zone, subba-name and datetime.
+        """
+        if not os.path.exists(self.db_path):
+            raise FileNotFoundError(f"No feature store at {self.db_path}, materialize it first.")
+
+        conditions, params = [f"{COMPLETE_COLUMN} = 1"], []
+        if start is not None:
+            conditions.append("datetime >= ?")
+            params.append(pd.Timestamp(start).strftime(TIME_FORMAT))
+        if end is not None:
+            conditions.append("datetime <= ?")
+            params.append(pd.Timestamp(end).strftime(TIME_FORMAT))
+        if zones:
+            conditions.append(f"zone IN ({', '.join('?' * len(zones))})")
+            params.extend(str(zone) for zone in zones)
+
+        with self.__connect() as connection:
+            df = self.__read(connection, "WHERE " + " AND ".join(conditions), tuple(params), 'ORDER BY zone, "subba-name", datetime')
+        return df.drop(columns=[COMPLETE_COLUMN])
+
+    def lookup(self, zone, as_of=None, subba_name: Optional[str] = None) -> pd.DataFrame:
+        """
+        Returns the latest row of each series of zone (or only of subba_name) at or before as_of
+        (latest overall by default), for online inference. Empty when none is stored.
+        """
+        conditions, params = [f"{COMPLETE_COLUMN} = 1", "zone = ?"], [str(zone)]
+        if subba_name is not None:
+            conditions.append('"subba-name" = ?')
+            params.append(str(subba_name))
+        if as_of is not None:
+            conditions.append("datetime <= ?")
+            params.append(pd.Timestamp(as_of).strftime(TIME_FORMAT))
+        where = " AND ".join(conditions)
+
+        # The (zone, datetime) index serves both the per-series max and the row lookup
+        latest = f'SELECT "subba-name", MAX(datetime) FROM {TABLE} WHERE {where} GROUP BY "subba-name"'
+        with self.__connect() as connection:
+            if not self.__columns(connection):
+                return pd.DataFrame()
+            df = self.__read(
+                connection, f'WHERE {where} AND ("subba-name", datetime) IN ({latest})', tuple(params) * 2,
+                'ORDER BY "subba-name"',
+            )
+        return df.drop(columns=[COMPLETE_COLUMN])
+
+    def info(self) -> dict:
+        with self.__connect() as connection:
+            if not self.__columns(connection):
+                return {"rows": 0}
+            rows, complete, first, last = connection.execute(
+                f"SELECT COUNT(*), SUM({COMPLETE_COLUMN}), MIN(datetime), MAX(datetime) FROM {TABLE}"
+            ).fetchone()
+            series = connection.execute(f'SELECT COUNT(*) FROM (SELECT DISTINCT zone, "subba-name" FROM {TABLE})').fetchone()[0]
+        return {"rows": rows, "complete_rows": complete, "series": series, "first": first, "last": last}
+
+
+# -----------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Offline feature store tools.")
+    parser.add_argument("--db_path", default=None)
+    subparsers = parser.add_subparsers(dest="action", required=True)
+
+    materialize_parser = subparsers.add_parser("materialize", help="Compute the features of a raw CSV file or dataset")
+    materialize_parser.add_argument("raw_path")
+    materialize_parser.add_argument("--chunk_rows", type=int, default=DEFAULT_CHUNK_ROWS)
+
+    subparsers.add_parser("info", help="Show the size and time span of the store")
+
+    args = parser.parse_args()
+    store = FeatureStore(args.db_path)
+
+    if args.action == "materialize":
+        rows = store.materialize(args.raw_path, args.chunk_rows)
+        logger.info(f"{rows} rows written to {store.db_path}")
+    elif args.action == "info":
+        logger.info(f"{store.db_path}: {store.info()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import os
+import json
+import logging
+import datetime
+import tempfile
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    handlers=[logging.StreamHandler()],
+)
+logger = logging.getLogger(__name__)
+
+# Bumped when the artifact layout changes; older artifacts are refused instead of misread
+TRANSFORMER_VERSION = 1
+
+DEFAULT_TRANSFORMER_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "../data/feature_transformer.json"))
+
+# Sidecar in a preprocessed dataset: the transformer of its current statistics, versioned (and pulled) with the data
+TRANSFORMER_FILE = "_transformer.json"
+DEFAULT_DATASET_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "../data/data_preprocess"))
+
+
+def current_transformer_path() -> str:
+    """
+    The transformer inference and training scale with: FEATURE_TRANSFORMER_PATH when set, else the one
+    kept with the preprocessed dataset (updated by the new data DAG), else the fitted default artifact.
+    """
+    path = os.getenv("FEATURE_TRANSFORMER_PATH")
+    if path:
+        return path
+    dataset_transformer = os.path.join(DEFAULT_DATASET_PATH, TRANSFORMER_FILE)
+    return dataset_transformer if os.path.exists(dataset_transformer) else DEFAULT_TRANSFORMER_PATH
+
+# Scaled separately ((x + 1) / 2) or identifiers, never min/max scaled
+CYCLIC_COLUMNS = ["month_sin", "month_cos"]
+EXCLUDED_COLUMNS = CYCLIC_COLUMNS + ["zone", "datetime", "subba-name"]
+
+
+class FeatureTransformer:
+    """
+    Min/max scaling of the numeric columns and label encoding of the text columns, with the state
+    fitted once and saved as a versioned JSON artifact.
+
+    fit() or repeated partial_fit() calls (one per chunk) collect the global min/max of every numeric
+    column and the label vocabulary of every text column. transform() applies them to any frame, so
+    every chunk of a dataset is scaled the same way and the preprocessing of training data and
+    ModelInference use one artifact. Labels are encoded as their index in the sorted vocabulary, the
+    codes LabelEncoder gives; labels outside the vocabulary become -1.
+    """
+
+    def __init__(self, minimums: Optional[dict] = None, maximums: Optional[dict] = None, classes: Optional[dict] = None):
+        self.minimums = dict(minimums or {})
+        self.maximums = dict(maximums or {})
+        self.classes = {col: sorted(labels) for col, labels in (classes or {}).items()}
+
+    @staticmethod
+    def columns(df: pd.DataFrame) -> tuple[list, list]:
+        """Returns the columns that are min/max scaled and the columns that are label encoded."""
+        columns_to_normalize = df.select_dtypes(include=[np.number]).columns.difference(EXCLUDED_COLUMNS)
+        columns_to_encode = [col for col in df.select_dtypes(include=["object"]).columns if col != "datetime"]
+        return list(columns_to_normalize), columns_to_encode
+
+    # ---------------------------------
+    def fit(self, df: pd.DataFrame) -> "FeatureTransformer":
+        """Fits the transformer on df alone, replacing any earlier state."""
+        self.minimums, self.maximums, self.classes = {}, {}, {}
+        return self.partial_fit(df)
+
+    def partial_fit(self, df: pd.DataFrame) -> "FeatureTransformer":
+        """Widens the min/max and vocabularies with df, e.g. one chunk of a streaming pass."""
+        columns_to_normalize, columns_to_encode = self.columns(df)
+        if len(df):
+            for col, value in df[columns_to_normalize].min().items():
+                self.minimums[col] = min(float(value), self.minimums.get(col, np.inf))
+            for col, value in df[columns_to_normalize].max().items():
+                self.maximums[col] = max(float(value), self.maximums.get(col, -np.inf))
+        for col in columns_to_encode:
+            self.classes[col] = sorted(set(self.classes.get(col, [])) | set(df[col].astype(str).unique()))
+        return self
+
+    def transform(self, df: pd.DataFrame, encode: bool = True) -> pd.DataFrame:
+        """
+        Scales the numeric columns the transformer was fitted on and shifts the cyclic columns to
+        [0, 1]. With encode, the fitted text columns are label encoded too. Other columns are kept.
+        """
+        df = df.copy()
+        columns_to_normalize, columns_to_encode = self.columns(df)
+        columns_to_normalize = [col for col in columns_to_normalize if col in self.minimums]
+        if columns_to_normalize:
+            minimums = np.array([self.minimums[col] for col in columns_to_normalize])
+            maximums = np.array([self.maximums[col] for col in columns_to_normalize])
+            values = df[columns_to_normalize].to_numpy(dtype="float64")
+            # A constant column is 0 / 0 = NaN, as with the per-frame scaling before
+            with np.errstate(divide="ignore", invalid="ignore"):
+                df[columns_to_normalize] = (values - minimums) / (maximums - minimums)
+        for col in CYCLIC_COLUMNS:
+            if col in df.columns:
+                df[col] = (df[col] + 1) / 2
+
+        if encode:
+            for col in columns_to_encode:
+                if col in self.classes:
+                    df[col] = self.__encode(np.array(self.classes[col], dtype=object), df[col].astype(str).to_numpy())
+        return df
+
+    def fit_transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        return self.fit(df).transform(df)
+
+    def inverse_transform(self, values, column: str = "value"):
+        """Maps scaled values of column (e.g. model predictions of 'value') back to the original units."""
+        minimum, maximum = self.minimums[column], self.maximums[column]
+        return values * (maximum - minimum) + minimum
+
+    @staticmethod
+    def __encode(classes: np.ndarray, labels: np.ndarray) -> np.ndarray:
+        codes = np.searchsorted(classes, labels)
+        known = codes < len(classes)
+        known[known] = classes[codes[known]] == labels[known]
+        if not known.all():
+            logger.warning(f"{(~known).sum()} labels outside the fitted vocabulary encoded as -1.")
+        return np.where(known, codes, -1)
+
+    # ---------------------------------
+    def to_dict(self) -> dict:
+        return {
+            "version": TRANSFORMER_VERSION,
+            "fitted_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "min": self.minimums,
+            "max": self.maximums,
+            "classes": self.classes,
+        }
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "FeatureTransformer":
+        if state.get("version") != TRANSFORMER_VERSION:
+            raise ValueError(
+                f"Unsupported feature transformer version {state.get('version')}, expected {TRANSFORMER_VERSION}."
+            )
+        return cls(state["min"], state["max"], state["classes"])
+
+    def save(self, path: str = DEFAULT_TRANSFORMER_PATH) -> str:
+        """Writes the artifact atomically, so a reader never loads a partial file. Returns the path."""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.to_dict(), f, indent=2, sort_keys=True)
+        os.replace(temp_path, path)
+        logger.info(f"Saved feature transformer to {path}.")
+        return path
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_TRANSFORMER_PATH) -> "FeatureTransformer":
+        with open(path, "r") as f:
+            return cls.from_dict(json.load(f))
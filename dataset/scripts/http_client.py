@@ -0,0 +1,146 @@
+import time
+import random
+import logging
+import threading
+from typing import Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    handlers=[logging.StreamHandler()],
+)
+logger = logging.getLogger(__name__)
+
+# Status codes worth retrying: rate limited or a transient server side failure
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class HTTPClient:
+    """
+    Shared transport for the external APIs (EIA, WorldWeatherOnline, OpenCage).
+
+    Wraps a requests.Session so connections are kept alive and pooled per host, retries
+    429/5xx responses and connection errors with jittered exponential backoff, and keeps
+    timing counters for each endpoint.
+    """
+
+    def __init__(
+        self,
+        max_connections_per_host: int = 10,
+        max_retries: int = 4,
+        backoff_factor: float = 0.5,
+        backoff_max: float = 30.0,
+        timeout: float = 30.0,
+    ):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+
+        # pool_block makes threads wait for a free connection instead of opening extra ones,
+        # which caps the number of open connections per host
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=10, pool_maxsize=max_connections_per_host, pool_block=True
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def endpoint_name(url: str) -> str:
+        """Returns host + path of the url, so api keys in the query string never reach the stats."""
+        parsed = urlparse(url)
+        return f"{parsed.netloc}{parsed.path}"
+
+    def __record(self, endpoint: str, elapsed: float, status: Optional[int], retried: bool) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(
+                endpoint,
+                {"calls": 0, "retries": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0, "status": {}},
+            )
+            stats["calls"] += 1
+            stats["retries"] += int(retried)
+            stats["total_seconds"] += elapsed
+            stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+            key = str(status) if status is not None else "connection_error"
+            stats["status"][key] = stats["status"].get(key, 0) + 1
+            if status is None or status >= 400:
+                stats["errors"] += 1
+
+    def __backoff_delay(self, attempt: int, response: Optional[requests.Response] = None) -> float:
+        """Full jitter exponential backoff, honouring a numeric Retry-After header when present."""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after is not None and retry_after.isdigit():
+                return min(float(retry_after), self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_factor * (2 ** attempt)))
+
+    def get(self, url: str, endpoint: Optional[str] = None, **kwargs) -> requests.Response:
+        """
+        Sends a GET request, retrying 429/5xx responses and connection errors.
+        Returns the last response once retries are exhausted; re-raises the last connection error.
+        """
+        endpoint = endpoint or self.endpoint_name(url)
+        kwargs.setdefault("timeout", self.timeout)
+
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                response = self.session.get(url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self.__record(endpoint, time.perf_counter() - start, None, attempt > 0)
+                if attempt == self.max_retries:
+                    logger.error(f"Request to {endpoint} failed after {attempt + 1} attempts: {e}")
+                    raise
+                delay = self.__backoff_delay(attempt)
+                logger.warning(f"Request to {endpoint} failed ({e}), retrying in {delay:.2f}s.")
+                time.sleep(delay)
+                continue
+
+            self.__record(endpoint, time.perf_counter() - start, response.status_code, attempt > 0)
+
+            if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                delay = self.__backoff_delay(attempt, response)
+                logger.warning(
+                    f"Request to {endpoint} returned {response.status_code}, retrying in {delay:.2f}s."
+                )
+                time.sleep(delay)
+                continue
+
+            return response
+
+    def get_stats(self) -> dict:
+        """Returns a snapshot of the per endpoint counters, with the mean latency added."""
+        with self._lock:
+            snapshot = {}
+            for endpoint, stats in self._stats.items():
+                snapshot[endpoint] = {**stats, "status": dict(stats["status"])}
+                snapshot[endpoint]["mean_seconds"] = stats["total_seconds"] / stats["calls"]
+            return snapshot
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats = {}
+
+
+# -----------------------------------------------------------------------
+# Process wide client, shared by DataCollector instances and the backend
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+
+def get_http_client() -> HTTPClient:
+    """Returns the process wide HTTPClient, creating it on first use."""
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = HTTPClient()
+        return _shared_client
@@ -0,0 +1,140 @@
+import os
+import json
+import logging
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    handlers=[logging.StreamHandler()],
+)
+logger = logging.getLogger(__name__)
+
+# One row per series and hour
+KEY_COLUMNS = ("zone", "subba-name", "datetime")
+
+# Next to _schema.json in the dataset directory; '_' files are skipped by readers
+INDEX_FILE = "_keys.parquet"
+
+# Joins the partition values of a row into its partition label; subba names may contain '/'
+LABEL_SEPARATOR = "\x1f"
+
+
+def key_hashes(df: pd.DataFrame, key_columns) -> pd.Series:
+    """
+    64-bit hash of the key of every row. Labels are compared as strings and times as nanoseconds,
+    so '4001' and 4001, or '2020-01-01T01' and a timestamp, are the same key.
+    """
+    keys = pd.DataFrame(index=df.index)
+    for col in key_columns:
+        if col == "datetime" or pd.api.types.is_datetime64_any_dtype(df[col]):
+            keys[col] = pd.to_datetime(df[col], format="ISO8601").astype("datetime64[ns]").astype("int64")
+        else:
+            keys[col] = df[col].astype(str)
+    return pd.util.hash_pandas_object(keys, index=False)
+
+
+def row_hashes(df: pd.DataFrame, key_columns) -> pd.Series:
+    """64-bit hash of the values of every row outside its key; numbers compare as float64."""
+    columns = sorted(col for col in df.columns if col not in key_columns)
+    if not columns:
+        return pd.Series(np.zeros(len(df), dtype="uint64"), index=df.index)
+    values = pd.DataFrame(index=df.index)
+    for col in columns:
+        data = df[col]
+        if pd.api.types.is_datetime64_any_dtype(data):
+            values[col] = data.astype("datetime64[ns]").astype("int64")
+        elif pd.api.types.is_numeric_dtype(data):
+            values[col] = data.astype("float64")
+        else:
+            values[col] = data.astype(str)
+    return pd.util.hash_pandas_object(values, index=False)
+
+
+def partition_label(values) -> str:
+    return LABEL_SEPARATOR.join(str(value) for value in values)
+
+
+def partition_key(label: str, partition_cols: list) -> dict:
+    """The {partition column: value} of a label, as taken by ParquetDataStore.read_partition."""
+    return dict(zip(partition_cols, label.split(LABEL_SEPARATOR))) if partition_cols else {}
+
+
+class KeyIndex:
+    """
+    The keys of a dataset: for every key hash, the hash of its row and its leaf partition.
+
+    The index is saved in the dataset directory with the data files of each partition it was built
+    from. A partition whose files changed since (rows appended by another writer) is stale and only
+    that partition is read again to refresh it, so upserts never reread the whole history.
+    """
+
+    def __init__(self, key_columns=KEY_COLUMNS, frame: Optional[pd.DataFrame] = None, files: Optional[dict] = None):
+        self.key_columns = list(key_columns)
+        if frame is None:
+            frame = pd.DataFrame({
+                "row": pd.Series(dtype="uint64"), "partition": pd.Series(dtype=object),
+            }, index=pd.Index([], dtype="uint64", name="key"))
+        self.frame = frame
+        # {partition label: sorted data file paths relative to the dataset}
+        self.files = files or {}
+
+    @classmethod
+    def load(cls, dataset_path: str, key_columns=KEY_COLUMNS) -> "KeyIndex":
+        """The saved index of the dataset, or an empty one when it is missing or has other key columns."""
+        path = os.path.join(dataset_path, INDEX_FILE)
+        try:
+            table = pq.read_table(path)
+        except (FileNotFoundError, pa.ArrowInvalid):
+            return cls(key_columns)
+        metadata = json.loads(table.schema.metadata[b"key_index"])
+        if metadata["key_columns"] != list(key_columns):
+            return cls(key_columns)
+        frame = table.to_pandas().set_index("key")
+        return cls(key_columns, frame, metadata["files"])
+
+    def save(self, dataset_path: str) -> str:
+        path = os.path.join(dataset_path, INDEX_FILE)
+        table = pa.Table.from_pandas(self.frame.reset_index(), preserve_index=False)
+        metadata = {"key_columns": self.key_columns, "files": self.files}
+        table = table.replace_schema_metadata({b"key_index": json.dumps(metadata).encode()})
+        temp_path = path + ".tmp"
+        pq.write_table(table, temp_path)
+        os.replace(temp_path, path)
+        return path
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    # ---------------------------------
+    def stale_partitions(self, files: dict) -> set:
+        """The partitions whose data files differ from the ones the index was built from, removed ones included."""
+        return {label for label in set(files) | set(self.files) if sorted(files.get(label, [])) != self.files.get(label)}
+
+    def drop_partitions(self, labels) -> None:
+        self.frame = self.frame[~self.frame["partition"].isin(set(labels))]
+        for label in labels:
+            self.files.pop(label, None)
+
+    def lookup(self, keys: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+        """Returns whether each key is indexed and the row hash it has (0 when it is not)."""
+        positions = self.frame.index.get_indexer(keys.to_numpy())
+        known = positions >= 0
+        rows = np.zeros(len(keys), dtype="uint64")
+        rows[known] = self.frame["row"].to_numpy()[positions[known]]
+        return known, rows
+
+    def add(self, keys: pd.Series, rows: pd.Series, partitions) -> None:
+        """Indexes the keys, replacing the entries of the keys already indexed."""
+        added = pd.DataFrame({
+            "row": rows.to_numpy(dtype="uint64"),
+            "partition": np.asarray(partitions, dtype=object) if not isinstance(partitions, str) else partitions,
+        }, index=pd.Index(keys.to_numpy(dtype="uint64"), name="key"))
+        added = added[~added.index.duplicated(keep="last")]
+        self.frame = pd.concat([self.frame[~self.frame.index.isin(added.index)], added])
@@ -0,0 +1,150 @@
+import os
+import shutil
+import logging
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from dataset.scripts.data_store import is_dataset, read_dataset, write_dataset
+from dataset.scripts.feature_transformer import FeatureTransformer
+from dataset.scripts.statistics_store import FeatureStatistics
+from dataset.scripts.streaming_preprocess import KEY_COLUMNS, save_fitted
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    handlers=[logging.StreamHandler()],
+)
+logger = logging.getLogger(__name__)
+
+# Worker processes when none are given, overridable with PREPROCESS_WORKERS
+DEFAULT_PREPROCESS_WORKERS = os.cpu_count() or 1
+
+
+def _preprocess_partition(preprocessor, input_path: str, offset: int, length: int, part_path: str):
+    """
+    Runs in a worker process: computes the features of rows [offset, offset + length) of the
+    memory-mapped Arrow file and writes them to the Parquet file part_path. Returns the number of
+    rows and their FeatureStatistics.
+    """
+    with pa.memory_map(input_path) as source:
+        # Zero-copy: the slice is backed by the mapped pages shared with the other workers
+        chunk = pa.ipc.open_file(source).read_all().slice(offset, length).to_pandas()
+
+    for col in KEY_COLUMNS:
+        if col in chunk.columns:
+            chunk[col] = chunk[col].astype(str)
+    df_features = preprocessor.features_df(chunk)
+    df_features.to_parquet(part_path, index=False)
+    return len(df_features), FeatureStatistics().fold(df_features)
+
+
+class ParallelPreprocessor:
+    """
+    Runs the chunk_by_subba mode of DataPreprocessor.preprocess_pipeline with one process per
+    'subba-name' partition (in this process with max_workers=1).
+
+    The input is loaded once and written to an uncompressed Arrow IPC file, with the rows of every
+    subba-name stored contiguously in their input order. Workers memory-map that file and read their
+    partition as a zero-copy slice, so the input is shared read-only instead of pickled to every
+    process. The features of each partition are computed on their own and written to a part file,
+    with its FeatureStatistics. The statistics are merged into those of the whole input, and every
+    part is normalized with their transformer, saved next to the output, in the order the
+    partitions first appear in the input. The output is the same whatever the worker count or
+    completion order.
+    """
+
+    def __init__(self, preprocessor, max_workers: Optional[int] = None):
+        max_workers = max_workers or int(os.getenv("PREPROCESS_WORKERS", DEFAULT_PREPROCESS_WORKERS))
+        if max_workers < 1:
+            raise ValueError("max_workers must be positive.")
+        self.preprocessor = preprocessor
+        self.max_workers = max_workers
+
+    def run(self, input_path: str, output_path: Optional[str] = None, transformer_path: Optional[str] = None) -> str:
+        """
+        Preprocesses input_path into output_path and returns it. The output is a CSV file for a CSV
+        input and a dataset for a dataset input, next to the input unless output_path is given.
+        The fitted transformer is saved to transformer_path (next to the output by default) and
+        becomes the preprocessor's transformer.
+        """
+        to_dataset = is_dataset(input_path)
+        if output_path is None:
+            name = "data_preprocess" if to_dataset else "data_preprocess.csv"
+            output_path = os.path.join(os.path.dirname(os.path.abspath(input_path)), name)
+
+        data = read_dataset(input_path) if to_dataset else pd.read_csv(input_path)
+        work_dir = tempfile.mkdtemp(prefix=".preprocess-", dir=os.path.dirname(os.path.abspath(output_path)))
+        try:
+            arrow_path, partitions = self.__write_partitions(data, work_dir)
+            del data
+            parts, statistics = self.__run_partitions(arrow_path, partitions, work_dir)
+            self.__merge(parts, statistics.transformer(), output_path, to_dataset)
+            save_fitted(self.preprocessor, statistics, output_path, transformer_path)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        return output_path
+
+    @staticmethod
+    def __write_partitions(data: pd.DataFrame, work_dir: str) -> tuple[str, list]:
+        """Writes data grouped by subba-name to an Arrow file. Returns its path and (subba, offset, length)."""
+        codes, subbas = pd.factorize(data["subba-name"], use_na_sentinel=False)
+        order = np.argsort(codes, kind="stable")
+        lengths = np.bincount(codes, minlength=len(subbas))
+        offsets = np.r_[0, np.cumsum(lengths)[:-1]]
+
+        table = pa.Table.from_pandas(data.iloc[order], preserve_index=False)
+        arrow_path = os.path.join(work_dir, "input.arrow")
+        with pa.OSFile(arrow_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+        partitions = [(subba, int(offset), int(length)) for subba, offset, length in zip(subbas, offsets, lengths)]
+        logger.info(f"Total rows: {len(data)}, unique 'subba-name' values: {len(partitions)}")
+        return arrow_path, partitions
+
+    def __run_partitions(self, arrow_path: str, partitions: list, work_dir: str) -> tuple[list, FeatureStatistics]:
+        """
+        Computes the features of every partition, in the process pool with more than one worker.
+        Returns the part paths in partition order and the statistics of all of them.
+        """
+        parts = [os.path.join(work_dir, f"part-{i:06d}.parquet") for i in range(len(partitions))]
+        tasks = [
+            (self.preprocessor, arrow_path, offset, length, part)
+            for (_, offset, length), part in zip(partitions, parts)
+        ]
+        max_workers = max(1, min(self.max_workers, len(partitions)))
+        logger.info(f"Preprocessing {len(partitions)} partitions with {max_workers} worker processes.")
+
+        if max_workers == 1:
+            results = [_preprocess_partition(*task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                # map() returns results in submission order, whatever the completion order
+                results = list(pool.map(_preprocess_partition, *zip(*tasks)))
+
+        statistics = FeatureStatistics()
+        for (subba, _, _), (rows, partition_statistics) in zip(partitions, results):
+            statistics.merge(partition_statistics)
+            logger.info(f"Partition {subba}: {rows} rows preprocessed.")
+        return parts, statistics
+
+    def __merge(self, parts: list, transformer: FeatureTransformer, output_path: str, to_dataset: bool) -> None:
+        """Normalizes the part files with the whole-input transformer and writes them in partition order."""
+        preprocessor = self.preprocessor
+        if not to_dataset:
+            # Truncate, the header is written with the first part
+            open(output_path, "w").close()
+
+        for i, part in enumerate(parts):
+            df = preprocessor.normalize_and_encode_df(pd.read_parquet(part), transformer=transformer)
+            df = preprocessor.select_final_features_df(df)
+            if to_dataset:
+                write_dataset(output_path, df, mode="overwrite" if i == 0 else "append")
+            else:
+                df.to_csv(output_path, index=False, mode="a", header=(i == 0))
+        logger.info(f"Merged {len(parts)} partitions into {output_path}.")
@@ -0,0 +1,58 @@
+import os
+import logging
+import threading
+
+import pandas as pd
+
+from dataset.scripts.data_store import ParquetDataStore
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    handlers=[logging.StreamHandler()],
+)
+logger = logging.getLogger(__name__)
+
+
+class PartitionedParquetWriter:
+    """
+    Writes merged (zone, date range) slices to a ParquetDataStore dataset, the layout every reader
+    uses: zone=<zone>/subba-name=<subba>/month=<YYYY-MM> with the _schema.json sidecar, so the output
+    is read back with read_dataset(output_dir) or the data store.
+
+    Each slice is upserted by (zone, subba-name, datetime) as soon as it is merged and can then be
+    dropped from memory. Re-running a range rewrites the rows that changed instead of duplicating
+    them. Slices merged on several threads are written one at a time.
+    """
+
+    def __init__(self, output_dir: str, time_column: str = "datetime"):
+        self.output_dir = os.path.abspath(output_dir)
+        root_dir, self.name = os.path.split(self.output_dir)
+        self.store = ParquetDataStore(root_dir, time_column=time_column)
+        self.time_column = time_column
+        self.rows_written = 0
+        self.files_written = []
+        self._lock = threading.Lock()
+
+    def write(self, zone: str, start: str, end: str, df: pd.DataFrame) -> list:
+        """Upserts one merged slice. Returns the data files it wrote, none when the rows were already stored."""
+        if df is None or df.empty:
+            return []
+
+        df = df.drop(columns=["year"], errors="ignore").assign(zone=zone)
+        with self._lock:
+            before = self.__files()
+            counts = self.store.upsert(self.name, df)
+            # Data files are never modified once written, the new ones hold the rows of this slice
+            paths = sorted(self.__files() - before)
+            self.rows_written += counts["inserted"] + counts["updated"]
+            self.files_written.extend(paths)
+        logger.info(f"Wrote {zone} {start} - {end} to {len(paths)} files ({counts}).")
+        return paths
+
+    def __files(self) -> set:
+        return {
+            os.path.join(self.output_dir, path)
+            for paths in self.store.partition_files(self.name).values() for path in paths
+        }
@@ -0,0 +1,251 @@
+import os
+import math
+import logging
+from typing import Optional
+
+import pandas as pd
+
+try:
+    import polars as pl
+except ImportError:  # Optional, only needed for DataPreprocessor(engine="polars")
+    pl = None
+
+from dataset.scripts.data_store import is_dataset, read_dataset, write_dataset
+from dataset.scripts.dtype_plan import CATEGORY_COLUMNS, TIME_COLUMNS
+from dataset.scripts.feature_transformer import CYCLIC_COLUMNS, EXCLUDED_COLUMNS
+from dataset.scripts.statistics_store import ColumnStatistics, FeatureStatistics
+from dataset.scripts.streaming_preprocess import save_fitted
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    handlers=[logging.StreamHandler()],
+)
+logger = logging.getLogger(__name__)
+
+ENGINES = ("pandas", "polars")
+DEFAULT_ENGINE = "pandas"
+
+# Formats of the raw 'datetime' strings, tried in order; hours ('2019-01-01T05') get ':00' first,
+# Polars formats need minutes with hours
+DATETIME_FORMATS = ("%Y-%m-%dT%H:%M", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d")
+HOUR_PATTERN = r"^(\d{4}-\d{2}-\d{2}T\d{2})$"
+
+ROW_INDEX = "__row"
+
+
+class PolarsEngine:
+    """
+    Runs the DataPreprocessor plan (clean -> rolling/lag features -> cyclic features -> normalize and
+    encode -> select) as one Polars lazy query, with the same output as the pandas implementation.
+
+    Polars executes the query on all cores (POLARS_MAX_THREADS to limit them) with the streaming
+    engine, so the intermediate frames of the pandas steps are never materialized. Windows and lags
+    are computed per subba-name/zone series in datetime order, and the min/max of the normalization
+    are aggregations of the same query. run() reads a raw CSV file lazily and writes the output while
+    the statistics of the features (for the transformer artifact) are collected in the same pass.
+    """
+
+    def __init__(self, preprocessor):
+        if pl is None:
+            raise ImportError("The polars engine needs polars, install it with 'pip install polars'.")
+        self.preprocessor = preprocessor
+        self.feature_engine = preprocessor.feature_engine
+
+    # ---------------------------------
+    @staticmethod
+    def type_plan(lf) -> dict:
+        """
+        DataPreprocessor.type_plan_df of a lazy frame, in one aggregation: 'datetime' is parsed,
+        numeric strings become numbers and whole floats without missing values become int64.
+        """
+        schema = lf.collect_schema()
+        exprs = []
+        for col, dtype in schema.items():
+            if col == "datetime":
+                continue
+            if dtype == pl.String:
+                values = pl.col(col).cast(pl.Float64, strict=False)
+                exprs.append((values.null_count() == pl.col(col).null_count()).alias(f"{col}\x00numeric"))
+            elif dtype.is_numeric():
+                values = pl.col(col).cast(pl.Float64)
+            else:
+                continue
+            whole = (values.null_count() == 0) & (values.is_finite() & (values == values.floor())).all()
+            exprs.append(whole.alias(f"{col}\x00whole"))
+        checks = lf.select(exprs).collect(engine="streaming").row(0, named=True) if exprs else {}
+
+        plan = {}
+        for col, dtype in schema.items():
+            if col == "datetime":
+                plan[col] = "datetime"
+            elif not checks.get(f"{col}\x00numeric", dtype.is_numeric()):
+                plan[col] = None
+            else:
+                plan[col] = "int64" if checks[f"{col}\x00whole"] else "float64"
+        return plan
+
+    @staticmethod
+    def __coerce(lf, plan: dict):
+        schema = lf.collect_schema()
+        exprs = []
+        for col, dtype in plan.items():
+            if dtype == "datetime":
+                if schema[col] == pl.String:
+                    values = pl.col(col).str.replace(HOUR_PATTERN, "${1}:00")
+                    parsed = [values.str.to_datetime(fmt, time_unit="ns", strict=False) for fmt in DATETIME_FORMATS]
+                    exprs.append(pl.coalesce(parsed).alias(col))
+                else:
+                    exprs.append(pl.col(col).cast(pl.Datetime("ns")))
+            elif dtype is not None:
+                exprs.append(pl.col(col).cast(pl.Float64).cast(pl.Int64 if dtype == "int64" else pl.Float64))
+        return lf.with_columns(exprs)
+
+    def features(self, lf, plan: dict):
+        """The lazy frame of DataPreprocessor.features_df: coerced, cleaned, rolling/lag and cyclic features."""
+        engine = self.feature_engine
+        lf = self.__coerce(lf, plan)
+
+        # clean_data_df: NaN is missing for pandas, then duplicates keep their first row
+        lf = lf.with_columns(pl.col(pl.Float32, pl.Float64).fill_nan(None))
+        lf = lf.drop_nulls().unique(maintain_order=True, keep="first")
+
+        # Rolling and lag features per series in time order; ties keep the input order
+        columns = lf.collect_schema().names()
+        group_columns = [col for col in engine.group_columns if col in columns]
+        sort_keys = group_columns + ([engine.time_column] if engine.time_column in columns else [])
+
+        def per_series(expr):
+            return expr.over(group_columns) if group_columns else expr
+
+        exprs = []
+        for column in engine.columns:
+            values = pl.col(column).cast(pl.Float64)
+            for window in engine.windows:
+                mean_name, std_name = engine.rolling_names(column, window)
+                exprs.append(per_series(values.rolling_mean(window)).alias(mean_name))
+                exprs.append(per_series(values.rolling_std(window, ddof=1)).alias(std_name))
+        for lag in engine.lags:
+            for column in engine.columns:
+                exprs.append(per_series(pl.col(column).cast(pl.Float64).shift(lag)).alias(f"{column}_lag_{lag}"))
+
+        lf = (
+            lf.with_row_index(ROW_INDEX)
+            .sort(sort_keys + [ROW_INDEX])
+            .with_columns(exprs)
+            .sort(ROW_INDEX)
+            .drop(ROW_INDEX)
+            .drop_nulls(engine.feature_names())
+        )
+
+        # add_cyclic_features_df, with numpy's order of operations
+        month = pl.col("datetime").dt.month().cast(pl.Float64)
+        angle = pl.lit(2 * math.pi) * month / 12
+        return lf.with_columns(
+            pl.col("datetime").alias("datetime_1"),
+            angle.sin().round(6).alias("month_sin"),
+            angle.cos().round(6).alias("month_cos"),
+        )
+
+    @staticmethod
+    def __columns(lf) -> tuple[list, list]:
+        """FeatureTransformer.columns of a lazy frame: the columns min/max scaled and label encoded."""
+        schema = lf.collect_schema()
+        columns_to_normalize = sorted(col for col, dtype in schema.items() if dtype.is_numeric() and col not in EXCLUDED_COLUMNS)
+        columns_to_encode = [col for col, dtype in schema.items() if dtype == pl.String and col != "datetime"]
+        return columns_to_normalize, columns_to_encode
+
+    def normalize_and_select(self, features):
+        """
+        normalize_and_encode_df with bounds and labels fitted on all rows of features, then
+        select_final_features_df: selected features, floats as float32.
+        """
+        columns_to_normalize, columns_to_encode = self.__columns(features)
+        exprs = []
+        for col in columns_to_normalize:
+            values = pl.col(col).cast(pl.Float64)
+            exprs.append(((values - values.min()) / (values.max() - values.min())).alias(col))
+        for col in CYCLIC_COLUMNS:
+            exprs.append((pl.col(col) + 1) / 2)
+        for col in columns_to_encode:
+            # The index in the sorted vocabulary, as LabelEncoder
+            exprs.append((pl.col(col).rank("dense").cast(pl.Int64) - 1).alias(col))
+
+        selected = features.with_columns(exprs).select(self.preprocessor.selected_features)
+        # dtype_plan(chunked=True): float32 features
+        return selected.with_columns(
+            pl.col(pl.Float64).cast(pl.Float32),
+            pl.col([col for col in TIME_COLUMNS if col in self.preprocessor.selected_features]).cast(pl.Datetime("ns")),
+        )
+
+    def statistics(self, features):
+        """Lazy one row frame with the count/mean/M2/min/max of every scaled column and the labels of every encoded one."""
+        columns_to_normalize, columns_to_encode = self.__columns(features)
+        exprs = []
+        for col in columns_to_normalize:
+            values = pl.col(col).cast(pl.Float64)
+            exprs.append(pl.struct(
+                count=values.count(), mean=values.mean(), m2=values.var(ddof=0) * values.count(),
+                min=values.min(), max=values.max(),
+            ).alias(col))
+        for col in columns_to_encode:
+            exprs.append(pl.col(col).unique().implode().alias(col))
+        return features.select(exprs)
+
+    @staticmethod
+    def to_feature_statistics(row: dict, columns_to_encode: list) -> FeatureStatistics:
+        statistics = FeatureStatistics()
+        for col, value in row.items():
+            if col in columns_to_encode:
+                statistics.classes[col] = set(value)
+            elif value["count"]:
+                statistics.columns[col] = ColumnStatistics(
+                    value["count"], value["mean"], value["m2"], value["min"], value["max"]
+                )
+        return statistics
+
+    # ---------------------------------
+    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        """DataPreprocessor.transform_df(df) as one lazy query."""
+        lf = pl.from_pandas(df).lazy()
+        result = self.normalize_and_select(self.features(lf, self.type_plan(lf))).collect(engine="streaming")
+        print("Polars preprocessing complete.")
+        return result.to_pandas()
+
+    def run(self, input_path: str, output_path: Optional[str] = None, transformer_path: Optional[str] = None) -> str:
+        """
+        Preprocesses input_path into output_path and returns it, as DataPreprocessor.preprocess_pipeline.
+        A raw CSV file is scanned lazily and the output CSV file is written as a sink; a dataset input
+        is read through the data store and gives a dataset. The transformer fitted on all rows is saved
+        to transformer_path (next to the output by default) and becomes the preprocessor's transformer.
+        """
+        to_dataset = is_dataset(input_path)
+        if output_path is None:
+            name = "data_preprocess" if to_dataset else "data_preprocess.csv"
+            output_path = os.path.join(os.path.dirname(os.path.abspath(input_path)), name)
+
+        if to_dataset:
+            lf = pl.from_pandas(read_dataset(input_path)).lazy()
+            # The labels are strings, as in a CSV file
+            lf = lf.with_columns(pl.col([col for col in CATEGORY_COLUMNS if col in lf.collect_schema().names()]).cast(pl.String))
+        else:
+            # Strings, as read by pandas and coerced by the type plan
+            lf = pl.scan_csv(input_path, infer_schema=False)
+
+        features = self.features(lf, self.type_plan(lf))
+        output = self.normalize_and_select(features)
+        _, columns_to_encode = self.__columns(features)
+
+        # One execution: the features are shared by the output and the statistics
+        if to_dataset:
+            df, statistics = pl.collect_all([output, self.statistics(features)], engine="streaming")
+            write_dataset(output_path, df.to_pandas(), mode="overwrite")
+        else:
+            sink = output.sink_csv(output_path, datetime_format="%Y-%m-%d %H:%M:%S", lazy=True)
+            _, statistics = pl.collect_all([sink, self.statistics(features)], engine="streaming")
+
+        statistics = self.to_feature_statistics(statistics.row(0, named=True), columns_to_encode)
+        save_fitted(self.preprocessor, statistics, output_path, transformer_path)
+        logger.info(f"Preprocessed {input_path} into {output_path} with the polars engine.")
+        return output_path
@@ -0,0 +1,138 @@
+import os
+import json
+import time
+import fcntl
+import logging
+import threading
+from typing import Optional
+from datetime import datetime
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    handlers=[logging.StreamHandler()],
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_PATH = os.path.join(os.path.dirname(__file__), "../data/quota_state.json")
+
+# Per provider token bucket (rate in requests per second, burst capacity) and daily request budget
+DEFAULT_QUOTAS = {
+    "eia_demand": {"rate": 5.0, "capacity": 10, "daily_budget": 5000},
+    "wwo_past_weather": {"rate": 5.0, "capacity": 10, "daily_budget": 500},
+    # weather.ashx forecasts, budgeted apart so they never eat into the historical backfill
+    "wwo_forecast": {"rate": 5.0, "capacity": 10, "daily_budget": 200},
+}
+
+
+class QuotaExhaustedError(Exception):
+    """Raised when a provider's daily budget is used up."""
+
+
+class QuotaScheduler:
+    """
+    Token bucket rate limiter with daily budgets for each API provider.
+
+    The bucket levels, the daily usage and a queue of deferred work are kept in a JSON state file
+    guarded by a file lock, so consecutive and concurrent Airflow tasks share one quota. acquire()
+    waits for the bucket to refill instead of failing, and only raises QuotaExhaustedError once
+    the daily budget is spent; callers then defer() the remaining work to a later run.
+    """
+
+    def __init__(self, state_path: Optional[str] = None, quotas: Optional[dict] = None):
+        self.state_path = os.path.abspath(state_path or os.getenv("QUOTA_STATE_PATH", DEFAULT_STATE_PATH))
+        self.quotas = {**DEFAULT_QUOTAS, **(quotas or {})}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+
+    def __locked_state(self, update):
+        """Runs update(state) under the thread and file locks and persists the state it leaves behind."""
+        with self._lock, open(self.state_path + ".lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self.state_path, "r") as f:
+                        state = json.load(f)
+                except (FileNotFoundError, json.JSONDecodeError):
+                    state = {"providers": {}, "deferred": []}
+
+                result = update(state)
+
+                temp_path = self.state_path + ".tmp"
+                with open(temp_path, "w") as f:
+                    json.dump(state, f, indent=4)
+                os.replace(temp_path, self.state_path)
+                return result
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def __refill(self, provider: str, bucket: dict, now: float) -> None:
+        quota = self.quotas[provider]
+        today = datetime.now().strftime("%Y-%m-%d")
+
+        if bucket.get("day") != today:
+            bucket["day"] = today
+            bucket["used_today"] = 0
+
+        elapsed = max(0.0, now - bucket.get("updated_at", now))
+        bucket["tokens"] = min(quota["capacity"], bucket.get("tokens", quota["capacity"]) + elapsed * quota["rate"])
+        bucket["updated_at"] = now
+
+    def acquire(self, provider: str, tokens: int = 1) -> None:
+        """Blocks until `tokens` requests may be sent to the provider."""
+        if provider not in self.quotas:
+            return
+
+        quota = self.quotas[provider]
+
+        def take(state):
+            bucket = state["providers"].setdefault(provider, {})
+            self.__refill(provider, bucket, time.time())
+
+            if bucket["used_today"] + tokens > quota["daily_budget"]:
+                raise QuotaExhaustedError(
+                    f"Daily budget of {quota['daily_budget']} requests for {provider} is used up."
+                )
+            if bucket["tokens"] >= tokens:
+                bucket["tokens"] -= tokens
+                bucket["used_today"] += tokens
+                return 0.0
+            return (tokens - bucket["tokens"]) / quota["rate"]
+
+        while True:
+            wait = self.__locked_state(take)
+            if wait == 0.0:
+                return
+            time.sleep(wait)
+
+    def remaining(self, provider: str) -> int:
+        """Returns how many requests are left in the provider's daily budget."""
+        def read(state):
+            bucket = state["providers"].setdefault(provider, {})
+            self.__refill(provider, bucket, time.time())
+            return self.quotas[provider]["daily_budget"] - bucket["used_today"]
+
+        return self.__locked_state(read)
+
+    def defer(self, items: list) -> None:
+        """Queues work that could not run within today's budget."""
+        if not items:
+            return
+
+        def push(state):
+            for item in items:
+                if item not in state["deferred"]:
+                    state["deferred"].append(item)
+
+        self.__locked_state(push)
+        logger.warning(f"Deferred {len(items)} work items until quota is available.")
+
+    def pop_deferred(self, predicate=None) -> list:
+        """Removes and returns the deferred work items matching predicate (all by default)."""
+        def pop(state):
+            matched = [item for item in state["deferred"] if predicate is None or predicate(item)]
+            state["deferred"] = [item for item in state["deferred"] if item not in matched]
+            return matched
+
+        return self.__locked_state(pop)
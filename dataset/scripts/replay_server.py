@@ -0,0 +1,404 @@
+# usage -
+# python dataset/scripts/replay_server.py --mode synthetic --port 8765 --latency-ms 50 --error-rate 0.02
+# python dataset/scripts/replay_server.py --mode record --port 8765 --record-dir dataset/data/replay
+# python dataset/scripts/replay_server.py --mode replay --port 8765 --record-dir dataset/data/replay
+#
+# then point the collector / backend at it:
+# export EIA_API_BASE_URL=http://127.0.0.1:8765 WEATHER_API_BASE_URL=http://127.0.0.1:8765 GEO_API_BASE_URL=http://127.0.0.1:8765
+
+import os
+import json
+import time
+import random
+import hashlib
+import logging
+import argparse
+import tempfile
+import threading
+from typing import Optional
+from datetime import datetime, timedelta
+from urllib.parse import urlparse, parse_qsl
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+import requests
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    handlers=[logging.StreamHandler()],
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_RECORD_DIR = os.path.join(os.path.dirname(__file__), "../data/replay")
+
+# Request path -> (service name, upstream base url used in record mode)
+SERVICES = {
+    "/v2/electricity/rto/region-sub-ba-data/data/": ("eia_demand", "https://api.eia.gov"),
+    "/premium/v1/past-weather.ashx": ("wwo_past_weather", "https://api.worldweatheronline.com"),
+    "/premium/v1/weather.ashx": ("wwo_weather", "https://api.worldweatheronline.com"),
+    "/geocode/v1/json": ("geocode", "https://api.opencagedata.com"),
+}
+
+# Query parameters that carry credentials, never part of a recording key or written to disk
+SECRET_PARAMS = ("api_key", "key")
+
+# Hourly fields returned by the WorldWeatherOnline weather APIs
+WEATHER_HOURLY_FIELDS = [
+    "tempC", "tempF", "windspeedMiles", "windspeedKmph", "winddirDegree", "winddir16Point",
+    "weatherCode", "precipMM", "precipInches", "humidity", "visibility", "visibilityMiles",
+    "pressure", "pressureInches", "cloudcover", "HeatIndexC", "HeatIndexF", "DewPointC",
+    "DewPointF", "WindChillC", "WindChillF", "WindGustMiles", "WindGustKmph", "FeelsLikeC",
+    "FeelsLikeF", "uvIndex",
+]
+
+
+def _seed_for(*parts) -> int:
+    """Stable seed for a request, so synthetic responses are identical across runs and processes."""
+    return int(hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()[:8], 16)
+
+
+# -----------------------------------------------------------------------
+# Synthetic responses, in the formats DataCollector and RAG expect
+def synthetic_eia_demand(query: dict) -> dict:
+    subba = query.get("facets[subba][]", "ZONA")
+    periods = pd.date_range(query["start"], pd.Timestamp(query["end"]) + timedelta(hours=23), freq="h")
+    rng = np.random.default_rng(_seed_for("eia_demand", subba, query["start"], query["end"]))
+
+    # Daily cycle around a zone specific base load
+    base = 1000 + _seed_for(subba) % 4000
+    values = base * (1 + 0.2 * np.sin((periods.hour.to_numpy() - 6) / 24 * 2 * np.pi)) + rng.normal(0, 20, len(periods))
+
+    rows = [
+        {
+            "period": f"{period:%Y-%m-%dT%H}",
+            "subba": subba,
+            "subba-name": f"Zone {subba}",
+            "parent": "SYNT",
+            "parent-name": "Synthetic ISO",
+            "value": int(value),
+            "value-units": "megawatthours",
+        }
+        for period, value in zip(periods, values)
+    ]
+    return {"response": {"total": str(len(rows)), "frequency": "hourly", "data": rows}}
+
+
+def _weather_day(day: pd.Timestamp, location: str, hours: int) -> dict:
+    rng = np.random.default_rng(_seed_for("weather", location, f"{day:%Y-%m-%d}", hours))
+    values = rng.integers(0, 100, size=(hours, len(WEATHER_HOURLY_FIELDS))).astype(str)
+
+    hourly = []
+    for h in range(hours):
+        hour = {"time": str(h * (2400 // hours))}
+        hour.update(zip(WEATHER_HOURLY_FIELDS, values[h]))
+        hour["winddir16Point"] = "N"
+        hour["weatherIconUrl"] = [{"value": "https://cdn.worldweatheronline.com/images/wsymbol_0001.png"}]
+        hour["weatherDesc"] = [{"value": "Sunny"}]
+        hourly.append(hour)
+    return {"date": f"{day:%Y-%m-%d}", "hourly": hourly}
+
+
+def synthetic_past_weather(query: dict) -> dict:
+    days = pd.date_range(query["date"], query.get("enddate", query["date"]), freq="D")
+    hours = 24 // int(query.get("tp", 1))
+    return {"data": {"weather": [_weather_day(day, query.get("q", ""), hours) for day in days]}}
+
+
+def synthetic_weather(query: dict) -> dict:
+    date = query.get("date", "today")
+    if date in ("today", "tomorrow"):
+        day = pd.Timestamp(datetime.now().date()) + timedelta(days=int(date == "tomorrow"))
+    else:
+        day = pd.Timestamp(date)
+    hours = 24 // int(query.get("tp", 24))
+    return {"data": {"weather": [_weather_day(day, query.get("q", ""), hours)]}}
+
+
+def synthetic_geocode(query: dict) -> dict:
+    # Coordinates inside the continental US, stable per place name
+    seed = _seed_for("geocode", query.get("q", ""))
+    lat = 30 + (seed % 15000) / 1000
+    lng = -120 + (seed // 15000 % 45000) / 1000
+    return {
+        "results": [{"formatted": query.get("q", ""), "geometry": {"lat": round(lat, 6), "lng": round(lng, 6)}}],
+        "status": {"code": 200, "message": "OK"},
+        "total_results": 1,
+    }
+
+
+SYNTHETIC_RESPONSES = {
+    "eia_demand": synthetic_eia_demand,
+    "wwo_past_weather": synthetic_past_weather,
+    "wwo_weather": synthetic_weather,
+    "geocode": synthetic_geocode,
+}
+
+
+# -----------------------------------------------------------------------
+class ReplayStore:
+    """
+    Recorded responses on disk, one JSON file per request.
+
+    Files are named by the sha256 of the request path and its query without credentials, and
+    grouped in a directory per service.
+    """
+
+    def __init__(self, record_dir: Optional[str] = None):
+        self.record_dir = os.path.abspath(record_dir or os.getenv("REPLAY_RECORD_DIR", DEFAULT_RECORD_DIR))
+
+    @staticmethod
+    def public_query(query: dict) -> dict:
+        return {k: v for k, v in sorted(query.items()) if k not in SECRET_PARAMS}
+
+    def __path(self, service: str, path: str, query: dict) -> str:
+        raw = json.dumps([path, self.public_query(query)])
+        key = hashlib.sha256(raw.encode("utf-8")).hexdigest()
+        return os.path.join(self.record_dir, service, f"{key}.json")
+
+    def get(self, service: str, path: str, query: dict) -> Optional[dict]:
+        try:
+            with open(self.__path(service, path, query), "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, service: str, path: str, query: dict, status: int, body) -> None:
+        target = self.__path(service, path, query)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        entry = {"path": path, "query": self.public_query(query), "status": status, "body": body}
+
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(target), suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(entry, f)
+        os.replace(temp_path, target)
+
+
+# -----------------------------------------------------------------------
+class ReplayServer:
+    """
+    Local stand-in for the EIA, WorldWeatherOnline and OpenCage APIs.
+
+    Modes:
+        synthetic - generated responses, deterministic for a given request
+        record    - forwards each request to the real API and stores the response in the ReplayStore
+        replay    - serves stored responses, falling back to synthetic ones (or a 404) on a miss
+
+    Every response is delayed by latency_ms plus up to jitter_ms, and by tail_ms on a tail_rate
+    share of requests. An error_rate share of requests gets one of error_statuses instead, so the
+    retry and backoff paths of the clients can be exercised. Counters are served at /__stats.
+    """
+
+    def __init__(
+        self,
+        mode: str = "synthetic",
+        host: str = "127.0.0.1",
+        port: int = 0,
+        record_dir: Optional[str] = None,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        tail_ms: float = 0.0,
+        tail_rate: float = 0.0,
+        error_rate: float = 0.0,
+        error_statuses: tuple = (500, 502, 503, 429),
+        fallback_synthetic: bool = True,
+        upstreams: Optional[dict] = None,
+        seed: int = 0,
+    ):
+        if mode not in ("synthetic", "record", "replay"):
+            raise ValueError(f"Unknown replay server mode: {mode}")
+
+        self.mode = mode
+        self.store = ReplayStore(record_dir)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.tail_ms = tail_ms
+        self.tail_rate = tail_rate
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.fallback_synthetic = fallback_synthetic
+        self.upstreams = {service: base for service, base in SERVICES.values()}
+        self.upstreams.update(upstreams or {})
+
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stats = {}
+
+        self._server = ThreadingHTTPServer((host, port), self.__make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self) -> dict:
+        """Environment overrides that point DataCollector and RAG at this server."""
+        return {"EIA_API_BASE_URL": self.url, "WEATHER_API_BASE_URL": self.url, "GEO_API_BASE_URL": self.url}
+
+    # ---------------------------------
+    def record_stat(self, service: str, status: int, elapsed: float, injected: bool, source: str) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(
+                service, {"requests": 0, "injected_errors": 0, "total_seconds": 0.0, "status": {}, "source": {}}
+            )
+            stats["requests"] += 1
+            stats["injected_errors"] += int(injected)
+            stats["total_seconds"] += elapsed
+            stats["status"][str(status)] = stats["status"].get(str(status), 0) + 1
+            stats["source"][source] = stats["source"].get(source, 0) + 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            snapshot = {}
+            for service, stats in self._stats.items():
+                snapshot[service] = {**stats, "status": dict(stats["status"]), "source": dict(stats["source"])}
+                snapshot[service]["mean_seconds"] = stats["total_seconds"] / stats["requests"]
+            return snapshot
+
+    def __draw(self) -> tuple[float, bool]:
+        """Returns the delay in seconds and whether to inject an error, for one request."""
+        with self._lock:
+            delay = self.latency_ms + self._rng.uniform(0, self.jitter_ms)
+            if self.tail_rate and self._rng.random() < self.tail_rate:
+                delay += self.tail_ms
+            inject = bool(self.error_rate) and self._rng.random() < self.error_rate
+        return delay / 1000, inject
+
+    def __inject_status(self) -> int:
+        with self._lock:
+            return self._rng.choice(self.error_statuses)
+
+    def respond(self, path: str, raw_query: str) -> tuple[int, dict, str]:
+        """Returns (status, json body, source) for a request, source being synthetic/recorded/upstream/injected."""
+        if path not in SERVICES:
+            return 404, {"error": f"Unknown path {path}"}, "none"
+
+        service = SERVICES[path][0]
+        query = dict(parse_qsl(raw_query, keep_blank_values=True))
+
+        delay, inject = self.__draw()
+        if delay:
+            time.sleep(delay)
+        if inject:
+            return self.__inject_status(), {"error": "Injected error"}, "injected"
+
+        if self.mode == "record":
+            response = requests.get(f"{self.upstreams[service]}{path}", params=query, timeout=60)
+            try:
+                body = response.json()
+            except ValueError:
+                body = {"error": response.text}
+            self.store.put(service, path, query, response.status_code, body)
+            return response.status_code, body, "upstream"
+
+        if self.mode == "replay":
+            entry = self.store.get(service, path, query)
+            if entry is not None:
+                return entry["status"], entry["body"], "recorded"
+            if not self.fallback_synthetic:
+                return 404, {"error": "No recording for this request"}, "none"
+
+        return 200, SYNTHETIC_RESPONSES[service](query), "synthetic"
+
+    def __make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                start = time.perf_counter()
+                parsed = urlparse(self.path)
+
+                if parsed.path == "/__stats":
+                    status, body, source = 200, server.get_stats(), "stats"
+                else:
+                    try:
+                        status, body, source = server.respond(parsed.path, parsed.query)
+                    except Exception as e:
+                        logger.error(f"Replay server failed on {parsed.path}: {e}")
+                        status, body, source = 500, {"error": str(e)}, "error"
+
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                if source == "injected" and status in (429, 503):
+                    self.send_header("Retry-After", "0")
+                self.end_headers()
+                self.wfile.write(payload)
+
+                if parsed.path in SERVICES:
+                    server.record_stat(
+                        SERVICES[parsed.path][0], status, time.perf_counter() - start, source == "injected", source
+                    )
+
+            def log_message(self, format, *args):
+                logger.debug(f"{self.address_string()} - {format % args}")
+
+        return Handler
+
+    # ---------------------------------
+    def start(self) -> "ReplayServer":
+        """Serves in a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"Replay server ({self.mode}) listening on {self.url}")
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# -----------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the EIA, weather and geocode APIs.")
+    parser.add_argument("--mode", choices=["synthetic", "record", "replay"], default="synthetic")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--record-dir", default=None, help="Directory of recorded responses")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Base delay added to every response")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform random delay on top of the base delay")
+    parser.add_argument("--tail-ms", type=float, default=0.0, help="Extra delay for tail requests")
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="Share of requests that get the tail delay")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with an error")
+    parser.add_argument("--error-statuses", type=int, nargs="+", default=[500, 502, 503, 429])
+    parser.add_argument("--no-fallback", action="store_true", help="Replay mode: 404 on a miss instead of synthetic data")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = ReplayServer(
+        mode=args.mode,
+        host=args.host,
+        port=args.port,
+        record_dir=args.record_dir,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        tail_ms=args.tail_ms,
+        tail_rate=args.tail_rate,
+        error_rate=args.error_rate,
+        error_statuses=tuple(args.error_statuses),
+        fallback_synthetic=not args.no_fallback,
+        seed=args.seed,
+    )
+
+    logger.info("Export these to use it: " + " ".join(f"{k}={v}" for k, v in server.env().items()))
+    try:
+        server.start()._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from contextlib import suppress
+from typing import Any, Optional
+from datetime import datetime, timedelta
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    handlers=[logging.StreamHandler()],
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(__file__), "../data/cache")
+
+# Days after the end of a range during which the sources still publish late or revised hours
+DEFAULT_SETTLE_DAYS = 7
+
+
+def has_rows(payload: Any) -> bool:
+    """Whether a payload holds any result rows: the EIA response data, the WWO weather days, or anything else non-empty."""
+    if isinstance(payload, dict):
+        if isinstance(payload.get("response"), dict) and "data" in payload["response"]:
+            return bool(payload["response"]["data"])
+        if isinstance(payload.get("data"), dict) and "weather" in payload["data"]:
+            return bool(payload["data"]["weather"])
+    return bool(payload)
+
+
+class ResponseCache:
+    """
+    On-disk cache for API responses, keyed by (endpoint, location, start date, end date).
+
+    Entries are stored as JSON files named by the sha256 of the key. A date range that ended more
+    than settle_days ago is closed and never expires; until then the sources may still publish late
+    or revised hours. A range that ends before today expires after recent_ttl seconds, and a range
+    that reaches today after open_ttl seconds. Empty results are not cached. Once the cache grows
+    past max_bytes, the least recently used entries are evicted.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        max_bytes: int = 512 * 1024 * 1024,
+        recent_ttl: float = 24 * 60 * 60,
+        open_ttl: float = 15 * 60,
+        settle_days: int = DEFAULT_SETTLE_DAYS,
+    ):
+        self.cache_dir = os.path.abspath(cache_dir or os.getenv("DATA_CACHE_DIR", DEFAULT_CACHE_DIR))
+        self.max_bytes = max_bytes
+        self.recent_ttl = recent_ttl
+        self.open_ttl = open_ttl
+        self.settle_days = settle_days
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._size = self.__scan_size()
+
+    @staticmethod
+    def make_key(endpoint: str, location: str, start: str, end: str) -> str:
+        """Returns the content address of a request."""
+        raw = json.dumps([endpoint, location, start, end])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def ttl_for(self, start: str, end: str) -> Optional[float]:
+        """Returns the TTL in seconds for a 'YYYY-MM-DD' date range, None when the range is closed."""
+        end_date = datetime.strptime(end, "%Y-%m-%d").date()
+        today = datetime.now().date()
+
+        if end_date + timedelta(days=self.settle_days) < today:
+            return None
+        if end_date < today:
+            return self.recent_ttl
+        return self.open_ttl
+
+    def __path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, endpoint: str, location: str, start: str, end: str) -> Optional[Any]:
+        """Returns the cached payload, or None on a miss or an expired entry."""
+        path = self.__path(self.make_key(endpoint, location, start, end))
+
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        expires_at = entry["expires_at"]
+        if expires_at is not None and expires_at < time.time():
+            logger.info(f"Cache entry expired for {endpoint} {location} {start} - {end}.")
+            self.__remove(path)
+            with self._lock:
+                self.misses += 1
+            return None
+
+        # Touch the entry so eviction sees it as recently used; a concurrent eviction may have removed it
+        with suppress(OSError):
+            os.utime(path, None)
+        with self._lock:
+            self.hits += 1
+        return entry["payload"]
+
+    def put(self, endpoint: str, location: str, start: str, end: str, payload: Any) -> None:
+        """Stores a payload, then evicts old entries if the cache is over its size budget."""
+        if not has_rows(payload):
+            logger.info(f"Not caching the empty result for {endpoint} {location} {start} - {end}.")
+            return
+        ttl = self.ttl_for(start, end)
+        entry = {
+            "endpoint": endpoint,
+            "location": location,
+            "start": start,
+            "end": end,
+            "created_at": time.time(),
+            "expires_at": None if ttl is None else time.time() + ttl,
+            "payload": payload,
+        }
+
+        path = self.__path(self.make_key(endpoint, location, start, end))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temp file and rename, so concurrent readers never see a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(entry, f)
+        previous_size = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(temp_path, path)
+
+        with self._lock:
+            self._size += os.path.getsize(path) - previous_size
+            over_budget = self._size > self.max_bytes
+        if over_budget:
+            self.evict()
+
+    def __entries(self) -> list:
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def __scan_size(self) -> int:
+        return sum(size for _, size, _ in self.__entries())
+
+    def __remove(self, path: str) -> int:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            return 0
+        with self._lock:
+            self._size -= size
+        return size
+
+    def evict(self) -> int:
+        """Removes least recently used entries until the cache fits in max_bytes. Returns the count removed."""
+        entries = sorted(self.__entries())
+        total = sum(size for _, size, _ in entries)
+        with self._lock:
+            self._size = total
+
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            total -= self.__remove(path)
+            removed += 1
+
+        if removed:
+            logger.info(f"Evicted {removed} cache entries, cache size is now {total} bytes.")
+        return removed
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "bytes": self._size}
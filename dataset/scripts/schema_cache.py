@@ -0,0 +1,244 @@
+# usage -
+# python dataset/scripts/schema_cache.py infer dataset/data/data_preprocess
+# python dataset/scripts/schema_cache.py info dataset/data/data_preprocess
+
+import os
+import sys
+import json
+import hashlib
+import logging
+import argparse
+import datetime
+from typing import Optional
+
+import pandas as pd
+import pandera as pa
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from dataset.scripts.data_store import ParquetDataStore, SCHEMA_FILE, is_dataset, read_dataset
+from dataset.scripts.key_index import partition_key
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    handlers=[logging.StreamHandler()],
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCHEMA_CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../data/schemas"))
+
+# Versions kept per source, the newest is the base of incremental inference
+MAX_VERSIONS = 5
+
+HASH_CHUNK_BYTES = 1 << 20
+
+
+def data_version(path: str) -> str:
+    """
+    Content hash of the data at path. A dataset is hashed by its manifest, the dtypes sidecar and the
+    data files of every partition, which are never modified once written, so no data is read. A file
+    is hashed by its bytes: the md5 DVC gives it. SchemaCache only hashes a file again once its size
+    or mtime changed, see file_stat.
+    """
+    digest = hashlib.md5()
+    if is_dataset(path):
+        root_dir, name = os.path.split(os.path.abspath(path))
+        with open(os.path.join(path, SCHEMA_FILE), "rb") as f:
+            digest.update(f.read())
+        digest.update(json.dumps(ParquetDataStore(root_dir).partition_files(name), sort_keys=True).encode())
+    else:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def file_stat(path: str) -> Optional[list]:
+    """[size, mtime_ns] of a file, None for a dataset (its version is computed without reading data)."""
+    if is_dataset(path):
+        return None
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def infer_schema_dict(df: pd.DataFrame) -> dict:
+    """pa.infer_schema(df) in its JSON form: dtype, nullable and value bounds of every column."""
+    return json.loads(pa.infer_schema(df).to_json())
+
+
+def merge_schemas(schema: dict, other: dict) -> dict:
+    """
+    The schema (JSON form) both frames validate against: bounds are widened, a column is nullable
+    if it is in either, categories are joined, and an int column that became float is float.
+    """
+    merged = json.loads(json.dumps(schema))
+    columns = merged.setdefault("columns", {})
+    for col, properties in (other.get("columns") or {}).items():
+        if col not in columns:
+            columns[col] = properties
+            continue
+        column = columns[col]
+        if column["dtype"] != properties["dtype"]:
+            numeric = [dtype for dtype in (column["dtype"], properties["dtype"]) if dtype.startswith(("int", "float"))]
+            if len(numeric) == 2:
+                column["dtype"] = "float64"
+            else:
+                logger.warning(f"Column {col} is {column['dtype']} and {properties['dtype']}, keeping {column['dtype']}.")
+        if properties.get("nullable"):
+            column["nullable"] = True
+        for check, pick in (("greater_than_or_equal_to", min), ("less_than_or_equal_to", max)):
+            if check in properties:
+                column[check] = pick(column[check], properties[check]) if check in column else properties[check]
+        if "isin" in properties:
+            column["isin"] = sorted(set(column.get("isin", [])) | set(properties["isin"]))
+    return merged
+
+
+class SchemaCache:
+    """
+    Schemas inferred from a source (the DVC data_preprocess dataset or a CSV file), persisted per
+    version of the source: <cache_dir>/<source name>/<data_version>.json.
+
+    schema() returns the cached schema while the source is unchanged, so the source is not read. A
+    CSV file whose size and mtime are those of a cached entry is not even hashed.
+    When a dataset changed since the newest cached version by added or rewritten partitions, only
+    those partitions are read and their schema is merged into it. Otherwise (first use, a CSV file,
+    or removed partitions) the schema is inferred from the whole source, a dataset one partition at
+    a time.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_versions: int = MAX_VERSIONS):
+        self.cache_dir = os.path.abspath(cache_dir or os.getenv("SCHEMA_CACHE_DIR", DEFAULT_SCHEMA_CACHE_DIR))
+        self.max_versions = max_versions
+
+    def __source_dir(self, path: str) -> str:
+        name = os.path.splitext(os.path.basename(os.path.abspath(path)))[0]
+        return os.path.join(self.cache_dir, name)
+
+    def __entries(self, path: str) -> list:
+        """The cached entries of a source, newest first."""
+        source_dir = self.__source_dir(path)
+        if not os.path.isdir(source_dir):
+            return []
+        files = [os.path.join(source_dir, f) for f in os.listdir(source_dir) if f.endswith(".json")]
+        entries = []
+        for file in sorted(files, key=os.path.getmtime, reverse=True):
+            try:
+                with open(file, "r") as f:
+                    entries.append(json.load(f))
+            except (OSError, json.JSONDecodeError):
+                logger.warning(f"Skipping unreadable schema cache entry {file}.")
+        return entries
+
+    def __save(self, path: str, entry: dict) -> None:
+        source_dir = self.__source_dir(path)
+        os.makedirs(source_dir, exist_ok=True)
+        file = os.path.join(source_dir, f"{entry['version']}.json")
+        temp_path = file + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(entry, f, indent=4)
+        os.replace(temp_path, file)
+
+        versions = sorted(
+            (os.path.join(source_dir, f) for f in os.listdir(source_dir) if f.endswith(".json")),
+            key=os.path.getmtime, reverse=True,
+        )
+        for old in versions[self.max_versions:]:
+            os.remove(old)
+
+    # ---------------------------------
+    def schema(self, path: str) -> pa.DataFrameSchema:
+        """The schema of the data at path, from the cache when its version was inferred before."""
+        return pa.DataFrameSchema.from_json(json.dumps(self.schema_dict(path)))
+
+    def schema_dict(self, path: str) -> dict:
+        entries = self.__entries(path)
+        stat = file_stat(path)
+        if stat is not None:
+            for entry in entries:
+                if entry.get("stat") == stat and entry["source"] == os.path.abspath(path):
+                    logger.info(f"Schema of {path} loaded from the cache (unchanged since version {entry['version']}).")
+                    return entry["schema"]
+
+        version = data_version(path)
+        for entry in entries:
+            if entry["version"] == version:
+                logger.info(f"Schema of {path} loaded from the cache (version {version}).")
+                if stat is not None:
+                    # Same content with a new mtime (e.g. pulled again), skip the hash next time
+                    self.__save(path, {**entry, "source": os.path.abspath(path), "stat": stat})
+                return entry["schema"]
+
+        files = None
+        if is_dataset(path):
+            root_dir, name = os.path.split(os.path.abspath(path))
+            store = ParquetDataStore(root_dir)
+            files = store.partition_files(name)
+            base = next((entry for entry in entries if entry.get("files") is not None), None)
+            schema = self.__infer_partitions(store, name, files, base)
+        else:
+            logger.info(f"Inferring the schema of {path}.")
+            schema = infer_schema_dict(read_dataset(path))
+
+        self.__save(path, {
+            "source": os.path.abspath(path),
+            "version": version,
+            "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "files": files,
+            "stat": stat,
+            "schema": schema,
+        })
+        return schema
+
+    def __infer_partitions(self, store: ParquetDataStore, name: str, files: dict, base: Optional[dict]) -> dict:
+        """Merges the schema of the partitions changed since base into its schema, or of all partitions."""
+        if base is not None and set(base["files"]) <= set(files):
+            changed = [label for label in files if files[label] != base["files"].get(label)]
+            schema = base["schema"]
+            logger.info(f"Updating the cached schema of {name} with {len(changed)} of {len(files)} partitions.")
+        else:
+            changed = list(files)
+            schema = None
+            logger.info(f"Inferring the schema of {name} from {len(changed)} partitions.")
+
+        partition_cols = store.schema(name).get("partition_cols", [])
+        for label in changed:
+            partition_schema = infer_schema_dict(store.read_partition(name, partition_key(label, partition_cols)))
+            schema = partition_schema if schema is None else merge_schemas(schema, partition_schema)
+        if schema is None:
+            # No data files yet, the schema of the empty frame
+            schema = infer_schema_dict(store.read(name))
+        return schema
+
+    def info(self, path: str) -> list:
+        return [
+            {"version": entry["version"], "created_at": entry["created_at"], "columns": len(entry["schema"].get("columns") or {})}
+            for entry in self.__entries(path)
+        ]
+
+
+# -----------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Cached schema inference tools.")
+    parser.add_argument("--cache_dir", default=None)
+    subparsers = parser.add_subparsers(dest="action", required=True)
+
+    infer_parser = subparsers.add_parser("infer", help="Infer or load the schema of a CSV file or dataset")
+    infer_parser.add_argument("path")
+
+    info_parser = subparsers.add_parser("info", help="List the cached schema versions of a source")
+    info_parser.add_argument("path")
+
+    args = parser.parse_args()
+    cache = SchemaCache(args.cache_dir)
+
+    if args.action == "infer":
+        print(json.dumps(cache.schema_dict(args.path), indent=4))
+    elif args.action == "info":
+        for entry in cache.info(args.path):
+            logger.info(entry)
+
+
+if __name__ == "__main__":
+    main()
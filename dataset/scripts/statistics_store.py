@@ -0,0 +1,340 @@
+import os
+import json
+import fcntl
+import hashlib
+import logging
+import threading
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from dataset.scripts.data_store import ParquetDataStore
+from dataset.scripts.feature_transformer import FeatureTransformer, CYCLIC_COLUMNS, TRANSFORMER_FILE
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    handlers=[logging.StreamHandler()],
+)
+logger = logging.getLogger(__name__)
+
+# Sidecar in the preprocessed dataset, so the statistics are versioned (and pulled) with the data
+STATISTICS_FILE = "_statistics.json"
+
+# Batch ids remembered, so a retried task does not fold the same batch twice
+MAX_BATCH_IDS = 1000
+
+
+class ColumnStatistics:
+    """Count, mean, M2 (sum of squared deviations), min and max of one column."""
+
+    def __init__(self, count: int = 0, mean: float = 0.0, m2: float = 0.0, minimum: float = np.inf, maximum: float = -np.inf):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.minimum = minimum
+        self.maximum = maximum
+
+    @property
+    def variance(self) -> float:
+        """Sample variance, NaN below two values."""
+        return self.m2 / (self.count - 1) if self.count > 1 else np.nan
+
+    def merge(self, other: "ColumnStatistics") -> "ColumnStatistics":
+        """Folds other in, with the pairwise update of Chan et al., so no values need to be kept."""
+        if other.count == 0:
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        return self
+
+    def to_dict(self) -> dict:
+        return {"count": self.count, "mean": self.mean, "m2": self.m2, "min": self.minimum, "max": self.maximum}
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "ColumnStatistics":
+        return cls(state["count"], state["mean"], state["m2"], state["min"], state["max"])
+
+
+class FeatureStatistics:
+    """
+    ColumnStatistics of the columns FeatureTransformer scales and the labels of the columns it
+    encodes. fold() adds a frame in one vectorized pass per column block; merge() combines the
+    statistics of chunks or partitions. transformer() gives the FeatureTransformer of their bounds.
+    """
+
+    def __init__(self, columns: Optional[dict] = None, classes: Optional[dict] = None):
+        self.columns = dict(columns or {})
+        self.classes = {col: set(labels) for col, labels in (classes or {}).items()}
+
+    def fold(self, df: pd.DataFrame) -> "FeatureStatistics":
+        columns_to_normalize, columns_to_encode = FeatureTransformer.columns(df)
+        if len(df) and columns_to_normalize:
+            values = df[columns_to_normalize].to_numpy(dtype="float64")
+            counts = (~np.isnan(values)).sum(axis=0)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                means = np.nansum(values, axis=0) / counts
+                m2s = np.nansum(np.square(values - means), axis=0)
+            minimums, maximums = np.nanmin(values, axis=0, initial=np.inf), np.nanmax(values, axis=0, initial=-np.inf)
+            for i, col in enumerate(columns_to_normalize):
+                batch = ColumnStatistics(int(counts[i]), float(means[i]), float(m2s[i]), float(minimums[i]), float(maximums[i]))
+                self.columns.setdefault(col, ColumnStatistics()).merge(batch)
+        for col in columns_to_encode:
+            self.classes.setdefault(col, set()).update(df[col].astype(str).unique())
+        return self
+
+    def merge(self, other: "FeatureStatistics") -> "FeatureStatistics":
+        for col, statistics in other.columns.items():
+            self.columns.setdefault(col, ColumnStatistics()).merge(statistics)
+        for col, labels in other.classes.items():
+            self.classes.setdefault(col, set()).update(labels)
+        return self
+
+    def bounds(self) -> tuple[dict, dict]:
+        """{column: min} and {column: max} of the columns that have values."""
+        counted = {col: statistics for col, statistics in self.columns.items() if statistics.count}
+        return (
+            {col: statistics.minimum for col, statistics in counted.items()},
+            {col: statistics.maximum for col, statistics in counted.items()},
+        )
+
+    def transformer(self) -> FeatureTransformer:
+        minimums, maximums = self.bounds()
+        return FeatureTransformer(minimums, maximums, self.classes)
+
+    def to_dict(self) -> dict:
+        return {
+            "columns": {col: statistics.to_dict() for col, statistics in sorted(self.columns.items())},
+            "classes": {col: sorted(labels) for col, labels in sorted(self.classes.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "FeatureStatistics":
+        columns = {col: ColumnStatistics.from_dict(statistics) for col, statistics in state["columns"].items()}
+        return cls(columns, state["classes"])
+
+
+def batch_id(df: pd.DataFrame) -> str:
+    """Content hash of a batch, the same for a retried task."""
+    return hashlib.sha256(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes()).hexdigest()[:16]
+
+
+class StatisticsStore:
+    """
+    Running statistics of a preprocessed dataset, kept in its _statistics.json sidecar.
+
+    reset() stores the statistics of a full preprocessing run. fold() adds a batch of new feature
+    rows; when that moves the min or max of a column, the version is bumped and the bounds of the
+    new version are recorded. Every partition of the dataset is stamped with the version it was
+    normalized with (by default the version the dataset was last brought up to), and renormalize()
+    remaps only the partitions stamped with an older version, one partition at a time, from their
+    bounds to the current ones. Partitions are only read and rewritten when the bounds of a column
+    they store moved; the statistics also cover the features that are not selected into the dataset,
+    whose bounds move far more often. A run that stops half way resumes with the partitions left.
+
+    Label vocabularies are fixed by reset(): a new label would shift the codes of the labels sorted
+    after it, so new labels are encoded as -1 until the dataset is fully reprocessed.
+    """
+
+    def __init__(self, dataset_path: str):
+        self.dataset_path = os.path.abspath(dataset_path)
+        self.state_path = os.path.join(self.dataset_path, STATISTICS_FILE)
+        self.transformer_path = os.path.join(self.dataset_path, TRANSFORMER_FILE)
+        self._lock = threading.Lock()
+
+    def __locked_state(self, update):
+        """Runs update(state) under the thread and directory locks and persists the state it leaves behind."""
+        with self._lock:
+            fd = os.open(self.dataset_path, os.O_RDONLY)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self.state_path, "r") as f:
+                        state = json.load(f)
+                except FileNotFoundError:
+                    state = {}
+
+                result = update(state)
+
+                temp_path = self.state_path + ".tmp"
+                with open(temp_path, "w") as f:
+                    json.dump(state, f, indent=4, sort_keys=True)
+                os.replace(temp_path, self.state_path)
+                return result
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+
+    def __read_state(self) -> dict:
+        try:
+            with open(self.state_path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise FileNotFoundError(
+                f"No statistics for {self.dataset_path}; preprocess the full history (data_raw_preprocess_dag) first."
+            )
+
+    @staticmethod
+    def __bounds_of(statistics: FeatureStatistics) -> dict:
+        minimums, maximums = statistics.bounds()
+        return {"min": minimums, "max": maximums, "classes": {col: sorted(labels) for col, labels in statistics.classes.items()}}
+
+    # ---------------------------------
+    def exists(self) -> bool:
+        return os.path.exists(self.state_path)
+
+    @property
+    def version(self) -> int:
+        return self.__read_state()["version"]
+
+    def statistics(self) -> FeatureStatistics:
+        return FeatureStatistics.from_dict(self.__read_state()["statistics"])
+
+    def transformer(self, version: Optional[int] = None) -> FeatureTransformer:
+        """The transformer of the current bounds, or of an earlier version still referenced by a partition."""
+        state = self.__read_state()
+        bounds = state["bounds"][str(state["version"] if version is None else version)]
+        return FeatureTransformer(bounds["min"], bounds["max"], bounds["classes"])
+
+    def reset(self, statistics: FeatureStatistics) -> int:
+        """Replaces the statistics after a full preprocessing run; every partition is current. Returns the version."""
+        def replace(state):
+            version = state.get("version", 0) + 1
+            state.clear()
+            state.update({
+                "version": version,
+                "statistics": statistics.to_dict(),
+                "bounds": {str(version): self.__bounds_of(statistics)},
+                "dataset_version": version,
+                "partitions": {},
+                "batches": [],
+            })
+            return version
+
+        version = self.__locked_state(replace)
+        logger.info(f"Reset statistics of {self.dataset_path} to version {version}.")
+        return version
+
+    def preview(self, df: pd.DataFrame) -> FeatureStatistics:
+        """The statistics fold(df) would store, without storing them."""
+        statistics = self.statistics()
+        # fold() updates the label sets in place, the vocabulary only grows on a full reprocess
+        classes = {col: set(labels) for col, labels in statistics.classes.items()}
+        if batch_id(df) not in self.__read_state()["batches"]:
+            statistics.fold(df)
+        statistics.classes = classes
+        return statistics
+
+    def fold(self, df: pd.DataFrame) -> int:
+        """
+        Adds a batch of feature rows (before normalization) to the statistics. A batch that was
+        already folded is skipped. Returns the version, bumped when a bound moved.
+        """
+        key = batch_id(df)
+
+        def add(state):
+            if key in state["batches"]:
+                logger.info(f"Batch {key} was already folded into the statistics.")
+                return state["version"], False
+
+            statistics = FeatureStatistics.from_dict(state["statistics"])
+            classes = {col: set(labels) for col, labels in statistics.classes.items()}
+            statistics.fold(df)
+            new_labels = {col: sorted(labels - classes.get(col, set())) for col, labels in statistics.classes.items()}
+            new_labels = {col: labels for col, labels in new_labels.items() if labels}
+            if new_labels:
+                logger.warning(f"New labels {new_labels} are encoded as -1 until the data is fully reprocessed.")
+            statistics.classes = classes
+
+            state["statistics"] = statistics.to_dict()
+            state["batches"] = (state["batches"] + [key])[-MAX_BATCH_IDS:]
+            bounds = self.__bounds_of(statistics)
+            current = state["bounds"][str(state["version"])]
+            if bounds["min"] == current["min"] and bounds["max"] == current["max"]:
+                return state["version"], False
+
+            state["version"] += 1
+            state["bounds"][str(state["version"])] = bounds
+            return state["version"], True
+
+        version, bumped = self.__locked_state(add)
+        if bumped:
+            logger.info(f"Normalization bounds of {self.dataset_path} moved, now version {version}.")
+        return version
+
+    # ---------------------------------
+    @staticmethod
+    def partition_name(key: dict) -> str:
+        return "/".join(f"{col}={value}" for col, value in key.items())
+
+    def stale_partitions(self) -> list:
+        """The partition keys normalized with an older version than the current one."""
+        state = self.__read_state()
+        root_dir, name = os.path.split(self.dataset_path)
+        return [
+            key for key in ParquetDataStore(root_dir).partition_keys(name)
+            if state["partitions"].get(self.partition_name(key), state["dataset_version"]) != state["version"]
+        ]
+
+    @staticmethod
+    def moved_columns(previous: dict, current: dict, columns) -> list:
+        """The scaled columns among columns whose bounds differ between two versions."""
+        return [
+            col for col in columns
+            if col not in CYCLIC_COLUMNS and col in current["min"] and col in previous["min"]
+            and (previous["min"][col], previous["max"][col]) != (current["min"][col], current["max"][col])
+        ]
+
+    def renormalize(self) -> list:
+        """
+        Rewrites the partitions stamped with an older version to the current bounds. Only the columns
+        whose bounds differ are remapped: x' = (x * (max_old - min_old) + min_old - min_new) / (max_new - min_new).
+        A partition none of whose columns moved is left as it is. Returns the names of the partitions rewritten.
+        """
+        root_dir, name = os.path.split(self.dataset_path)
+        store = ParquetDataStore(root_dir)
+        state = self.__read_state()
+        version = state["version"]
+        current = state["bounds"][str(version)]
+        stored_columns = store.schema(name)["columns"]
+
+        rewritten = []
+        for key in self.stale_partitions():
+            partition = self.partition_name(key)
+            stamp = state["partitions"].get(partition, state["dataset_version"])
+            previous = state["bounds"][str(stamp)]
+            moved = self.moved_columns(previous, current, stored_columns)
+            if not moved:
+                continue
+
+            df = store.read_partition(name, key)
+            for col in FeatureTransformer.columns(df[moved])[0]:
+                old_min, old_max = previous["min"][col], previous["max"][col]
+                new_min, new_max = current["min"][col], current["max"][col]
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    df[col] = (df[col].to_numpy(dtype="float64") * (old_max - old_min) + old_min - new_min) / (new_max - new_min)
+            store.write(name, df, mode="overwrite_partitions")
+
+            # Stamped right after its rewrite, so an interrupted run resumes where it stopped
+            def stamp_partition(state, partition=partition):
+                state["partitions"][partition] = version
+            self.__locked_state(stamp_partition)
+            rewritten.append(partition)
+
+        def settle(state):
+            # Every partition is now current: drop the stamps and the bounds no longer referenced
+            if state["version"] == version:
+                state["dataset_version"] = version
+                state["partitions"] = {}
+                state["bounds"] = {str(version): state["bounds"][str(version)]}
+        self.__locked_state(settle)
+
+        logger.info(f"Renormalized {len(rewritten)} partitions of {self.dataset_path} to version {version}.")
+        return rewritten
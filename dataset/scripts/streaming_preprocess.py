@@ -0,0 +1,233 @@
+import os
+import shutil
+import logging
+import tempfile
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from dataset.scripts.data_store import ParquetDataStore, is_dataset, write_dataset
+from dataset.scripts.feature_transformer import FeatureTransformer, DEFAULT_TRANSFORMER_PATH, TRANSFORMER_FILE
+from dataset.scripts.statistics_store import FeatureStatistics, StatisticsStore
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    handlers=[logging.StreamHandler()],
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_ROWS = 100_000
+
+# Read as strings, as preprocess_pipeline always did
+KEY_COLUMNS = ["datetime", "zone", "subba-name"]
+
+
+def transformer_path_for(output_path: str) -> str:
+    """The transformer artifact fitted while writing output_path: inside a dataset output, next to a file output."""
+    if is_dataset(output_path):
+        return os.path.join(os.path.abspath(output_path), TRANSFORMER_FILE)
+    return os.path.join(os.path.dirname(os.path.abspath(output_path)), os.path.basename(DEFAULT_TRANSFORMER_PATH))
+
+
+def save_fitted(preprocessor, statistics: FeatureStatistics, output_path: str, transformer_path: Optional[str] = None) -> FeatureTransformer:
+    """
+    Saves the transformer of the statistics of a full run and makes it the preprocessor's. A dataset
+    output also gets the statistics, for the incremental updates of StatisticsStore.
+    """
+    transformer = statistics.transformer()
+    transformer.save(transformer_path or transformer_path_for(output_path))
+    preprocessor.transformer = transformer
+    if is_dataset(output_path):
+        StatisticsStore(output_path).reset(statistics)
+    return transformer
+
+
+class StreamingPreprocessor:
+    """
+    Runs DataPreprocessor.transform_df over a raw CSV file or dataset chunk by chunk, with the same
+    output as a single transform_df run over the whole input.
+
+    The input is read three times, chunk_rows rows at a time:
+      1. dtype scan: each column gets the dtype coerce_types_df would give it over the whole input.
+      2. clean, rolling/lag and cyclic features: duplicates are dropped across chunks by 64-bit row hash
+         against the rows at the last time of every series, and the last history_size rows of every
+         series are carried into the next chunk, so no rows are lost at chunk boundaries. Chunks are spilled to Parquet while the FeatureStatistics of the
+         whole input are folded chunk by chunk.
+      3. normalize and encode with the transformer of those statistics, select features, write.
+
+    Memory holds one chunk and the carried and last time rows of every series, whatever the file size.
+    The rows of a series must be in time order across chunks, as in data_raw (history, then the
+    appended deltas); a chunk that goes back in time raises ValueError.
+    """
+
+    def __init__(self, preprocessor, chunk_rows: int = DEFAULT_CHUNK_ROWS):
+        if chunk_rows < 1:
+            raise ValueError("chunk_rows must be positive.")
+        self.preprocessor = preprocessor
+        self.feature_engine = preprocessor.feature_engine
+        self.chunk_rows = chunk_rows
+
+    def iter_chunks(self, input_path: str):
+        """Yields the raw input in chunks of about chunk_rows rows, key columns as strings."""
+        if is_dataset(input_path):
+            root_dir, name = os.path.split(os.path.abspath(input_path))
+            chunks = self.__buffer(ParquetDataStore(root_dir).iter_partitions(name))
+        else:
+            chunks = pd.read_csv(input_path, chunksize=self.chunk_rows)
+
+        for chunk in chunks:
+            chunk = chunk.reset_index(drop=True)
+            for col in KEY_COLUMNS:
+                if col in chunk.columns:
+                    chunk[col] = chunk[col].astype(str)
+            yield chunk
+
+    def __buffer(self, partitions):
+        buffer, rows = [], 0
+        for partition in partitions:
+            buffer.append(partition)
+            rows += len(partition)
+            if rows >= self.chunk_rows:
+                yield pd.concat(buffer, ignore_index=True)
+                buffer, rows = [], 0
+        if buffer:
+            yield pd.concat(buffer, ignore_index=True)
+
+    # ---------------------------------
+    def run(self, input_path: str, output_path: Optional[str] = None, transformer_path: Optional[str] = None) -> str:
+        """
+        Preprocesses input_path into output_path and returns it. The output is a CSV file for a CSV
+        input and a dataset for a dataset input, next to the input unless output_path is given.
+        The fitted transformer is saved to transformer_path (next to the output by default) and
+        becomes the preprocessor's transformer.
+        """
+        if output_path is None:
+            name = "data_preprocess" if is_dataset(input_path) else "data_preprocess.csv"
+            output_path = os.path.join(os.path.dirname(os.path.abspath(input_path)), name)
+
+        plan = self.__scan_types(input_path)
+        work_dir = tempfile.mkdtemp(prefix=".preprocess-", dir=os.path.dirname(os.path.abspath(output_path)))
+        try:
+            parts, statistics = self.__featurize(input_path, plan, work_dir)
+            self.__normalize(parts, statistics.transformer(), output_path)
+            if parts:
+                save_fitted(self.preprocessor, statistics, output_path, transformer_path)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        return output_path
+
+    def __scan_types(self, input_path: str) -> dict:
+        """Pass 1: the dtype plan of the whole input, merged from the plans of its chunks."""
+        plan = {}
+        for chunk in self.iter_chunks(input_path):
+            for col, dtype in self.preprocessor.type_plan_df(chunk).items():
+                plan[col] = self.__merge_dtypes(plan[col], dtype) if col in plan else dtype
+        return plan
+
+    @staticmethod
+    def __merge_dtypes(a: Optional[str], b: Optional[str]) -> Optional[str]:
+        if a is None or b is None:
+            return None  # Not numeric somewhere, so not numeric over the whole input
+        if a == b:
+            return a
+        if np.dtype(a).kind in "iu" and np.dtype(b).kind in "iu":
+            return "int64"
+        return "float64"
+
+    def __featurize(self, input_path: str, plan: dict, work_dir: str) -> tuple[list, FeatureStatistics]:
+        """Pass 2: clean, features and cyclic features per chunk, spilled to Parquet. Returns the parts and statistics."""
+        preprocessor, engine = self.preprocessor, self.feature_engine
+        context, frontier = None, None
+        parts, statistics = [], FeatureStatistics()
+
+        for i, chunk in enumerate(self.iter_chunks(input_path)):
+            df = preprocessor.apply_type_plan_df(chunk, plan)
+            df = preprocessor.clean_data_df(df)
+
+            # drop_duplicates across chunks: rows already seen in an earlier chunk
+            df, frontier = self.__drop_seen(df, frontier)
+            if df.empty:
+                continue
+
+            self.__check_order(df, context)
+            df_features = engine.transform(df, context=context)
+            context = engine.tail(df if context is None else pd.concat([context, df], ignore_index=True))
+
+            df_features = df_features.dropna().reset_index(drop=True)
+            df_features = preprocessor.add_cyclic_features_df(df_features)
+            statistics.fold(df_features)
+
+            path = os.path.join(work_dir, f"part-{i:06d}.parquet")
+            df_features.to_parquet(path, index=False)
+            parts.append(path)
+            logger.info(f"Chunk {i + 1}: {len(chunk)} raw rows, {len(df_features)} rows with features.")
+        return parts, statistics
+
+    def __drop_seen(self, df: pd.DataFrame, frontier):
+        """
+        Drops the rows of df hashed in an earlier chunk, returns them and the new frontier. Series are in
+        time order across chunks, so a repeated row can only be at the last time of its series so far:
+        the frontier holds the hashes of those rows only, one time per series. Without a time column
+        every hash is kept, in a set.
+        """
+        hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+        time_column = self.feature_engine.time_column
+        if time_column not in df.columns:
+            frontier = set() if frontier is None else frontier
+            fresh = np.fromiter((value not in frontier for value in hashes.tolist()), dtype=bool, count=len(hashes))
+            frontier.update(hashes[fresh].tolist())
+            return df[fresh].reset_index(drop=True), frontier
+
+        group_columns = [col for col in self.feature_engine.group_columns if col in df.columns]
+        fresh = np.ones(len(df), dtype=bool) if frontier is None else ~np.isin(hashes, frontier["hash"].to_numpy())
+        df = df[fresh].reset_index(drop=True)
+
+        rows = df[group_columns + [time_column]].assign(hash=hashes[fresh])
+        rows = rows if frontier is None else pd.concat([frontier, rows], ignore_index=True)
+        last = rows.groupby(group_columns)[time_column].transform("max") if group_columns else rows[time_column].max()
+        return df, rows[rows[time_column] == last].reset_index(drop=True)
+
+    def __check_order(self, df: pd.DataFrame, context: Optional[pd.DataFrame]) -> None:
+        time_column = self.feature_engine.time_column
+        group_columns = [col for col in self.feature_engine.group_columns if col in df.columns]
+        if context is None or context.empty or time_column not in df.columns:
+            return
+
+        if group_columns:
+            first = df.groupby(group_columns)[time_column].min()
+            last = context.groupby(group_columns)[time_column].max()
+            common = first.index.intersection(last.index)
+            late = (first[common] < last[common]).any()
+        else:
+            late = df[time_column].min() < context[time_column].max()
+        if late:
+            raise ValueError(
+                "Input rows of a series are not in time order across chunks; "
+                "preprocess it in memory with DataPreprocessor.transform_df instead."
+            )
+
+    def __normalize(self, parts: list, transformer: FeatureTransformer, output_path: str) -> None:
+        """Pass 3: normalize and encode every part with the whole-input transformer and write the output."""
+        preprocessor = self.preprocessor
+        to_csv = output_path.endswith(".csv")
+
+        if not parts:
+            logger.warning("No rows left after preprocessing.")
+            empty = pd.DataFrame(columns=preprocessor.selected_features)
+            if to_csv:
+                empty.to_csv(output_path, index=False)
+            else:
+                write_dataset(output_path, empty, mode="overwrite")
+            return
+
+        for i, path in enumerate(parts):
+            df = preprocessor.normalize_and_encode_df(pd.read_parquet(path), transformer=transformer)
+            df = preprocessor.select_final_features_df(df)
+            if to_csv:
+                df.to_csv(output_path, index=False, mode="w" if i == 0 else "a", header=(i == 0))
+            else:
+                write_dataset(output_path, df, mode="overwrite" if i == 0 else "append")
+        logger.info(f"Preprocessed {len(parts)} chunks into {output_path}.")
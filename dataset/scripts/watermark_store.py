@@ -0,0 +1,136 @@
+import os
+import json
+import fcntl
+import logging
+import threading
+from typing import Optional
+
+import pandas as pd
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    handlers=[logging.StreamHandler()],
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_PATH = os.path.join(os.path.dirname(__file__), "../data/watermarks.json")
+
+
+class WatermarkStore:
+    """
+    Last ingested 'datetime' of every zone, used for incremental ingestion.
+
+    The watermarks are kept in a JSON state file guarded by a file lock. filter_new() keeps only the
+    rows of a frame that are newer than the watermark of their zone, and advance() moves the
+    watermarks forward once those rows have been written. Watermarks never move backwards.
+    """
+
+    def __init__(self, state_path: Optional[str] = None, zone_column: str = "zone", time_column: str = "datetime"):
+        self.state_path = os.path.abspath(state_path or os.getenv("WATERMARK_STATE_PATH", DEFAULT_STATE_PATH))
+        self.zone_column = zone_column
+        self.time_column = time_column
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+
+    def __locked_state(self, update):
+        """Runs update(state) under the thread and file locks and persists the state it leaves behind."""
+        with self._lock, open(self.state_path + ".lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self.state_path, "r") as f:
+                        state = json.load(f)
+                except (FileNotFoundError, json.JSONDecodeError):
+                    state = {}
+
+                result = update(state)
+
+                temp_path = self.state_path + ".tmp"
+                with open(temp_path, "w") as f:
+                    json.dump(state, f, indent=4, sort_keys=True)
+                os.replace(temp_path, self.state_path)
+                return result
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def get_all(self) -> dict:
+        """Returns {zone: watermark} with the watermarks as pd.Timestamp."""
+        state = self.__locked_state(lambda state: dict(state))
+        return {zone: pd.Timestamp(value) for zone, value in state.items()}
+
+    def get(self, zone: str) -> Optional[pd.Timestamp]:
+        return self.get_all().get(zone)
+
+    def __latest_per_zone(self, df: pd.DataFrame) -> dict:
+        times = pd.to_datetime(df[self.time_column])
+        latest = times.groupby(df[self.zone_column].astype(str)).max()
+        return {zone: value.isoformat() for zone, value in latest.items() if pd.notna(value)}
+
+    def advance(self, df: pd.DataFrame) -> dict:
+        """Moves each zone's watermark to the latest datetime in df. Returns the updated watermarks."""
+        if df.empty:
+            return {}
+        latest = self.__latest_per_zone(df)
+
+        def push(state):
+            updated = {}
+            for zone, value in latest.items():
+                if zone not in state or pd.Timestamp(value) > pd.Timestamp(state[zone]):
+                    state[zone] = value
+                    updated[zone] = value
+            return updated
+
+        updated = self.__locked_state(push)
+        logger.info(f"Advanced watermarks for {len(updated)} zones: {updated}")
+        return updated
+
+    def bootstrap(self, df: pd.DataFrame) -> dict:
+        """Sets the watermarks of zones that have none from already ingested data (e.g. the DVC history)."""
+        if df.empty:
+            return {}
+        latest = self.__latest_per_zone(df)
+
+        def seed(state):
+            missing = {zone: value for zone, value in latest.items() if zone not in state}
+            state.update(missing)
+            return missing
+
+        seeded = self.__locked_state(seed)
+        if seeded:
+            logger.info(f"Bootstrapped watermarks for {len(seeded)} zones from existing data.")
+        return seeded
+
+    def filter_new(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Returns the rows of df that are newer than the watermark of their zone."""
+        if df.empty:
+            return df
+
+        watermarks = self.get_all()
+        zones = df[self.zone_column].astype(str)
+        times = pd.to_datetime(df[self.time_column])
+        # Zones without a watermark have never been ingested, all their rows are new
+        limits = zones.map(watermarks)
+        mask = limits.isna() | (times > limits)
+
+        logger.info(f"{int(mask.sum())} of {len(df)} rows are newer than the zone watermarks.")
+        return df[mask.to_numpy()]
+
+    def start_date(
+        self, zones: list, default_start: pd.Timestamp, earliest: Optional[pd.Timestamp] = None
+    ) -> pd.Timestamp:
+        """
+        Returns the first date that has to be fetched for zones: the day of their oldest watermark,
+        or default_start when none of them has one. Zones that stopped reporting would otherwise
+        pull the window back indefinitely, so the result is never before earliest.
+        """
+        watermarks = self.get_all()
+        known = [watermarks[zone] for zone in zones if zone in watermarks]
+        if not known:
+            return default_start
+
+        start = min(known).normalize()
+        if earliest is not None:
+            start = max(start, earliest)
+        return start
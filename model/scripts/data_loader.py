@@ -7,6 +7,14 @@ import argparse
 import logging
 import json
 import subprocess
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from dataset.scripts.data_store import read_dataset
+from dataset.scripts.feature_store import FeatureStore
+from dataset.scripts.feature_transformer import FeatureTransformer, current_transformer_path
+from dataset.scripts.dtype_plan import apply_dtype_plan
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -34,9 +42,22 @@ def load_and_split_dataset(path, test_size, validation_size, random_state=42, sa
         logger.error(f"The file at path '{path}' does not exist.")
         raise FileNotFoundError(f"The file at path '{path}' does not exist.")
     
+    # path may be a CSV file or a partitioned Parquet dataset directory
     logger.info(f"Loading dataset from {path}")
-    data = pd.read_csv(path)
+    data = apply_dtype_plan(read_dataset(path))
+    return split_dataset(data, test_size, validation_size, random_state, save_locally, sensitive_cols)
+
+def load_and_split_features(store_path, test_size, validation_size, as_of=None, transformer_path=None, random_state=42, save_locally=False, sensitive_cols=["subba-name"]):
+    """
+    Loads the features known at as_of (all by default) from the feature store, scales and encodes them
+    with the fitted transformer as preprocess_pipeline does, then splits them like load_and_split_dataset.
+    """
+    logger.info(f"Loading features up to {as_of or 'now'} from the feature store {store_path}")
+    data = FeatureStore(store_path).load(end=as_of)
+    data = apply_dtype_plan(FeatureTransformer.load(transformer_path or current_transformer_path()).transform(data))
+    return split_dataset(data, test_size, validation_size, random_state, save_locally, sensitive_cols)
 
+def split_dataset(data, test_size, validation_size, random_state=42, save_locally=False, sensitive_cols=["subba-name"]):
     # Split the data into train and test sets
     logger.info("Splitting data into train and test sets")
     #train_data, test_data = train_test_split(data, sensitive_cols, test_size=test_size, random_state=random_state, stratify = sensitive_cols)
@@ -77,7 +98,7 @@ def download_data():
 
 def main():
     parser = argparse.ArgumentParser(description="Load, split, and optionally save a dataset.")
-    parser.add_argument("path", type=str, help="Path to the CSV file.")
+    parser.add_argument("path", type=str, help="Path to the CSV file or Parquet dataset directory.")
     parser.add_argument("--config", type=str, default="config.json", help="Path to the configuration JSON file.")
     parser.add_argument("--save_locally", action="store_true", help="Flag to save the split datasets locally in ./data/ directory.")
     
@@ -12,7 +12,9 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../.
 warnings.filterwarnings("ignore")
 
 from dataset.scripts.data_preprocess import DataPreprocessor
+from dataset.scripts.feature_transformer import current_transformer_path
 from dataset.scripts.data import DataCollector
+from dataset.scripts.feature_store import FeatureStore, DEFAULT_FEATURE_STORE_PATH
 from model.scripts.mlflow_model_registry import MLflowModelRegistry
 
 # Initialize objects globally (required for Google Cloud Functions)
@@ -24,7 +26,7 @@ def initialize_model():
     model_inference.load_model()
 
 class ModelInference:
-    def __init__(self, window_size=6):
+    def __init__(self, window_size=6, feature_store_path=None):
         self.model_path = os.path.join(os.path.dirname(__file__), '../pickle/model.pkl')
 
         self.feature_columns = ["precipMM", "weatherCode", "visibility", "HeatIndexF", "WindChillF",
@@ -41,7 +43,12 @@ class ModelInference:
         self.window_size = window_size
 
         self.data_obj = DataCollector()
-        self.data_preprocess_obj = DataPreprocessor()
+        # Scaled with the transformer versioned with the preprocessed dataset, see feature_transformer.py
+        self.data_preprocess_obj = DataPreprocessor(transformer_path=current_transformer_path())
+
+        # Materialized features of the zones, used instead of recomputing them when available
+        feature_store_path = feature_store_path or os.getenv("FEATURE_STORE_PATH", DEFAULT_FEATURE_STORE_PATH)
+        self.feature_store = FeatureStore(feature_store_path) if FeatureStore.is_store(feature_store_path) else None
 
         path = os.path.abspath(os.path.join(os.path.dirname(__file__), 'config.json'))
         with open(path, "r") as config_file:
@@ -71,17 +78,20 @@ class ModelInference:
         data_df = data_df.tail(self.window_size + 1)
         return data_df
     
-    def preprocess_input(self, input_df):
+    def preprocess_input(self, input_df, zone=None):
+        # features of the zone at the requested hour, when the feature store has them
+        if zone is not None and self.feature_store is not None:
+            as_of = pd.to_datetime(input_df['datetime'].astype(str)).max()
+            stored_df = self.feature_store.lookup(zone, as_of=as_of)
+            # weather features are the same for all series of a zone
+            stored_df = stored_df[stored_df['datetime'] == as_of].head(1)
+            if not stored_df.empty:
+                return self.data_preprocess_obj.normalize_data_single_df(stored_df)[self.feature_columns]
+
         # normalize
         input_df['datetime'] = input_df['datetime'].astype(str)
 
-        df_json =  input_df.to_json(orient='records', lines=False)
-
-        df_json = self.data_preprocess_obj.clean_data(df_json)
-        df_json = self.data_preprocess_obj.engineer_features(df_json)
-        df_json = self.data_preprocess_obj.add_cyclic_features(df_json)
-        df_json = self.data_preprocess_obj.normalize_data_single(df_json)
-        input_df_normalized = pd.read_json(df_json)
+        input_df_normalized = self.data_preprocess_obj.transform_df(input_df, single=True)
 
         # select features
         input_df_preprocessed = input_df_normalized[self.feature_columns]
@@ -91,9 +101,9 @@ class ModelInference:
     def denormalize_output(self, output):
         return self.data_preprocess_obj.denormalize_output(output)
 
-    def predict(self, input_df):
+    def predict(self, input_df, zone=None):
         # preprocess input
-        input_normalized = self.preprocess_input(input_df)
+        input_normalized = self.preprocess_input(input_df, zone=zone)
 
         # predict
         output = self.model.predict(input_normalized)
@@ -120,7 +130,7 @@ def preprocess_and_predict(request):
         input_df = model_inference.get_weather_data(location=coordinates)
 
         # Make predictions
-        predictions = model_inference.predict(input_df)
+        predictions = model_inference.predict(input_df, zone=request_json.get("zone"))
         return jsonify({"prediction": predictions})
 
     except Exception as e:
@@ -36,7 +36,8 @@ import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 
 from model.scripts.utils import *
-from model.scripts.data_loader import load_and_split_dataset
+from model.scripts.data_loader import load_and_split_dataset, load_and_split_features
+from dataset.scripts.feature_store import FeatureStore
 from model.scripts.mlflow_model_registry import *
 
 # Setting up logger
@@ -107,14 +108,23 @@ class ModelTrainer:
 
         return run
 
-    def load_dataset(self, dataset_path=None):
+    def load_dataset(self, dataset_path=None, as_of=None):
+        """
+        dataset_path is a preprocessed CSV file or dataset, or a feature store (.sqlite) from which
+        the features known at as_of (all by default) are loaded.
+        """
         if dataset_path != None:
             self.dataset_path = dataset_path
 
             try:
-                self.train_data, self.validation_data, self.test_data, _, _ = load_and_split_dataset(
-                    dataset_path, self.test_size, self.validation_size, save_locally=False
-                )
+                if FeatureStore.is_store(dataset_path):
+                    self.train_data, self.validation_data, self.test_data, _, _ = load_and_split_features(
+                        dataset_path, self.test_size, self.validation_size, as_of=as_of, save_locally=False
+                    )
+                else:
+                    self.train_data, self.validation_data, self.test_data, _, _ = load_and_split_dataset(
+                        dataset_path, self.test_size, self.validation_size, save_locally=False
+                    )
             except FileNotFoundError as e:
                 logger.error(f"Error loading dataset: {e}")
                 raise